@@ -0,0 +1,76 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fake_yahoo import start_server
+
+from monitor import build_ticker_state
+from provider import HttpBackend, MarketDataProvider, set_provider
+from signals import DEFAULT_THRESHOLDS
+
+# 与界面一致：线程池并行刷新全部股票，返回 (耗时, 失败数, 使用缓存的股票数)
+def refresh(tickers, workers):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        states = list(executor.map(lambda t: build_ticker_state(t, "1mo", "1d", DEFAULT_THRESHOLDS), tickers))
+    elapsed = time.perf_counter() - start
+    errors = sum(1 for state in states if state["error"])
+    cached = sum(1 for state in states if any("熔斷中" in w for w in state["warnings"]))
+    return elapsed, errors, cached
+
+def report(label, server, provider, elapsed, errors, cached, n_tickers):
+    status = provider.status()
+    counts = server.counts
+    breakers = ", ".join(f"{name}={endpoint['state']}" for name, endpoint in status["endpoints"].items())
+    print(f"{label:<34} {elapsed:7.2f} s  errors {errors:3d}/{n_tickers}  cached {cached:3d}  "
+          f"server ok {counts['ok']:4d} 429 {counts['throttled']:4d} 503 {counts['outage']:3d}  "
+          f"concurrency {status['concurrency']['limit']} (halved {status['concurrency']['decreases']}x)  "
+          f"breakers {breakers}")
+
+# 场景一：服务器每秒只允许 rate_limit 个请求，比较不限流与令牌桶 + AIMD
+def throttling_scenario(tickers, workers, rate_limit, latency):
+    print(f"== {len(tickers)} tickers, server rate limit {rate_limit}/s, latency {latency * 1000:.0f} ms ==")
+    scenarios = [
+        ("no token bucket, no breaker", dict(rate=1e9, burst=1e9, concurrency=workers, max_concurrency=workers,
+                                        failure_threshold=10 ** 9)),
+        ("token bucket + AIMD + breaker", dict(rate=rate_limit * 0.9, burst=rate_limit * 0.9, concurrency=4,
+                                               max_concurrency=workers, cooldown=5)),
+    ]
+    for label, options in scenarios:
+        server = start_server(latency=latency, jitter=latency, rate_limit=rate_limit)
+        provider = set_provider(MarketDataProvider(HttpBackend(server.url()), **options))
+        elapsed, errors, cached = refresh(tickers, workers)
+        report(label, server, provider, elapsed, errors, cached, len(tickers))
+        server.shutdown()
+
+# 场景二：第一轮正常，第二轮 history 端点故障；熔断后不再访问该端点，改用上一轮的缓存
+def outage_scenario(tickers, workers):
+    print(f"== {len(tickers)} tickers, history endpoint outage on the second refresh ==")
+    server = start_server(latency=0.01)
+    provider = set_provider(MarketDataProvider(HttpBackend(server.url()), rate=1e9, burst=1e9, cooldown=30))
+    report("refresh 1 (healthy)", server, provider, *refresh(tickers, workers), len(tickers))
+    server.outage.add("history")
+    report("refresh 2 (history down)", server, provider, *refresh(tickers, workers), len(tickers))
+    report("refresh 3 (history down)", server, provider, *refresh(tickers, workers), len(tickers))
+    server.shutdown()
+
+def main():
+    parser = argparse.ArgumentParser(description="限流、自适应并发与熔断基准（本地模拟服务器）")
+    parser.add_argument("--tickers", type=int, default=40)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--rate-limit", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    tickers = [f"T{i:03d}" for i in range(args.tickers)]
+    throttling_scenario(tickers, args.workers, args.rate_limit, args.latency)
+    print()
+    outage_scenario(tickers, args.workers)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import argparse
+import contextlib
+import io
+import logging
+import os
+import re
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from fake_yahoo import start_server
+
+REFRESH_LINE = re.compile(r"refresh (\d+): (\d+) bytes in (\d+) messages")
+
+class StopRefresh(Exception):
+    pass
+
+# 在 AppTest 中运行 v1.py：取数走本地模拟服务器，每次刷新之间让部分股票到来新K线，
+# 返回每次刷新推送给浏览器的字节数（由 v1.py 在 dashboard 日志里的 DEBUG 记录解析）
+def run_dashboard(server, tickers, details, refreshes, changed_per_refresh, diff_updates):
+    from streamlit.testing.v1 import AppTest
+
+    real_sleep = time.sleep
+    state = {"refreshes": 0}
+
+    def fake_sleep(seconds):
+        if seconds < 30:
+            return real_sleep(seconds)
+        state["refreshes"] += 1
+        if state["refreshes"] >= refreshes:
+            raise StopRefresh()
+        start = (state["refreshes"] - 1) * changed_per_refresh
+        server.advance([tickers[(start + i) % len(tickers)] for i in range(changed_per_refresh)])
+
+    # 预先给 dashboard 日志配好处理器，v1.py 就不再另加终端输出
+    output = io.StringIO()
+    logger = logging.getLogger("dashboard")
+    handler = logging.StreamHandler(output)
+    logger.addHandler(handler)
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    time.sleep = fake_sleep
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            # 前两次运行只为设定控件（详细面板的选项随自选股变化），重新计数后再正式运行
+            at = AppTest.from_file(os.path.join(ROOT, "v1.py"), default_timeout=600)
+            at.run()
+            at.text_input[0].set_value(", ".join(tickers))
+            state["refreshes"] = 0
+            at.run()
+            next(box for box in at.checkbox if box.label.startswith("⚡")).set_value(diff_updates)
+            next(select for select in at.multiselect if select.label.startswith("展開詳細面板")).set_value(details)
+            state["refreshes"] = 0
+            output.seek(0)
+            output.truncate()
+            server.advanced.clear()
+            at.run()
+    finally:
+        time.sleep = real_sleep
+        logger.removeHandler(handler)
+    return [int(match.group(2)) for match in REFRESH_LINE.finditer(output.getvalue())]
+
+def main():
+    parser = argparse.ArgumentParser(description="每次刷新推送给浏览器的字节数：整页重绘 vs 差异更新")
+    parser.add_argument("--tickers", type=int, default=20)
+    parser.add_argument("--details", type=int, default=5, help="展开详细面板的股票数")
+    parser.add_argument("--refreshes", type=int, default=4)
+    parser.add_argument("--changed", type=int, default=2, help="每次刷新之间到来新K线的股票数")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    server = start_server()
+    os.environ.update({
+        "PROVIDER_BASE_URL": server.url(), "PROVIDER_RATE": "1000", "PROVIDER_BURST": "1000",
+        "SNAPSHOT_PATH": os.path.join(tmp, "snapshot.pkl"), "SIGNAL_STORE_DIR": os.path.join(tmp, "events"),
+        "SHARED_BARS_DIR": os.path.join(tmp, "shared"),
+    })
+    import monitor
+
+    monitor.send_email_alert = lambda *args, **kwargs: None
+
+    tickers = [f"T{i:03d}" for i in range(args.tickers)]
+    details = tickers[:args.details]
+    print(f"{args.tickers} tickers, {args.details} detail panels, {args.changed} tickers get a new bar per refresh")
+    for diff_updates in (False, True):
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(os.environ["SNAPSHOT_PATH"])
+        sizes = run_dashboard(server, tickers, details, args.refreshes, args.changed, diff_updates)
+        label = "diff updates" if diff_updates else "full redraw"
+        print(f"{label:<13} " + "  ".join(f"#{i + 1}: {size / 1024:8.1f} KB" for i, size in enumerate(sizes)))
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
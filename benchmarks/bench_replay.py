@@ -0,0 +1,56 @@
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import pandas as pd
+
+from synthetic import synthetic_bars
+
+from replay import format_report, load_bar_files, replay, use_smtp_sink
+from signal_store import SignalEventStore
+
+# 两个交易日的 1 分钟K线，第二天开盘模拟财报跳空：开盘跳空、前 30 分钟放量
+def earnings_day_bars(seed, gap_pct=8.0):
+    day1 = synthetic_bars(390, seed=seed, start="2024-01-02 09:30")
+    day2 = synthetic_bars(390, seed=seed + 1000, start="2024-01-03 09:30")
+    scale = day1["Close"].iloc[-1] * (1 + gap_pct / 100) / day2["Open"].iloc[0]
+    for column in ["Open", "High", "Low", "Close"]:
+        day2[column] *= scale
+    day2.loc[:29, "Volume"] *= 5
+    return pd.concat([day1, day2], ignore_index=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="回放基准：财报日跳空场景下的吞吐、提醒延迟与资源占用")
+    parser.add_argument("--tickers", type=int, default=2)
+    parser.add_argument("--window", type=int, default=120, help="每次计算取的K线数")
+    parser.add_argument("--workers", default="1,4")
+    parser.add_argument("--speed", type=float, default=0.0, help="另按时间倍率回放一次，如 3000（默认 0 表示跳过）")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    try:
+        for i in range(args.tickers):
+            earnings_day_bars(i).to_csv(os.path.join(tmp, f"T{i:03d}_bars.csv"), index=False)
+        histories = load_bar_files([tmp])
+        sink = use_smtp_sink()
+        runs = [(0.0, int(w)) for w in args.workers.split(",")]
+        if args.speed > 0:
+            runs.append((args.speed, max(int(w) for w in args.workers.split(","))))
+        for speed, workers in runs:
+            store = SignalEventStore(os.path.join(tmp, f"events-{speed:g}-{workers}"))
+            received = sink.received
+            report = replay(histories, speed=speed, window=args.window, workers=workers, store=store)
+            store.close()
+            print(f"== {args.tickers} tickers, window {args.window} bars, workers {workers} ==")
+            print(format_report(report))
+            print(f"SMTP sink received {sink.received - received} messages\n")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+
+from synthetic import synthetic_bars
+
+from signals import (ALL_SIGNAL_NAMES, SELL_SIGNALS, calculate_signal_success_rate, compute_indicators, mark_signals,
+                     rolling_success_rates, signal_outcomes)
+
+# 对照：每根K线都对每个信号重新取最近 window 次已揭晓的触发再算一遍（O(n × window)）
+def naive_rolling(data, masks, window):
+    up_success, down_success = signal_outcomes(data)
+    n_bars = len(data)
+    rates = np.full((n_bars, len(ALL_SIGNAL_NAMES)), np.nan)
+    for j, name in enumerate(ALL_SIGNAL_NAMES):
+        mask = np.broadcast_to(masks[name], (n_bars,))
+        outcome = down_success if name in SELL_SIGNALS else up_success
+        for i in range(n_bars):
+            positions = np.flatnonzero(mask[:i])[-window:]
+            if len(positions):
+                rates[i, j] = outcome[positions].mean() * 100
+    return rates
+
+def timed(function, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    return (time.perf_counter() - start) / repeat, result
+
+def main():
+    parser = argparse.ArgumentParser(description="滚动成功率基准：累计和 vs 逐窗口重算")
+    parser.add_argument("--bars", default="500,2000,10000")
+    parser.add_argument("--window", type=int, default=50)
+    parser.add_argument("--naive-max-bars", type=int, default=2000, help="超过此K线数时跳过逐窗口重算")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    for n_bars in [int(n) for n in args.bars.split(",")]:
+        data = compute_indicators(synthetic_bars(n_bars, seed=n_bars))
+        masks = mark_signals(data, None, 1.7, 0.6)
+        fast, result = timed(lambda: rolling_success_rates(data, masks, [args.window])[args.window][0], args.repeat)
+        line = f"{n_bars:6d} bars x {len(ALL_SIGNAL_NAMES)} signals, last {args.window} triggers: prefix sums {fast * 1000:8.2f} ms"
+        if n_bars <= args.naive_max_bars:
+            slow, expected = timed(lambda: naive_rolling(data, masks, args.window), 1)
+            same = np.allclose(result.to_numpy(), expected, equal_nan=True)
+            line += f"  per-window recompute {slow * 1000:9.1f} ms  ({slow / fast:6.0f}x, identical: {same})"
+        print(line)
+        labels, _ = timed(lambda: calculate_signal_success_rate(data), args.repeat)
+        from_masks, _ = timed(lambda: calculate_signal_success_rate(data, masks), args.repeat)
+        print(f"{'':6s}       all-period success rate: from 異動標記 labels {labels * 1000:7.2f} ms, "
+              f"from signal masks {from_masks * 1000:6.2f} ms")
+
+if __name__ == "__main__":
+    main()
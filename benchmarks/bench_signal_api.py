@@ -0,0 +1,188 @@
+import argparse
+import gzip
+import http.client
+import json
+import multiprocessing
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from synthetic import synthetic_bars
+
+from monitor import compute_ticker_state, new_ticker_state
+from signal_api import build_ticker_payload
+from signals import DEFAULT_THRESHOLDS
+from snapshot import save_snapshot
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+# 服务进程已用的 CPU 秒数（读 /proc，其他平台返回 None）
+def process_cpu(pid):
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+    except OSError:
+        return None
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+# 客户端子进程：每个线程一条长连接，循环请求直到截止时间
+def client_process(port, path, headers, threads, deadline, results):
+    counts = {"requests": 0, "ok": 0, "not_modified": 0, "errors": 0, "bytes": 0}
+    lock = threading.Lock()
+
+    def run():
+        local = {"requests": 0, "ok": 0, "not_modified": 0, "errors": 0, "bytes": 0}
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        while time.time() < deadline:
+            try:
+                connection.request("GET", path, headers=headers)
+                response = connection.getresponse()
+                body = response.read()
+            except (OSError, http.client.HTTPException):
+                local["errors"] += 1
+                connection.close()
+                connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+                continue
+            local["requests"] += 1
+            local["bytes"] += len(body)
+            if response.status == 200:
+                local["ok"] += 1
+            elif response.status == 304:
+                local["not_modified"] += 1
+        connection.close()
+        with lock:
+            for key, value in local.items():
+                counts[key] += value
+
+    workers = [threading.Thread(target=run) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    results.put(counts)
+
+def load(port, pid, path, headers, connections, processes, duration):
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    deadline = time.time() + duration + 1.0
+    threads = max(1, connections // processes)
+    clients = [context.Process(target=client_process, args=(port, path, headers, threads, deadline, results))
+               for _ in range(processes)]
+    for client in clients:
+        client.start()
+    # 等客户端进程启动完毕再开始计时与计 CPU
+    time.sleep(max(0.0, deadline - duration - time.time()))
+    cpu_before = process_cpu(pid)
+    start = time.perf_counter()
+    totals = {"requests": 0, "ok": 0, "not_modified": 0, "errors": 0, "bytes": 0}
+    for _ in clients:
+        for key, value in results.get().items():
+            totals[key] += value
+    elapsed = time.perf_counter() - start
+    cpu_after = process_cpu(pid)
+    for client in clients:
+        client.join()
+    totals["elapsed"] = elapsed
+    totals["server_cpu"] = None if cpu_before is None else cpu_after - cpu_before
+    return totals
+
+def report(label, totals):
+    rate = totals["requests"] / totals["elapsed"]
+    line = (f"{label:<34} {rate:8.0f} req/s  200 {totals['ok']:6d}  304 {totals['not_modified']:6d}  "
+            f"errors {totals['errors']:3d}  {totals['bytes'] / max(1, totals['requests']):8.0f} B/req")
+    if totals["server_cpu"]:
+        line += f"  server CPU {totals['server_cpu']:.1f} s -> {totals['requests'] / totals['server_cpu']:8.0f} req per CPU-second"
+    print(line, flush=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="信号接口压测：预计算 + ETag + gzip 下单核每秒请求数")
+    parser.add_argument("--tickers", type=int, default=50)
+    parser.add_argument("--bars", type=int, default=500, help="每只股票的K线数")
+    parser.add_argument("--connections", type=int, default=200, help="并发长连接数（模拟轮询客户端）")
+    parser.add_argument("--processes", type=int, default=2, help="客户端进程数")
+    parser.add_argument("--duration", type=float, default=5.0, help="每个场景的压测秒数")
+    parser.add_argument("--cpu", type=int, default=0, help="服务进程绑定的 CPU 核")
+    args = parser.parse_args()
+
+    tickers = [f"T{i:03d}" for i in range(args.tickers)]
+    states = {ticker: compute_ticker_state(new_ticker_state(ticker), synthetic_bars(args.bars, seed=i), DEFAULT_THRESHOLDS,
+                                           (1.2, 100.0, "Call", 0.4, 3.0), 100.0)
+              for i, ticker in enumerate(tickers)}
+
+    # 对照：不预计算时每个请求都要序列化 + 压缩一次
+    def serialize(payload):
+        return json.dumps(payload, ensure_ascii=False).encode("utf-8")
+
+    for label, build in (("one ticker", lambda: serialize(build_ticker_payload(states[tickers[0]]))),
+                         ("watchlist batch", lambda: serialize({t: build_ticker_payload(states[t]) for t in tickers}))):
+        start = time.perf_counter()
+        repeat = 20
+        for _ in range(repeat):
+            body = build()
+            gzip.compress(body, 6)
+        per_request = (time.perf_counter() - start) / repeat
+        print(f"serialize + gzip per request ({label}, {len(body) / 1024:.0f} KiB): {per_request * 1000:.2f} ms "
+              f"-> at most {1 / per_request:.0f} req/s on one core without precomputation")
+
+    tmp = tempfile.mkdtemp()
+    port = free_port()
+    try:
+        snapshot_path = os.path.join(tmp, "snapshot.pkl")
+        save_snapshot(states, {"period": "synthetic"}, snapshot_path)
+        pin = None
+        if hasattr(os, "sched_setaffinity") and args.cpu in os.sched_getaffinity(0):
+            pin = lambda: os.sched_setaffinity(0, {args.cpu})
+        server = subprocess.Popen([sys.executable, os.path.join(ROOT, "signal_api.py"), "--snapshot", snapshot_path,
+                                   "--port", str(port), "--poll", "0.2"], cwd=ROOT, preexec_fn=pin,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            for _ in range(300):
+                try:
+                    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+                    connection.request("GET", "/health")
+                    if json.loads(connection.getresponse().read())["tickers"]:
+                        break
+                except (OSError, ValueError):
+                    pass
+                time.sleep(0.1)
+            else:
+                raise RuntimeError("signal api did not start")
+
+            etags = {}
+            for path in (f"/signals/{tickers[0]}", "/signals"):
+                connection = http.client.HTTPConnection("127.0.0.1", port)
+                connection.request("GET", path)
+                etags[path] = connection.getresponse().getheader("ETag")
+                connection.close()
+
+            print(f"== {args.tickers} tickers, {args.connections} keep-alive connections from {args.processes} processes, "
+                  f"server pinned to CPU {args.cpu if pin else '-'} of {os.cpu_count()} ==")
+            scenarios = [
+                ("one ticker, identity", f"/signals/{tickers[0]}", {}),
+                ("one ticker, gzip", f"/signals/{tickers[0]}", {"Accept-Encoding": "gzip"}),
+                ("one ticker, If-None-Match", f"/signals/{tickers[0]}", {"Accept-Encoding": "gzip", "If-None-Match": etags[f"/signals/{tickers[0]}"]}),
+                ("watchlist batch, gzip", "/signals", {"Accept-Encoding": "gzip"}),
+                ("watchlist batch, If-None-Match", "/signals", {"Accept-Encoding": "gzip", "If-None-Match": etags["/signals"]}),
+                ("summary, gzip", "/summary", {"Accept-Encoding": "gzip"}),
+            ]
+            for label, path, headers in scenarios:
+                report(label, load(port, server.pid, path, headers, args.connections, args.processes, args.duration))
+        finally:
+            server.terminate()
+            server.wait()
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
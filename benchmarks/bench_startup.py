@@ -0,0 +1,77 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from synthetic import synthetic_bars
+
+# 改动前 v1.py 启动时导入的模块
+EAGER_IMPORTS = [
+    "streamlit", "yfinance", "pandas", "smtplib", "email.mime.text", "email.mime.multipart", "dotenv",
+    "plotly.express", "plotly.graph_objects", "plotly.subplots", "numpy",
+]
+# 现在 v1.py 启动时导入的模块（yfinance、Plotly、smtplib 推迟到第一次使用）
+LAZY_IMPORTS = ["streamlit", "pandas", "numpy", "signals", "signal_store", "signal_optimizer", "monitor", "snapshot"]
+
+# 在全新解释器中测量导入耗时，取中位数（秒）
+def measure_import(modules, repeat):
+    code = ("import time; start = time.perf_counter(); "
+            + "; ".join(f"import {name}" for name in modules)
+            + "; print(time.perf_counter() - start)")
+    samples = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+        samples.append(float(output.stdout.strip()))
+    return statistics.median(samples)
+
+# 冷启动：取数 + 计算全部股票；热启动：读取快照
+def measure_first_paint(tickers, n_bars, live):
+    from monitor import build_ticker_state, compute_ticker_state, new_ticker_state
+    from signals import DEFAULT_THRESHOLDS
+    from snapshot import load_snapshot, save_snapshot
+
+    start = time.perf_counter()
+    states = {}
+    for i, ticker in enumerate(tickers):
+        if live:
+            states[ticker] = build_ticker_state(ticker, "1mo", "1d", DEFAULT_THRESHOLDS)
+        else:
+            states[ticker] = compute_ticker_state(new_ticker_state(ticker), synthetic_bars(n_bars, seed=i), DEFAULT_THRESHOLDS)
+    cold = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "snapshot.pkl")
+        save_snapshot(states, {}, path)
+        start = time.perf_counter()
+        snapshot = load_snapshot(path)
+        warm = time.perf_counter() - start
+        size = os.path.getsize(path)
+    return cold, warm, size, len(snapshot["states"])
+
+def main():
+    parser = argparse.ArgumentParser(description="启动耗时基准：导入耗时与首次绘制前的数据准备耗时")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--tickers", default="TSLA,NIO,TSLL")
+    parser.add_argument("--bars", type=int, default=2000, help="离线模式下每只股票的 K 线数")
+    parser.add_argument("--live", action="store_true", help="冷启动路径使用 yfinance 实时取数")
+    args = parser.parse_args()
+
+    eager = measure_import(EAGER_IMPORTS, args.repeat)
+    lazy = measure_import(LAZY_IMPORTS, args.repeat)
+    print(f"import (eager, baseline): {eager * 1000:8.1f} ms")
+    print(f"import (lazy, current):   {lazy * 1000:8.1f} ms")
+
+    tickers = [t.strip().upper() for t in args.tickers.split(",") if t.strip()]
+    cold, warm, size, restored = measure_first_paint(tickers, args.bars, args.live)
+    source = "live fetch" if args.live else f"{args.bars} synthetic bars"
+    print(f"first paint data, cold ({source}, {len(tickers)} tickers): {cold * 1000:8.1f} ms")
+    print(f"first paint data, warm (snapshot {size / 1024:.0f} KiB, {restored} tickers): {warm * 1000:8.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+
+from synthetic import synthetic_bars
+
+# 各时间范围的交易日数、各间隔每个交易日的K线数
+PERIOD_DAYS = {"1d": 1, "5d": 5, "1mo": 21, "3mo": 63, "6mo": 126, "1y": 252, "2y": 504, "5y": 1260,
+               "10y": 2520, "ytd": 200, "max": 5000}
+INTERVAL_BARS = {"1m": 390, "2m": 195, "5m": 78, "15m": 26, "30m": 13, "60m": 7, "90m": 5, "1h": 7, "1d": 1,
+                 "5d": 0.2, "1wk": 0.2, "1mo": 0.05, "3mo": 0.016}
+# 可向后推进的K线数上限（advance() 模拟新K线到来，窗口整体后移）
+MAX_ADVANCE_BARS = 1000
+
+INTERVAL_FREQ = {"1m": "min", "2m": "2min", "5m": "5min", "15m": "15min", "30m": "30min", "60m": "h", "90m": "90min",
+                 "1h": "h", "1d": "B", "5d": "5B", "1wk": "W-MON", "1mo": "MS", "3mo": "QS"}
+
+# 模拟 Yahoo 的本地 JSON 服务：可注入延迟、按速率限流（429）、随机 429 与端点故障（503）
+class FakeYahooServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.0, jitter=0.0, rate_limit=None, throttle_prob=0.0, outage=()):
+        super().__init__(address, FakeYahooHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit
+        self.throttle_prob = throttle_prob
+        self.outage = set(outage)
+        self.counts = {"requests": 0, "ok": 0, "throttled": 0, "outage": 0}
+        self.advanced = {}
+        self._window = []
+        self._lock = threading.Lock()
+
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    # 让若干股票各到来 n 根新K线
+    def advance(self, tickers, n=1):
+        for ticker in tickers:
+            self.advanced[ticker] = min(MAX_ADVANCE_BARS, self.advanced.get(ticker, 0) + n)
+
+    # 滑动一秒窗口内超过 rate_limit 的请求返回 429
+    def admit(self, endpoint):
+        with self._lock:
+            self.counts["requests"] += 1
+            if endpoint in self.outage:
+                self.counts["outage"] += 1
+                return 503
+            now = time.monotonic()
+            self._window = [t for t in self._window if now - t < 1.0]
+            if (self.rate_limit is not None and len(self._window) >= self.rate_limit) or random.random() < self.throttle_prob:
+                self.counts["throttled"] += 1
+                return 429
+            self._window.append(now)
+            self.counts["ok"] += 1
+            return 200
+
+def _seed(ticker):
+    return zlib.crc32(ticker.encode())
+
+def history_payload(ticker, period, interval, advanced=0):
+    n_bars = max(2, int(PERIOD_DAYS.get(period, 21) * INTERVAL_BARS.get(interval, 1)))
+    data = synthetic_bars(n_bars + MAX_ADVANCE_BARS, seed=_seed(ticker), start="2024-01-02 09:30",
+                          freq=INTERVAL_FREQ.get(interval, "B")).iloc[advanced:advanced + n_bars].copy()
+    data["Datetime"] = data["Datetime"].map(lambda t: t.isoformat())
+    return {"index_name": "Datetime", "tz": "America/New_York", "columns": list(data.columns),
+            "data": data.to_numpy().tolist()}
+
+def info_payload(ticker):
+    close = float(synthetic_bars(2, seed=_seed(ticker))["Close"].iloc[-1])
+    return {"symbol": ticker, "previousClose": close, "regularMarketPrice": close}
+
+def option_chain_payload(ticker):
+    rng = np.random.default_rng(_seed(ticker))
+    price = info_payload(ticker)["previousClose"]
+    strikes = np.round(price * np.linspace(0.8, 1.2, 17), 1)
+
+    def side():
+        return [{"strike": float(strike), "lastPrice": float(rng.uniform(0.5, 10)), "volume": int(rng.integers(0, 5000)),
+                 "openInterest": int(rng.integers(0, 20000)), "impliedVolatility": float(rng.uniform(0.2, 1.2))}
+                for strike in strikes]
+    return {"calls": side(), "puts": side()}
+
+class FakeYahooHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        parts = [unquote(part) for part in url.path.strip("/").split("/")]
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        endpoint = parts[0] if parts else ""
+
+        server = self.server
+        delay = server.latency + random.uniform(0, server.jitter)
+        if delay:
+            time.sleep(delay)
+        status = server.admit(endpoint)
+        if status != 200:
+            self._send(status, {"error": "Too Many Requests" if status == 429 else "Service Unavailable"})
+            return
+
+        if endpoint == "history" and len(parts) == 2:
+            self._send(200, history_payload(parts[1], params.get("period", "1mo"), params.get("interval", "1d"),
+                                            server.advanced.get(parts[1], 0)))
+        elif endpoint == "options" and len(parts) == 2:
+            self._send(200, {"expirations": ["2024-01-19", "2024-01-26"]})
+        elif endpoint == "option_chain" and len(parts) == 3:
+            self._send(200, option_chain_payload(parts[1]))
+        elif endpoint == "info" and len(parts) == 2:
+            self._send(200, info_payload(parts[1]))
+        else:
+            self._send(404, {"error": "Not Found"})
+
+# 在后台线程启动服务器，返回 server（server.url() 为地址）
+def start_server(port=0, **options):
+    server = FakeYahooServer(("127.0.0.1", port), **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="本地模拟 Yahoo 行情服务（配合 PROVIDER_BASE_URL 使用）")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.05, help="每个请求的固定延迟（秒）")
+    parser.add_argument("--jitter", type=float, default=0.05, help="额外随机延迟上限（秒）")
+    parser.add_argument("--rate-limit", type=int, default=None, help="每秒允许的请求数，超出返回 429")
+    parser.add_argument("--throttle-prob", type=float, default=0.0, help="随机返回 429 的概率")
+    parser.add_argument("--outage", action="append", default=[], help="始终返回 503 的端点，可重复")
+    args = parser.parse_args()
+
+    server = FakeYahooServer(("127.0.0.1", args.port), args.latency, args.jitter, args.rate_limit,
+                             args.throttle_prob, args.outage)
+    print(f"fake yahoo listening on {server.url()}  (PROVIDER_BASE_URL={server.url()})", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(server.counts)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+import numpy as np
+import pandas as pd
+
+# 生成随机游走的 OHLCV K线，列名与 yfinance history() 一致
+def synthetic_bars(n_bars, seed=0, start="2024-01-02 09:30", freq="min", tz="America/New_York"):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.002, n_bars)))
+    open_ = close * np.exp(rng.normal(0, 0.0015, n_bars))
+    high = np.maximum(open_, close) * (1 + rng.uniform(0, 0.001, n_bars))
+    low = np.minimum(open_, close) * (1 - rng.uniform(0, 0.001, n_bars))
+    volume = rng.integers(10_000, 1_000_000, n_bars)
+    return pd.DataFrame({
+        "Datetime": pd.date_range(start, periods=n_bars, freq=freq, tz=tz),
+        "Open": open_,
+        "High": high,
+        "Low": low,
+        "Close": close,
+        "Volume": volume,
+    })
@@ -0,0 +1,254 @@
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+# 滚动窗口的K线数、计算相关系数所需的最少共同K线数
+COMOVEMENT_WINDOW = 60
+COMOVEMENT_MIN_PERIODS = 20
+
+# 背离提醒：只看窗口内 |相关系数| 不低于此值的股票对，本根K线价差偏离超过 Z 倍标准差时提醒
+DIVERGENCE_CORR_THRESHOLD = 0.7
+DIVERGENCE_Z_THRESHOLD = 3.0
+
+# 背离提醒在提醒记录中的信号名，股票对记为 "A/B"
+DIVERGENCE_SIGNAL = "🔗 走勢背離"
+
+# 每加入这么多根K线后由窗口数据重算一次累加量，消除加减带来的浮点误差
+REBUILD_EVERY = 1000
+
+# 各股票的 Price Change % 按时间对齐成一张表（行为K线时间，列为股票），跳过取数失败的股票；
+# bars 只取每只股票最近若干根K线（增量更新只需要窗口大小的尾部）。
+# 各股票的时间轴通常完全相同，此时直接拼接数组，不做逐列的索引对齐
+def returns_frame(states, bars=None):
+    tail = slice(-bars, None) if bars else slice(None)
+    tickers, times, columns = [], [], []
+    for ticker, state in states.items():
+        if state.get("error") or state.get("data") is None:
+            continue
+        data = state["data"]
+        tickers.append(ticker)
+        times.append(pd.array(data["Datetime"])[tail])
+        columns.append(data["Price Change %"].to_numpy(dtype=float)[tail])
+    if not tickers:
+        return pd.DataFrame()
+    first = times[0]
+    if (isinstance(first, pd.arrays.DatetimeArray) and (np.diff(first.asi8) > 0).all() and
+            all(t.dtype == first.dtype and np.array_equal(t.asi8, first.asi8) for t in times[1:])):
+        return pd.DataFrame(np.column_stack(columns), index=pd.DatetimeIndex(first), columns=tickers)
+    indexes = [pd.DatetimeIndex(t) for t in times]
+    union = indexes[0].append(indexes[1:]).unique().sort_values()
+    values = np.full((len(union), len(tickers)), np.nan)
+    for k, (index, column) in enumerate(zip(indexes, columns)):
+        # 同一时间重复的K线保留最后一根
+        keep = ~index.duplicated(keep="last")
+        values[union.get_indexer(index[keep]), k] = column[keep]
+    return pd.DataFrame(values, index=union, columns=tickers)
+
+# 全自选股的滚动相关系数 / β 矩阵，按K线增量维护：
+# 对每一对股票累加共同K线数 n、Σx、Σx²、Σxy（缺失值不计入该对），
+# 新K线进入窗口时加一次、移出窗口时减一次，每根K线 O(N²)，无需重算 N×N 矩阵
+class CoMovementMonitor:
+    def __init__(self, window=COMOVEMENT_WINDOW, min_periods=COMOVEMENT_MIN_PERIODS,
+                 corr_threshold=DIVERGENCE_CORR_THRESHOLD, z_threshold=DIVERGENCE_Z_THRESHOLD):
+        self.window = window
+        self.min_periods = min_periods
+        self.corr_threshold = corr_threshold
+        self.z_threshold = z_threshold
+        self.reset([])
+
+    def reset(self, tickers):
+        size = len(tickers)
+        self.columns = pd.Index(tickers)
+        self.tickers = list(tickers)
+        self.rows = deque()
+        # 最近一次加入新K线时移出窗口的旧K线，撤回最后一根K线时放回，窗口长度保持不变
+        self.evicted = None
+        self.n = np.zeros((size, size))
+        self.sx = np.zeros((size, size))
+        self.sxx = np.zeros((size, size))
+        self.sxy = np.zeros((size, size))
+        self.added = 0
+        self.divergences = []
+        # 上三角每对股票 (i, j) 在展平矩阵中的位置：(i, j) 处的 Σx 是 i 的累加，(j, i) 处是 j 的
+        self.pair_i, self.pair_j = np.triu_indices(size, k=1)
+        self.upper = self.pair_i * size + self.pair_j
+        self.lower = self.pair_j * size + self.pair_i
+
+    @property
+    def last_time(self):
+        return self.rows[-1][0] if self.rows else None
+
+    # 按 signs 逐行累加（+1）或扣除（-1）若干行；values 中缺失值已置 0，present 为 0/1。
+    # 新K线进入与旧K线移出合成一次 (N×2)@(2×N) 乘法，比两次秩一更新快数倍
+    def _accumulate(self, values, present, signs):
+        signed = present * signs[:, None]
+        self.n += present.T @ signed
+        self.sx += values.T @ signed
+        self.sxx += (values * values).T @ signed
+        self.sxy += values.T @ (values * signs[:, None])
+
+    def _rebuild(self):
+        size = len(self.tickers)
+        for name in ("n", "sx", "sxx", "sxy"):
+            setattr(self, name, np.zeros((size, size)))
+        if self.rows:
+            self._accumulate(np.array([row[1] for row in self.rows]), np.array([row[2] for row in self.rows]),
+                             np.ones(len(self.rows)))
+        self.added = 0
+
+    def _push(self, bar_time, values):
+        present = (~np.isnan(values)).astype(float)
+        values = np.where(present > 0, values, 0.0)
+        self.rows.append((bar_time, values, present))
+        self.evicted = None
+        if len(self.rows) > self.window:
+            self.evicted = self.rows.popleft()
+            _, old_values, old_present = self.evicted
+            self._accumulate(np.array([values, old_values]), np.array([present, old_present]), np.array([1.0, -1.0]))
+        else:
+            self._accumulate(values[None, :], present[None, :], np.ones(1))
+        self.added += 1
+        if self.added >= REBUILD_EVERY:
+            self._rebuild()
+
+    # 撤回窗口中最后一根K线（盘中最后一根还在形成，下一次刷新会带来更新后的数值），
+    # 并放回当时被它挤出窗口的旧K线
+    def _pop_last(self):
+        _, values, present = self.rows.pop()
+        if self.evicted is None:
+            self._accumulate(values[None, :], present[None, :], -np.ones(1))
+            return
+        self.rows.appendleft(self.evicted)
+        _, old_values, old_present = self.evicted
+        self.evicted = None
+        self._accumulate(np.array([values, old_values]), np.array([present, old_present]), np.array([-1.0, 1.0]))
+
+    # 把最后一根K线换成更新后的数值：新旧两行合成一次乘法，窗口长度不变
+    def _replace_last(self, values):
+        bar_time, old_values, old_present = self.rows.pop()
+        present = (~np.isnan(values)).astype(float)
+        values = np.where(present > 0, values, 0.0)
+        self.rows.append((bar_time, values, present))
+        self._accumulate(np.array([values, old_values]), np.array([present, old_present]), np.array([1.0, -1.0]))
+        self.added += 1
+
+    # 每对股票 (i, j) 在共同K线上的均值、方差与协方差
+    def _moments(self):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            n = np.where(self.n > 0, self.n, np.nan)
+            mean_i = self.sx / n
+            mean_j = mean_i.T
+            var_i = np.maximum(self.sxx / n - mean_i ** 2, 0)
+            var_j = var_i.T
+            cov = self.sxy / n - mean_i * mean_j
+        valid = (self.n >= self.min_periods) & (var_i > 0) & (var_j > 0)
+        return mean_i, mean_j, var_i, var_j, cov, valid
+
+    def correlation(self):
+        _, _, var_i, var_j, cov, valid = self._moments()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            corr = np.where(valid, np.clip(cov / np.sqrt(var_i * var_j), -1, 1), np.nan)
+        return pd.DataFrame(corr, index=self.tickers, columns=self.tickers)
+
+    # beta.loc[a, b]：a 的涨跌幅对 b 的回归系数（b 涨 1% 时 a 预期涨多少）
+    def beta(self):
+        _, _, _, var_j, cov, valid = self._moments()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            beta = np.where(valid, cov / var_j, np.nan)
+        return pd.DataFrame(beta, index=self.tickers, columns=self.tickers)
+
+    # 股票对一览：每对一行，按 |相关系数| 由高到低
+    def pairs(self, limit=None):
+        corr, beta = self.correlation().to_numpy(), self.beta().to_numpy()
+        i, j = np.triu_indices(len(self.tickers), k=1)
+        table = pd.DataFrame({
+            "股票 A": [self.tickers[k] for k in i],
+            "股票 B": [self.tickers[k] for k in j],
+            "相關係數": corr[i, j],
+            "β (A 對 B)": beta[i, j],
+            "共同K線數": self.n[i, j].astype(int),
+        }).dropna(subset=["相關係數"])
+        table = table.reindex(table["相關係數"].abs().sort_values(ascending=False).index).reset_index(drop=True)
+        return table if limit is None else table.head(limit)
+
+    # 用加入之前的窗口统计量检查一根K线：高相关的股票对，标准化价差 (u - sign(ρ)·v) / sqrt(2(1 - |ρ|)) 超过阈值即为背离。
+    # 只在展平的上三角上取本根K线两只都有数据、共同K线数足够的股票对，不生成 N×N 临时矩阵
+    def _divergences(self, bar_time, values):
+        present = ~np.isnan(values)
+        n = self.n.ravel().take(self.upper)
+        pick = (n >= self.min_periods) & present[self.pair_i] & present[self.pair_j]
+        upper, lower, i, j = self.upper[pick], self.lower[pick], self.pair_i[pick], self.pair_j[pick]
+        n = n[pick]
+        mean_a, mean_b = self.sx.ravel().take(upper) / n, self.sx.ravel().take(lower) / n
+        var_a = self.sxx.ravel().take(upper) / n - mean_a ** 2
+        var_b = self.sxx.ravel().take(lower) / n - mean_b ** 2
+        cov = self.sxy.ravel().take(upper) / n - mean_a * mean_b
+        with np.errstate(divide="ignore", invalid="ignore"):
+            corr = cov / np.sqrt(var_a * var_b)
+        # 先按相关系数筛掉大部分股票对，再只对高相关的算 z
+        close = (var_a > 0) & (var_b > 0) & (np.abs(corr) >= self.corr_threshold)
+        i, j, mean_a, mean_b, var_a, var_b = i[close], j[close], mean_a[close], mean_b[close], var_a[close], var_b[close]
+        cov, corr = cov[close], np.clip(corr[close], -1, 1)
+        u = (values[i] - mean_a) / np.sqrt(var_a)
+        v = (values[j] - mean_b) / np.sqrt(var_b)
+        z = (u - np.sign(corr) * v) / np.sqrt(2 * np.maximum(1 - np.abs(corr), 1e-6))
+        beta_ba = cov / var_a
+        expected_b = mean_b + beta_ba * (values[i] - mean_a)
+        divergences = []
+        flagged = np.abs(z) >= self.z_threshold
+        for k in np.flatnonzero(flagged):
+            a, b = self.tickers[i[k]], self.tickers[j[k]]
+            return_a, return_b = float(values[i[k]]), float(values[j[k]])
+            divergences.append({
+                "pair": (a, b),
+                "bar_time": bar_time,
+                "corr": float(corr[k]),
+                "beta": float(beta_ba[k]),
+                "z": float(z[k]),
+                "return_a": return_a,
+                "return_b": return_b,
+                "expected_b": float(expected_b[k]),
+                "message": (f"{a} 與 {b} 走勢背離：相關係數 {corr[k]:.2f}，本根K線 {a} {return_a:+.2f}%、"
+                            f"{b} {return_b:+.2f}%（按 β={beta_ba[k]:.2f} 預期 {b} {expected_b[k]:+.2f}%），"
+                            f"偏離 {abs(z[k]):.1f}σ"),
+            })
+        divergences.sort(key=lambda item: -abs(item["z"]))
+        return divergences
+
+    # 送入最新的对齐涨跌幅表：只处理上次之后的新K线（最后一根若数值有变则替换），
+    # 返回最新一根K线上的背离列表；自选股变化时从头重建
+    def update(self, returns):
+        if returns.empty:
+            return []
+        if not returns.columns.equals(self.columns):
+            self.reset(returns.columns)
+        if self.rows and self.last_time in returns.index:
+            _, last_values, last_present = self.rows[-1]
+            row = returns.loc[self.last_time].to_numpy(dtype=float)
+            if not (np.array_equal(~np.isnan(row), last_present > 0) and
+                    np.array_equal(np.nan_to_num(row), last_values)):
+                # 之后还有新K线时原地替换；否则先撤回，背离按不含它的窗口重新检查
+                if returns.index[-1] > self.last_time:
+                    self._replace_last(row)
+                else:
+                    self._pop_last()
+        new_rows = returns if self.last_time is None else returns[returns.index > self.last_time]
+        if new_rows.empty:
+            return self.divergences
+        values = new_rows.to_numpy(dtype=float)
+        # 首次或间隔很久的刷新：窗口之外的旧K线不必逐行进出
+        if len(values) > self.window + 1:
+            for bar_time, row in zip(new_rows.index[-self.window - 1:-1], values[-self.window - 1:-1]):
+                present = (~np.isnan(row)).astype(float)
+                self.rows.append((bar_time, np.where(present > 0, row, 0.0), present))
+            while len(self.rows) > self.window:
+                self.rows.popleft()
+            self.evicted = None
+            self._rebuild()
+        else:
+            for bar_time, row in zip(new_rows.index[:-1], values[:-1]):
+                self._push(bar_time, row)
+        self.divergences = self._divergences(new_rows.index[-1], values[-1])
+        self._push(new_rows.index[-1], values[-1])
+        return self.divergences
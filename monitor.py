@@ -0,0 +1,565 @@
+import os
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+from provider import EmptyHistoryError, get_provider
+from signal_store import settings_key
+from signals import (DEFAULT_THRESHOLDS, calculate_signal_success_rate, compute_indicators,
+                     latest_rolling_success_rates, mark_signals, split_signal_labels)
+
+load_dotenv()
+
+# Gmail 发信者帐号设置
+SENDER_EMAIL = os.getenv("SENDER_EMAIL")
+SENDER_PASSWORD = os.getenv("SENDER_PASSWORD")
+RECIPIENT_EMAIL = os.getenv("RECIPIENT_EMAIL")
+
+# 发信服务器（默认 Gmail SSL；回放或测试时可指向本地 smtp_sink.py）
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "465"))
+SMTP_SSL = os.getenv("SMTP_SSL", "1").lower() not in ("0", "false", "no")
+
+# 提醒旗标对应的信号名称（邮件中据此附上该信号的近期成功率）
+ALERT_FLAG_SIGNALS = {
+    "low_high_signal": "📈 Low>High",
+    "high_low_signal": "📉 High<Low",
+    "macd_buy_signal": "📈 MACD買入",
+    "macd_sell_signal": "📉 MACD賣出",
+    "ema_buy_signal": "📈 EMA買入",
+    "ema_sell_signal": "📉 EMA賣出",
+    "price_trend_buy_signal": "📈 價格趨勢買入",
+    "price_trend_sell_signal": "📉 價格趨勢賣出",
+    "price_trend_vol_buy_signal": "📈 價格趨勢買入(量)",
+    "price_trend_vol_sell_signal": "📉 價格趨勢賣出(量)",
+    "price_trend_vol_pct_buy_signal": "📈 價格趨勢買入(量%)",
+    "price_trend_vol_pct_sell_signal": "📉 價格趨勢賣出(量%)",
+    "gap_common_up": "📈 普通跳空(上)",
+    "gap_common_down": "📉 普通跳空(下)",
+    "gap_breakaway_up": "📈 突破跳空(上)",
+    "gap_breakaway_down": "📉 突破跳空(下)",
+    "gap_runaway_up": "📈 持續跳空(上)",
+    "gap_runaway_down": "📉 持續跳空(下)",
+    "gap_exhaustion_up": "📈 衰竭跳空(上)",
+    "gap_exhaustion_down": "📉 衰竭跳空(下)",
+    "continuous_up_buy_signal": "📈 連續向上買入",
+    "continuous_down_sell_signal": "📉 連續向下賣出",
+    "sma50_up_trend": "📈 SMA50上升趨勢",
+    "sma50_down_trend": "📉 SMA50下降趨勢",
+    "sma50_200_up_trend": "📈 SMA50_200上升趨勢",
+    "sma50_200_down_trend": "📉 SMA50_200下降趨勢",
+    "new_buy_signal": "📈 新买入信号",
+    "new_sell_signal": "📉 新卖出信号",
+    "new_pivot_signal": "🔄 新转折点",
+}
+
+# 信号的近期成功率文字，如“（近期成功率：近50次 54%、近200次 53%（樣本 57））”；没有样本时为空
+def format_rolling_success(rates):
+    parts = []
+    for window, rate in (rates or {}).items():
+        sample = f"（樣本 {rate['total_signals']}）" if rate["total_signals"] < window else ""
+        parts.append(f"近{window}次 {rate['success_rate']:.0f}%{sample}")
+    return f"（近期成功率：{'、'.join(parts)}）" if parts else ""
+
+# 计算期权相关指标
+def calculate_options_metrics(ticker, stock, warnings=None):
+    try:
+        # 获取最近的期权到期日
+        expiration_dates = stock.options
+        if not expiration_dates:
+            return None, None, None, None, None
+        
+        nearest_expiry = expiration_dates[0]
+        option_chain = stock.option_chain(nearest_expiry)
+        
+        # 计算看跌/看涨比率 (PCR)
+        put_volume = option_chain.puts['volume'].sum()
+        call_volume = option_chain.calls['volume'].sum()
+        pcr = put_volume / call_volume if call_volume > 0 else np.nan
+        
+        # 获取最高未平仓量的行权价
+        max_oi_call = option_chain.calls.loc[option_chain.calls['openInterest'].idxmax()] if not option_chain.calls.empty else None
+        max_oi_put = option_chain.puts.loc[option_chain.puts['openInterest'].idxmax()] if not option_chain.puts.empty else None
+        max_oi_strike = max_oi_call['strike'] if max_oi_call is not None else np.nan
+        max_oi_type = 'Call' if max_oi_call is not None and (max_oi_put is None or max_oi_call['openInterest'] > max_oi_put['openInterest']) else 'Put'
+        
+        # 计算隐含波动率均值
+        iv_call = option_chain.calls['impliedVolatility'].mean() if not option_chain.calls.empty else np.nan
+        iv_put = option_chain.puts['impliedVolatility'].mean() if not option_chain.puts.empty else np.nan
+        avg_iv = np.nanmean([iv_call, iv_put])
+        
+        # 计算跨式期权成本
+        atm_strike = option_chain.calls.loc[abs(option_chain.calls['strike'] - stock.info.get('regularMarketPrice', stock.info.get('previousClose', 0))).idxmin()]
+        straddle_cost = None
+        if not option_chain.calls.empty and not option_chain.puts.empty:
+            call_price = option_chain.calls[option_chain.calls['strike'] == atm_strike['strike']]['lastPrice'].iloc[0] if not option_chain.calls[option_chain.calls['strike'] == atm_strike['strike']].empty else 0
+            put_price = option_chain.puts[option_chain.puts['strike'] == atm_strike['strike']]['lastPrice'].iloc[0] if not option_chain.puts[option_chain.puts['strike'] == atm_strike['strike']].empty else 0
+            straddle_cost = call_price + put_price
+        
+        return pcr, max_oi_strike, max_oi_type, avg_iv, straddle_cost
+    except Exception as e:
+        if warnings is not None:
+            warnings.append(f"⚠️ 無法取得 {ticker} 的期权数据：{e}")
+        return None, None, None, None, None
+
+# 邮件发送函数（已包含期权信号）
+def send_email_alert(ticker, price_pct, volume_pct, pcr=None, iv=None, low_high_signal=False, high_low_signal=False, 
+                     macd_buy_signal=False, macd_sell_signal=False, ema_buy_signal=False, ema_sell_signal=False,
+                     price_trend_buy_signal=False, price_trend_sell_signal=False,
+                     price_trend_vol_buy_signal=False, price_trend_vol_sell_signal=False,
+                     price_trend_vol_pct_buy_signal=False, price_trend_vol_pct_sell_signal=False,
+                     gap_common_up=False, gap_common_down=False, gap_breakaway_up=False, gap_breakaway_down=False,
+                     gap_runaway_up=False, gap_runaway_down=False, gap_exhaustion_up=False, gap_exhaustion_down=False,
+                     continuous_up_buy_signal=False, continuous_down_sell_signal=False,
+                     sma50_up_trend=False, sma50_down_trend=False,
+                     sma50_200_up_trend=False, sma50_200_down_trend=False,
+                     new_buy_signal=False, new_sell_signal=False, new_pivot_signal=False, thresholds=None,
+                     rolling_success_rates=None):
+    thresholds = dict(DEFAULT_THRESHOLDS, **(thresholds or {}))
+    rolling_success_rates = rolling_success_rates or {}
+
+    def reliability(flag):
+        return format_rolling_success(rolling_success_rates.get(ALERT_FLAG_SIGNALS[flag]))
+
+    subject = f"📣 股票異動通知：{ticker}"
+    body = f"""
+    股票代號：{ticker}
+    股價變動：{price_pct:.2f}%
+    成交量變動：{volume_pct:.2f}%
+    """
+    if pcr is not None:
+        body += f"\n📊 看跌/看涨比率 (PCR)：{pcr:.2f}"
+    if iv is not None:
+        body += f"\n📈 平均隐含波动率 (IV)：{iv:.2f}"
+    if low_high_signal:
+        body += f"\n⚠️ 當前最低價高於前一時段最高價！" + reliability("low_high_signal")
+    if high_low_signal:
+        body += f"\n⚠️ 當前最高價低於前一時段最低價！" + reliability("high_low_signal")
+    if macd_buy_signal:
+        body += f"\n📈 MACD 買入訊號：MACD 線由負轉正！" + reliability("macd_buy_signal")
+    if macd_sell_signal:
+        body += f"\n📉 MACD 賣出訊號：MACD 線由正轉負！" + reliability("macd_sell_signal")
+    if ema_buy_signal:
+        body += f"\n📈 EMA 買入訊號：EMA5 上穿 EMA10，成交量放大！" + reliability("ema_buy_signal")
+    if ema_sell_signal:
+        body += f"\n📉 EMA 賣出訊號：EMA5 下破 EMA10，成交量放大！" + reliability("ema_sell_signal")
+    if price_trend_buy_signal:
+        body += f"\n📈 價格趨勢買入訊號：最高價、最低價、收盤價均上漲！" + reliability("price_trend_buy_signal")
+    if price_trend_sell_signal:
+        body += f"\n📉 價格趨勢賣出訊號：最高價、最低價、收盤價均下跌！" + reliability("price_trend_sell_signal")
+    if price_trend_vol_buy_signal:
+        body += f"\n📈 價格趨勢買入訊號（量）：最高價、最低價、收盤價均上漲且成交量放大！" + reliability("price_trend_vol_buy_signal")
+    if price_trend_vol_sell_signal:
+        body += f"\n📉 價格趨勢賣出訊號（量）：最高價、最低價、收盤價均下跌且成交量放大！" + reliability("price_trend_vol_sell_signal")
+    if price_trend_vol_pct_buy_signal:
+        body += f"\n📈 價格趨勢買入訊號（量%）：最高價、最低價、收盤價均上漲且成交量變化 > 15%！" + reliability("price_trend_vol_pct_buy_signal")
+    if price_trend_vol_pct_sell_signal:
+        body += f"\n📉 價格趨勢賣出訊號（量%）：最高價、最低價、收盤價均下跌且成交量變化 > 15%！" + reliability("price_trend_vol_pct_sell_signal")
+    if gap_common_up:
+        body += f"\n📈 普通跳空(上)：價格向上跳空，未伴隨明顯趨勢或成交量放大！" + reliability("gap_common_up")
+    if gap_common_down:
+        body += f"\n📉 普通跳空(下)：價格向下跳空，未伴隨明顯趨勢或成交量放大！" + reliability("gap_common_down")
+    if gap_breakaway_up:
+        body += f"\n📈 突破跳空(上)：價格向上跳空，突破前高且成交量放大！" + reliability("gap_breakaway_up")
+    if gap_breakaway_down:
+        body += f"\n📉 突破跳空(下)：價格向下跳空，跌破前低且成交量放大！" + reliability("gap_breakaway_down")
+    if gap_runaway_up:
+        body += f"\n📈 持續跳空(上)：價格向上跳空，處於上漲趨勢且成交量放大！" + reliability("gap_runaway_up")
+    if gap_runaway_down:
+        body += f"\n📉 持續跳空(下)：價格向下跳空，處於下跌趨勢且成交量放大！" + reliability("gap_runaway_down")
+    if gap_exhaustion_up:
+        body += f"\n📈 衰竭跳空(上)：價格向上跳空，趨勢末端且隨後價格下跌，成交量放大！" + reliability("gap_exhaustion_up")
+    if gap_exhaustion_down:
+        body += f"\n📉 衰竭跳空(下)：價格向下跳空，趨勢末端且隨後價格上漲，成交量放大！" + reliability("gap_exhaustion_down")
+    if continuous_up_buy_signal:
+        body += f"\n📈 連續向上策略買入訊號：至少連續 {thresholds['CONTINUOUS_UP_THRESHOLD']} 根K線上漲！" + reliability("continuous_up_buy_signal")
+    if continuous_down_sell_signal:
+        body += f"\n📉 連續向下策略賣出訊號：至少連續 {thresholds['CONTINUOUS_DOWN_THRESHOLD']} 根K線下跌！" + reliability("continuous_down_sell_signal")
+    if sma50_up_trend:
+        body += f"\n📈 SMA50 上升趨勢：當前價格高於 SMA50！" + reliability("sma50_up_trend")
+    if sma50_down_trend:
+        body += f"\n📉 SMA50 下降趨勢：當前價格低於 SMA50！" + reliability("sma50_down_trend")
+    if sma50_200_up_trend:
+        body += f"\n📈 SMA50_200 上升趨勢：當前價格高於 SMA50 且 SMA50 高於 SMA200！" + reliability("sma50_200_up_trend")
+    if sma50_200_down_trend:
+        body += f"\n📉 SMA50_200 下降趨勢：當前價格低於 SMA50 且 SMA50 低於 SMA200！" + reliability("sma50_200_down_trend")
+    if new_buy_signal:
+        body += f"\n📈 新买入信号：今日收盘价大于开盘价且今日开盘价大于前日收盘价！" + reliability("new_buy_signal")
+    if new_sell_signal:
+        body += f"\n📉 新卖出信号：今日收盘价小于开盘价且今日开盘价小于前日收盘价！" + reliability("new_sell_signal")
+    if new_pivot_signal:
+        body += f"\n🔄 新转折点：|Price Change %| > {thresholds['PRICE_CHANGE_THRESHOLD']}% 且 |Volume Change %| > {thresholds['VOLUME_CHANGE_THRESHOLD']}%！" + reliability("new_pivot_signal")
+    
+    body += "\n系統偵測到異常變動，請立即查看市場情況。"
+    send_mail(subject, body)
+
+# 股票对走势背离的提醒邮件（divergences 来自 comovement.CoMovementMonitor.update）
+def send_divergence_alert(divergences):
+    pairs = "、".join(f"{item['pair'][0]}/{item['pair'][1]}" for item in divergences)
+    subject = f"🔗 股票聯動背離通知：{pairs}"
+    body = "\n".join(f"🔗 {item['message']}" for item in divergences)
+    body += "\n高度相關的股票出現背離，請立即查看市場情況。"
+    send_mail(subject, body)
+
+# 发送纯文本邮件给 RECIPIENT_EMAIL
+def send_mail(subject, body):
+    import smtplib
+    from email.mime.text import MIMEText
+    from email.mime.multipart import MIMEMultipart
+
+    msg = MIMEMultipart()
+    msg["From"] = SENDER_EMAIL
+    msg["To"] = RECIPIENT_EMAIL
+    msg["Subject"] = subject
+    msg.attach(MIMEText(body, "plain"))
+
+    server = smtplib.SMTP_SSL(SMTP_HOST, SMTP_PORT) if SMTP_SSL else smtplib.SMTP(SMTP_HOST, SMTP_PORT)
+    server.login(SENDER_EMAIL, SENDER_PASSWORD)
+    server.sendmail(SENDER_EMAIL, RECIPIENT_EMAIL, msg.as_string())
+    server.quit()
+
+# 检查最新一根K线的 Low > High、High < Low、MACD、EMA、价格趋势、跳空、连续涨跌及 SMA 信号
+def detect_alert_signals(data, thresholds):
+    low_high_signal = len(data) > 1 and data["Low"].iloc[-1] > data["High"].iloc[-2]
+    high_low_signal = len(data) > 1 and data["High"].iloc[-1] < data["Low"].iloc[-2]
+    macd_buy_signal = len(data) > 1 and data["MACD"].iloc[-1] > 0 and data["MACD"].iloc[-2] <= 0
+    macd_sell_signal = len(data) > 1 and data["MACD"].iloc[-1] <= 0 and data["MACD"].iloc[-2] > 0
+    ema_buy_signal = (len(data) > 1 and 
+                     data["EMA5"].iloc[-1] > data["EMA10"].iloc[-1] and 
+                     data["EMA5"].iloc[-2] <= data["EMA10"].iloc[-2] and 
+                     data["Volume"].iloc[-1] > data["Volume"].iloc[-2])
+    ema_sell_signal = (len(data) > 1 and 
+                      data["EMA5"].iloc[-1] < data["EMA10"].iloc[-1] and 
+                      data["EMA5"].iloc[-2] >= data["EMA10"].iloc[-2] and 
+                      data["Volume"].iloc[-1] > data["Volume"].iloc[-2])
+    price_trend_buy_signal = (len(data) > 1 and 
+                             data["High"].iloc[-1] > data["High"].iloc[-2] and 
+                             data["Low"].iloc[-1] > data["Low"].iloc[-2] and 
+                             data["Close"].iloc[-1] > data["Close"].iloc[-2])
+    price_trend_sell_signal = (len(data) > 1 and 
+                              data["High"].iloc[-1] < data["High"].iloc[-2] and 
+                              data["Low"].iloc[-1] < data["Low"].iloc[-2] and 
+                              data["Close"].iloc[-1] < data["Close"].iloc[-2])
+    price_trend_vol_buy_signal = (len(data) > 1 and 
+                                 data["High"].iloc[-1] > data["High"].iloc[-2] and 
+                                 data["Low"].iloc[-1] > data["Low"].iloc[-2] and 
+                                 data["Close"].iloc[-1] > data["Close"].iloc[-2] and 
+                                 data["Volume"].iloc[-1] > data["前5均量"].iloc[-1])
+    price_trend_vol_sell_signal = (len(data) > 1 and 
+                                  data["High"].iloc[-1] < data["High"].iloc[-2] and 
+                                  data["Low"].iloc[-1] < data["Low"].iloc[-2] and 
+                                  data["Close"].iloc[-1] < data["Close"].iloc[-2] and 
+                                  data["Volume"].iloc[-1] > data["前5均量"].iloc[-1])
+    price_trend_vol_pct_buy_signal = (len(data) > 1 and 
+                                     data["High"].iloc[-1] > data["High"].iloc[-2] and 
+                                     data["Low"].iloc[-1] > data["Low"].iloc[-2] and 
+                                     data["Close"].iloc[-1] > data["Close"].iloc[-2] and 
+                                     data["Volume Change %"].iloc[-1] > 15)
+    price_trend_vol_pct_sell_signal = (len(data) > 1 and 
+                                      data["High"].iloc[-1] < data["High"].iloc[-2] and 
+                                      data["Low"].iloc[-1] < data["Low"].iloc[-2] and 
+                                      data["Close"].iloc[-1] < data["Close"].iloc[-2] and 
+                                      data["Volume Change %"].iloc[-1] > 15)
+    new_buy_signal = (len(data) > 1 and 
+                     data["Close"].iloc[-1] > data["Open"].iloc[-1] and 
+                     data["Open"].iloc[-1] > data["Close"].iloc[-2])
+    new_sell_signal = (len(data) > 1 and 
+                      data["Close"].iloc[-1] < data["Open"].iloc[-1] and 
+                      data["Open"].iloc[-1] < data["Close"].iloc[-2])
+    new_pivot_signal = (len(data) > 1 and 
+                       abs(data["Price Change %"].iloc[-1]) > thresholds["PRICE_CHANGE_THRESHOLD"] and 
+                       abs(data["Volume Change %"].iloc[-1]) > thresholds["VOLUME_CHANGE_THRESHOLD"])
+
+    # 跳空信号检测
+    gap_common_up = False
+    gap_common_down = False
+    gap_breakaway_up = False
+    gap_breakaway_down = False
+    gap_runaway_up = False
+    gap_runaway_down = False
+    gap_exhaustion_up = False
+    gap_exhaustion_down = False
+    if len(data) > 1:
+        gap_pct = ((data["Open"].iloc[-1] - data["Close"].iloc[-2]) / data["Close"].iloc[-2]) * 100
+        is_up_gap = gap_pct > thresholds["GAP_THRESHOLD"]
+        is_down_gap = gap_pct < -thresholds["GAP_THRESHOLD"]
+        if is_up_gap or is_down_gap:
+            trend = data["Close"].iloc[-5:].mean() if len(data) >= 5 else 0
+            prev_trend = data["Close"].iloc[-6:-1].mean() if len(data) >= 6 else trend
+            is_up_trend = data["Close"].iloc[-1] > trend and trend > prev_trend
+            is_down_trend = data["Close"].iloc[-1] < trend and trend < prev_trend
+            is_high_volume = data["Volume"].iloc[-1] > data["前5均量"].iloc[-1]
+            is_price_reversal = (len(data) > 2 and
+                                ((is_up_gap and data["Close"].iloc[-1] < data["Close"].iloc[-2]) or
+                                 (is_down_gap and data["Close"].iloc[-1] > data["Close"].iloc[-2])))
+            if is_up_gap:
+                if is_price_reversal and is_high_volume:
+                    gap_exhaustion_up = True
+                elif is_up_trend and is_high_volume:
+                    gap_runaway_up = True
+                elif data["High"].iloc[-1] > data["High"].iloc[-2:-1].max() and is_high_volume:
+                    gap_breakaway_up = True
+                else:
+                    gap_common_up = True
+            elif is_down_gap:
+                if is_price_reversal and is_high_volume:
+                    gap_exhaustion_down = True
+                elif is_down_trend and is_high_volume:
+                    gap_runaway_down = True
+                elif data["Low"].iloc[-1] < data["Low"].iloc[-2:-1].min() and is_high_volume:
+                    gap_breakaway_down = True
+                else:
+                    gap_common_down = True
+
+    # 连续向上/向下信号检测
+    continuous_up_buy_signal = data['Continuous_Up'].iloc[-1] >= thresholds["CONTINUOUS_UP_THRESHOLD"]
+    continuous_down_sell_signal = data['Continuous_Down'].iloc[-1] >= thresholds["CONTINUOUS_DOWN_THRESHOLD"]
+
+    # SMA趋势信号检测
+    sma50_up_trend = False
+    sma50_down_trend = False
+    sma50_200_up_trend = False
+    sma50_200_down_trend = False
+    if pd.notna(data["SMA50"].iloc[-1]):
+        if data["Close"].iloc[-1] > data["SMA50"].iloc[-1]:
+            sma50_up_trend = True
+        elif data["Close"].iloc[-1] < data["SMA50"].iloc[-1]:
+            sma50_down_trend = True
+    if pd.notna(data["SMA50"].iloc[-1]) and pd.notna(data["SMA200"].iloc[-1]):
+        if data["Close"].iloc[-1] > data["SMA50"].iloc[-1] and data["SMA50"].iloc[-1] > data["SMA200"].iloc[-1]:
+            sma50_200_up_trend = True
+        elif data["Close"].iloc[-1] < data["SMA50"].iloc[-1] and data["SMA50"].iloc[-1] < data["SMA200"].iloc[-1]:
+            sma50_200_down_trend = True
+
+    return {
+        "low_high_signal": low_high_signal,
+        "high_low_signal": high_low_signal,
+        "macd_buy_signal": macd_buy_signal,
+        "macd_sell_signal": macd_sell_signal,
+        "ema_buy_signal": ema_buy_signal,
+        "ema_sell_signal": ema_sell_signal,
+        "price_trend_buy_signal": price_trend_buy_signal,
+        "price_trend_sell_signal": price_trend_sell_signal,
+        "price_trend_vol_buy_signal": price_trend_vol_buy_signal,
+        "price_trend_vol_sell_signal": price_trend_vol_sell_signal,
+        "price_trend_vol_pct_buy_signal": price_trend_vol_pct_buy_signal,
+        "price_trend_vol_pct_sell_signal": price_trend_vol_pct_sell_signal,
+        "gap_common_up": gap_common_up,
+        "gap_common_down": gap_common_down,
+        "gap_breakaway_up": gap_breakaway_up,
+        "gap_breakaway_down": gap_breakaway_down,
+        "gap_runaway_up": gap_runaway_up,
+        "gap_runaway_down": gap_runaway_down,
+        "gap_exhaustion_up": gap_exhaustion_up,
+        "gap_exhaustion_down": gap_exhaustion_down,
+        "continuous_up_buy_signal": continuous_up_buy_signal,
+        "continuous_down_sell_signal": continuous_down_sell_signal,
+        "sma50_up_trend": sma50_up_trend,
+        "sma50_down_trend": sma50_down_trend,
+        "sma50_200_up_trend": sma50_200_up_trend,
+        "sma50_200_down_trend": sma50_200_down_trend,
+        "new_buy_signal": new_buy_signal,
+        "new_sell_signal": new_sell_signal,
+        "new_pivot_signal": new_pivot_signal,
+    }
+
+# 触发提醒的信号名称（量价达阈值、各提醒旗标与期权信号），用于按 K线 + 信号 记录已发送的提醒
+def alert_signal_names(price_pct_change, volume_pct_change, pcr, avg_iv, flags, thresholds):
+    names = []
+    if abs(price_pct_change) >= thresholds["PRICE_THRESHOLD"] and abs(volume_pct_change) >= thresholds["VOLUME_THRESHOLD"]:
+        names.append("✅ 量價")
+    names.extend(ALERT_FLAG_SIGNALS[flag] for flag, triggered in flags.items() if triggered)
+    if pcr is not None and pcr > thresholds["PCR_THRESHOLD"]:
+        names.append("📉 高PCR看跌信号")
+    if pcr is not None and pcr < (1 / thresholds["PCR_THRESHOLD"]):
+        names.append("📈 低PCR看涨信号")
+    if avg_iv is not None and avg_iv > thresholds["IV_THRESHOLD"] / 100:
+        names.append("⚠️ 高IV波动预警")
+    return names
+
+# 异动提醒文字：未触发任何提醒时返回 None
+def build_alert_message(ticker, price_pct_change, volume_pct_change, pcr, avg_iv, flags, thresholds):
+    if not ((abs(price_pct_change) >= thresholds["PRICE_THRESHOLD"] and abs(volume_pct_change) >= thresholds["VOLUME_THRESHOLD"]) or
+            any(flags.values()) or
+            (pcr is not None and (pcr > thresholds["PCR_THRESHOLD"] or pcr < (1 / thresholds["PCR_THRESHOLD"]))) or
+            (avg_iv is not None and avg_iv > thresholds["IV_THRESHOLD"] / 100)):
+        return None
+    alert_msg = f"{ticker} 異動：價格 {price_pct_change:.2f}%、成交量 {volume_pct_change:.2f}%"
+    if pcr is not None and pcr > thresholds["PCR_THRESHOLD"]:
+        alert_msg += f"，高PCR看跌信号（PCR={pcr:.2f}）"
+    if pcr is not None and pcr < (1 / thresholds["PCR_THRESHOLD"]):
+        alert_msg += f"，低PCR看涨信号（PCR={pcr:.2f}）"
+    if avg_iv is not None and avg_iv > thresholds["IV_THRESHOLD"] / 100:
+        alert_msg += f"，高IV波动预警（IV={avg_iv:.2f}）"
+    if flags["low_high_signal"]:
+        alert_msg += "，當前最低價高於前一時段最高價"
+    if flags["high_low_signal"]:
+        alert_msg += "，當前最高價低於前一時段最低價"
+    if flags["macd_buy_signal"]:
+        alert_msg += "，MACD 買入訊號（MACD 線由負轉正）"
+    if flags["macd_sell_signal"]:
+        alert_msg += "，MACD 賣出訊號（MACD 線由正轉負）"
+    if flags["ema_buy_signal"]:
+        alert_msg += "，EMA 買入訊號（EMA5 上穿 EMA10，成交量放大）"
+    if flags["ema_sell_signal"]:
+        alert_msg += "，EMA 賣出訊號（EMA5 下破 EMA10，成交量放大）"
+    if flags["price_trend_buy_signal"]:
+        alert_msg += "，價格趨勢買入訊號（最高價、最低價、收盤價均上漲）"
+    if flags["price_trend_sell_signal"]:
+        alert_msg += "，價格趨勢賣出訊號（最高價、最低價、收盤價均下跌）"
+    if flags["price_trend_vol_buy_signal"]:
+        alert_msg += "，價格趨勢買入訊號（量）（最高價、最低價、收盤價均上漲且成交量放大）"
+    if flags["price_trend_vol_sell_signal"]:
+        alert_msg += "，價格趨勢賣出訊號（量）（最高價、最低價、收盤價均下跌且成交量放大）"
+    if flags["price_trend_vol_pct_buy_signal"]:
+        alert_msg += "，價格趨勢買入訊號（量%）（最高價、最低價、收盤價均上漲且成交量變化 > 15%）"
+    if flags["price_trend_vol_pct_sell_signal"]:
+        alert_msg += "，價格趨勢賣出訊號（量%）（最高價、最低價、收盤價均下跌且成交量變化 > 15%）"
+    if flags["gap_common_up"]:
+        alert_msg += "，普通跳空(上)（價格向上跳空，未伴隨明顯趨勢或成交量放大）"
+    if flags["gap_common_down"]:
+        alert_msg += "，普通跳空(下)（價格向下跳空，未伴隨明顯趨勢或成交量放大）"
+    if flags["gap_breakaway_up"]:
+        alert_msg += "，突破跳空(上)（價格向上跳空，突破前高且成交量放大）"
+    if flags["gap_breakaway_down"]:
+        alert_msg += "，突破跳空(下)（價格向下跳空，跌破前低且成交量放大）"
+    if flags["gap_runaway_up"]:
+        alert_msg += "，持續跳空(上)（價格向上跳空，處於上漲趨勢且成交量放大）"
+    if flags["gap_runaway_down"]:
+        alert_msg += "，持續跳空(下)（價格向下跳空，處於下跌趨勢且成交量放大）"
+    if flags["gap_exhaustion_up"]:
+        alert_msg += "，衰竭跳空(上)（價格向上跳空，趨勢末端且隨後價格下跌，成交量放大）"
+    if flags["gap_exhaustion_down"]:
+        alert_msg += "，衰竭跳空(下)（價格向下跳空，趨勢末端且隨後價格上漲，成交量放大）"
+    if flags["continuous_up_buy_signal"]:
+        alert_msg += f"，連續向上策略買入訊號（至少連續 {thresholds['CONTINUOUS_UP_THRESHOLD']} 根K線上漲）"
+    if flags["continuous_down_sell_signal"]:
+        alert_msg += f"，連續向下策略賣出訊號（至少連續 {thresholds['CONTINUOUS_DOWN_THRESHOLD']} 根K線下跌）"
+    if flags["sma50_up_trend"]:
+        alert_msg += "，SMA50 上升趨勢（當前價格高於 SMA50）"
+    if flags["sma50_down_trend"]:
+        alert_msg += "，SMA50 下降趨勢（當前價格低於 SMA50）"
+    if flags["sma50_200_up_trend"]:
+        alert_msg += "，SMA50_200 上升趨勢（當前價格高於 SMA50 且 SMA50 高於 SMA200）"
+    if flags["sma50_200_down_trend"]:
+        alert_msg += "，SMA50_200 下降趨勢（當前價格低於 SMA50 且 SMA50 低於 SMA200）"
+    if flags["new_buy_signal"]:
+        alert_msg += "，新买入信号（今日收盘价大于开盘价且今日开盘价大于前日收盘价）"
+    if flags["new_sell_signal"]:
+        alert_msg += "，新卖出信号（今日收盘价小于开盘价且今日开盘价小于前日收盘价）"
+    if flags["new_pivot_signal"]:
+        alert_msg += f"，新转折点（|Price Change %| > {thresholds['PRICE_CHANGE_THRESHOLD']}% 且 |Volume Change %| > {thresholds['VOLUME_CHANGE_THRESHOLD']}%）"
+    return alert_msg
+
+# 获取历史K线（经 provider 限速与熔断，yfinance 在第一次取数时才导入）
+def fetch_history(ticker, period, interval):
+    stock = get_provider().ticker(ticker)
+    data = stock.history(period=period, interval=interval).reset_index()
+    return stock, data
+
+# 由K线与期权快照计算单只股票的全部状态（不涉及界面，可用于快照、回放等）；
+# 写入事件库时按 K线间隔 + 阈值 区分，interval 为空时只按阈值区分
+def compute_ticker_state(state, data, thresholds, options=None, previous_close=None, store=None, interval=None):
+    ticker = state["ticker"]
+    pcr, max_oi_strike, max_oi_type, avg_iv, straddle_cost = options or (None, None, None, None, None)
+
+    # 计算涨跌幅、均价均量、MACD、EMA、RSI、连续涨跌及 SMA 指标
+    compute_indicators(data)
+
+    # 标记量价异动、Low > High、High < Low、MACD、EMA、价格趋势及期权信号
+    signal_masks = mark_signals(data, thresholds, pcr, avg_iv)
+    if store is not None:
+        store.append_events(ticker, data, signal_masks, settings_key(interval, thresholds))
+
+    # 当前资料
+    current_price = data["Close"].iloc[-1]
+    if previous_close is None:
+        previous_close = current_price
+    price_change = current_price - previous_close
+    price_pct_change = (price_change / previous_close) * 100 if previous_close else 0
+
+    last_volume = data["Volume"].iloc[-1]
+    prev_volume = data["Volume"].iloc[-2] if len(data) > 1 else last_volume
+    volume_change = last_volume - prev_volume
+    volume_pct_change = (volume_change / prev_volume) * 100 if prev_volume else 0
+
+    alert_flags = detect_alert_signals(data, thresholds)
+    state.update({
+        "data": data,
+        "signal_masks": signal_masks,
+        "pcr": pcr,
+        "max_oi_strike": max_oi_strike,
+        "max_oi_type": max_oi_type,
+        "avg_iv": avg_iv,
+        "straddle_cost": straddle_cost,
+        "current_price": current_price,
+        "price_change": price_change,
+        "price_pct_change": price_pct_change,
+        "last_volume": last_volume,
+        "volume_change": volume_change,
+        "volume_pct_change": volume_pct_change,
+        "success_rates": calculate_signal_success_rate(data, signal_masks),
+        "rolling_success_rates": latest_rolling_success_rates(data, signal_masks),
+        "alert_flags": alert_flags,
+        "alert_msg": build_alert_message(ticker, price_pct_change, volume_pct_change, pcr, avg_iv, alert_flags, thresholds),
+    })
+    return state
+
+# 每根K线一个哈希值：界面据此判断K线、指标或信号是否有变化
+def bar_row_hashes(data):
+    return pd.util.hash_pandas_object(data, index=False).to_numpy()
+
+# 摘要表的一行：最新价格、涨跌、成交量与最新一根K线上的信号
+def summarize_ticker_state(state):
+    row = {"股票": state["ticker"], "最新價": None, "漲跌": None, "漲跌幅 (%)": None, "成交量": None,
+           "成交量變動 (%)": None, "PCR": None, "信號數": 0, "最新信號": "", "提醒": False,
+           "狀態": state["error"] or "；".join(state["warnings"]) or "正常"}
+    if state["error"]:
+        return row
+    signals = split_signal_labels(state["data"]["異動標記"].iloc[-1])
+    row.update({
+        "最新價": float(state["current_price"]),
+        "漲跌": float(state["price_change"]),
+        "漲跌幅 (%)": float(state["price_pct_change"]),
+        "成交量": int(state["last_volume"]),
+        "成交量變動 (%)": float(state["volume_pct_change"]),
+        "PCR": None if state["pcr"] is None else float(state["pcr"]),
+        "信號數": len(signals),
+        "最新信號": "、".join(signals),
+        "提醒": bool(state["alert_msg"]),
+    })
+    return row
+
+def new_ticker_state(ticker):
+    return {"ticker": ticker, "updated_at": datetime.now(), "warnings": [], "error": None}
+
+# 获取并计算单只股票：取数失败或数据不足时 state["error"] 为提示文字
+def build_ticker_state(ticker, period, interval, thresholds, store=None):
+    state = new_ticker_state(ticker)
+    try:
+        try:
+            stock, data = fetch_history(ticker, period, interval)
+        except EmptyHistoryError:
+            stock, data = None, pd.DataFrame()
+
+        if data.empty or len(data) < 2:
+            state["error"] = f"⚠️ {ticker} 無數據或數據不足（期間：{period}，間隔：{interval}），請嘗試其他時間範圍或間隔"
+            return state
+
+        if "Date" in data.columns:
+            data = data.rename(columns={"Date": "Datetime"})
+        elif "Datetime" not in data.columns:
+            state["error"] = f"⚠️ {ticker} 數據缺少時間列，無法處理"
+            return state
+
+        # 获取期权数据
+        options = calculate_options_metrics(ticker, stock, state["warnings"])
+        previous_close = stock.info.get("previousClose")
+        compute_ticker_state(state, data, thresholds, options, previous_close, store, interval)
+        for endpoint in getattr(stock, "served_from_cache", []):
+            state["warnings"].append(f"⚠️ {ticker} 的 {endpoint} 端點熔斷中，顯示最近一次成功取得的數據")
+    except Exception as e:
+        state["error"] = f"⚠️ 無法取得 {ticker} 的資料：{e}，將跳過此股票"
+    return state
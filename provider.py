@@ -0,0 +1,386 @@
+import json
+import os
+import socket
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+from urllib.error import HTTPError, URLError
+from urllib.parse import quote, urlencode
+from urllib.request import urlopen
+
+import pandas as pd
+
+# 所有行情请求（K线 / 期权 / 基本资料）共用的令牌桶：每秒补充的请求数与桶容量
+PROVIDER_RATE = float(os.getenv("PROVIDER_RATE", "2"))
+PROVIDER_BURST = float(os.getenv("PROVIDER_BURST", "5"))
+
+# 自适应并发（AIMD）：初始、最小、最大同时请求数
+PROVIDER_CONCURRENCY = int(os.getenv("PROVIDER_CONCURRENCY", "4"))
+PROVIDER_MIN_CONCURRENCY = 1
+PROVIDER_MAX_CONCURRENCY = int(os.getenv("PROVIDER_MAX_CONCURRENCY", "8"))
+
+# 熔断：连续失败次数达到阈值后断开，冷却若干秒后放行一次试探请求
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "3"))
+BREAKER_COOLDOWN = float(os.getenv("BREAKER_COOLDOWN", "60"))
+
+# 设置后改为请求本地模拟服务器（benchmarks/fake_yahoo.py），不访问 Yahoo
+PROVIDER_BASE_URL = os.getenv("PROVIDER_BASE_URL")
+PROVIDER_TIMEOUT = float(os.getenv("PROVIDER_TIMEOUT", "10"))
+
+ENDPOINTS = ["history", "options", "option_chain", "info"]
+
+OptionChain = namedtuple("OptionChain", ["calls", "puts"])
+
+# 熔断中且没有缓存可用
+class CircuitOpenError(Exception):
+    pass
+
+# 被限流（HTTP 429）
+class ThrottledError(Exception):
+    pass
+
+# K线接口没有数据：空表、代号不存在、期间或间隔无效。yfinance 以 raise_errors=True 调用时
+# 超时、5xx 等故障会直接抛出，空表只表示确实没有数据，属于客户端结果，不计入熔断，也不写入缓存
+class EmptyHistoryError(Exception):
+    pass
+
+# yfinance 的“没有数据 / 代号或参数无效”异常（按类名判断，不必导入 yfinance）
+CLIENT_ERROR_NAMES = ("YFTickerMissingError", "YFTzMissingError", "YFPricesMissingError", "YFInvalidPeriodError")
+
+# 失败分类：throttled / timeout 会触发并发减半；no_data 是客户端结果，既不计入熔断也不退避；其余只计入熔断
+def classify_error(error):
+    name = type(error).__name__
+    text = str(error)
+    if isinstance(error, EmptyHistoryError) or name in CLIENT_ERROR_NAMES:
+        return "no_data"
+    if isinstance(error, HTTPError) and error.code in (400, 404):
+        return "no_data"
+    if isinstance(error, ThrottledError) or (isinstance(error, HTTPError) and error.code == 429):
+        return "throttled"
+    if "RateLimit" in name or "429" in text or "Too Many Requests" in text:
+        return "throttled"
+    if isinstance(error, (TimeoutError, socket.timeout)) or "Timeout" in name or "timed out" in text:
+        return "timeout"
+    if isinstance(error, URLError) and isinstance(error.reason, (TimeoutError, socket.timeout)):
+        return "timeout"
+    return "error"
+
+# 令牌桶：按固定速率补充令牌，取不到时等待
+class TokenBucket:
+    def __init__(self, rate=PROVIDER_RATE, capacity=PROVIDER_BURST):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.waited = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                delay = (1 - self.tokens) / self.rate
+                self.waited += delay
+            time.sleep(delay)
+
+    def status(self):
+        with self._lock:
+            self._refill()
+            return {"rate": self.rate, "capacity": self.capacity, "tokens": round(self.tokens, 2),
+                    "waited_s": round(self.waited, 2)}
+
+# 自适应并发上限：成功时每轮加一，遇到限流或超时减半（同一秒内只减一次）
+class AdaptiveConcurrency:
+    def __init__(self, initial=PROVIDER_CONCURRENCY, minimum=PROVIDER_MIN_CONCURRENCY, maximum=PROVIDER_MAX_CONCURRENCY):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.in_flight = 0
+        self.decreases = 0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self, outcome):
+        with self._condition:
+            self.in_flight -= 1
+            if outcome == "ok":
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            elif outcome in ("throttled", "timeout"):
+                now = time.monotonic()
+                if now - self._last_decrease >= 1.0:
+                    self.limit = max(self.minimum, self.limit / 2)
+                    self.decreases += 1
+                    self._last_decrease = now
+            self._condition.notify_all()
+
+    def status(self):
+        with self._condition:
+            return {"limit": int(self.limit), "in_flight": self.in_flight, "decreases": self.decreases}
+
+# 单个端点的熔断器：closed → open（冷却中直接拒绝）→ half_open（放行一次试探）→ closed
+class CircuitBreaker:
+    def __init__(self, failure_threshold=BREAKER_FAILURES, cooldown=BREAKER_COOLDOWN):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = None
+        self.last_error = None
+        self.trips = 0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    # 是否放行本次请求
+    def allow(self):
+        with self._lock:
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = "half_open"
+                self._probing = False
+            if self.state == "closed":
+                return True
+            if self.state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self._probing = False
+
+    # 客户端结果（没有数据、代号无效）：数据源有响应，试探请求算通过，但不清零 closed 状态下的连续失败数
+    def record_client_error(self):
+        with self._lock:
+            if self.state == "half_open":
+                self.state = "closed"
+                self.failures = 0
+            self._probing = False
+
+    def record_failure(self, error):
+        with self._lock:
+            self.failures += 1
+            self.last_error = f"{type(error).__name__}: {error}"
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    self.trips += 1
+                self.state = "open"
+                self.opened_at = time.monotonic()
+                self._probing = False
+
+    def status(self):
+        with self._lock:
+            retry_in = None
+            if self.state == "open":
+                retry_in = round(max(0.0, self.cooldown - (time.monotonic() - self.opened_at)), 1)
+            return {"state": self.state, "failures": self.failures, "trips": self.trips,
+                    "retry_in_s": retry_in, "last_error": self.last_error}
+
+# 直接调用 yfinance（第一次取数时才导入）
+class YahooBackend:
+    name = "yahoo"
+
+    def __init__(self):
+        import yfinance as yf
+
+        self._yf = yf
+
+    # raise_errors=True：否则除限流外的错误都只打日志并返回空表，熔断与并发退避无从触发
+    def history(self, ticker, period, interval):
+        return self._yf.Ticker(ticker).history(period=period, interval=interval, raise_errors=True)
+
+    def options(self, ticker):
+        return self._yf.Ticker(ticker).options
+
+    def option_chain(self, ticker, expiry):
+        chain = self._yf.Ticker(ticker).option_chain(expiry)
+        return OptionChain(chain.calls, chain.puts)
+
+    def info(self, ticker):
+        return self._yf.Ticker(ticker).info
+
+# 请求 JSON 接口的后端，供本地模拟服务器测试限流与熔断
+class HttpBackend:
+    name = "http"
+
+    def __init__(self, base_url, timeout=PROVIDER_TIMEOUT):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def _get(self, path, **params):
+        url = f"{self.base_url}{path}"
+        if params:
+            url += "?" + urlencode(params)
+        with urlopen(url, timeout=self.timeout) as response:
+            return json.load(response)
+
+    def history(self, ticker, period, interval):
+        payload = self._get(f"/history/{quote(ticker)}", period=period, interval=interval)
+        data = pd.DataFrame(payload["data"], columns=payload["columns"])
+        if data.empty:
+            return data
+        index_name = payload.get("index_name", "Datetime")
+        data[index_name] = pd.to_datetime(data[index_name], utc=True).dt.tz_convert(payload.get("tz") or "UTC")
+        return data.set_index(index_name)
+
+    def options(self, ticker):
+        return tuple(self._get(f"/options/{quote(ticker)}")["expirations"])
+
+    def option_chain(self, ticker, expiry):
+        payload = self._get(f"/option_chain/{quote(ticker)}/{quote(expiry)}")
+        return OptionChain(pd.DataFrame(payload["calls"]), pd.DataFrame(payload["puts"]))
+
+    def info(self, ticker):
+        return self._get(f"/info/{quote(ticker)}")
+
+# 行情请求统一入口：令牌桶限速、自适应并发、按端点熔断，熔断期间返回最近一次成功的数据
+class MarketDataProvider:
+    def __init__(self, backend=None, rate=PROVIDER_RATE, burst=PROVIDER_BURST, concurrency=PROVIDER_CONCURRENCY,
+                 max_concurrency=PROVIDER_MAX_CONCURRENCY, failure_threshold=BREAKER_FAILURES, cooldown=BREAKER_COOLDOWN):
+        self._backend = backend
+        self._backend_lock = threading.Lock()
+        self.bucket = TokenBucket(rate, burst)
+        self.concurrency = AdaptiveConcurrency(concurrency, PROVIDER_MIN_CONCURRENCY, max_concurrency)
+        self.breakers = {endpoint: CircuitBreaker(failure_threshold, cooldown) for endpoint in ENDPOINTS}
+        self.counters = {endpoint: {"ok": 0, "no_data": 0, "throttled": 0, "timeout": 0, "error": 0, "cached": 0,
+                                    "rejected": 0}
+                         for endpoint in ENDPOINTS}
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    @property
+    def backend(self):
+        with self._backend_lock:
+            if self._backend is None:
+                self._backend = HttpBackend(PROVIDER_BASE_URL) if PROVIDER_BASE_URL else YahooBackend()
+            return self._backend
+
+    def _count(self, endpoint, outcome):
+        with self._lock:
+            self.counters[endpoint][outcome] += 1
+
+    def _cached(self, key):
+        with self._lock:
+            return self._cache.get(key)
+
+    # 返回 (结果, 是否来自缓存)
+    def call(self, endpoint, *args):
+        key = (endpoint,) + args
+        breaker = self.breakers[endpoint]
+        if not breaker.allow():
+            cached = self._cached(key)
+            if cached is None:
+                self._count(endpoint, "rejected")
+                raise CircuitOpenError(f"{endpoint} 端點熔斷中，約 {breaker.status()['retry_in_s']} 秒後重試")
+            self._count(endpoint, "cached")
+            return cached[0], True
+
+        self.bucket.acquire()
+        self.concurrency.acquire()
+        outcome = "error"
+        try:
+            result = getattr(self.backend, endpoint)(*args)
+            if endpoint == "history" and result.empty:
+                raise EmptyHistoryError(f"{args[0]} 的K線數據為空（期間：{args[1]}，間隔：{args[2]}）")
+            outcome = "ok"
+        except Exception as e:
+            outcome = classify_error(e)
+            self._count(endpoint, outcome)
+            if outcome == "no_data":
+                breaker.record_client_error()
+                if endpoint == "history" and not isinstance(e, EmptyHistoryError):
+                    raise EmptyHistoryError(f"{args[0]} 沒有K線數據（期間：{args[1]}，間隔：{args[2]}）：{e}") from e
+                raise
+            breaker.record_failure(e)
+            cached = self._cached(key)
+            if breaker.status()["state"] == "open" and cached is not None:
+                self._count(endpoint, "cached")
+                return cached[0], True
+            raise
+        finally:
+            self.concurrency.release(outcome)
+        breaker.record_success()
+        self._count(endpoint, "ok")
+        with self._lock:
+            self._cache[key] = (result, datetime.now())
+        return result, False
+
+    def ticker(self, symbol):
+        return ProviderTicker(self, symbol)
+
+    # 供界面显示的限流、并发与熔断状态
+    def status(self):
+        with self._lock:
+            counters = {endpoint: dict(values) for endpoint, values in self.counters.items()}
+            cache_sizes = {endpoint: sum(1 for key in self._cache if key[0] == endpoint) for endpoint in ENDPOINTS}
+        return {
+            "backend": self._backend.name if self._backend is not None else None,
+            "bucket": self.bucket.status(),
+            "concurrency": self.concurrency.status(),
+            "endpoints": {endpoint: dict(self.breakers[endpoint].status(), cached_keys=cache_sizes[endpoint],
+                                         **counters[endpoint])
+                          for endpoint in ENDPOINTS},
+        }
+
+# 与 yf.Ticker 接口一致（history / options / option_chain / info），所有请求经过 provider
+class ProviderTicker:
+    def __init__(self, provider, symbol):
+        self.provider = provider
+        self.ticker = symbol
+        self.served_from_cache = []
+        self._info = None
+
+    def _call(self, endpoint, *args):
+        result, from_cache = self.provider.call(endpoint, self.ticker, *args)
+        if from_cache and endpoint not in self.served_from_cache:
+            self.served_from_cache.append(endpoint)
+        return result
+
+    def history(self, period="1mo", interval="1d"):
+        return self._call("history", period, interval)
+
+    @property
+    def options(self):
+        return self._call("options")
+
+    def option_chain(self, expiry):
+        return self._call("option_chain", expiry)
+
+    @property
+    def info(self):
+        if self._info is None:
+            self._info = self._call("info")
+        return self._info
+
+_provider = None
+_provider_lock = threading.Lock()
+
+# 进程内共用的 provider（线程池的所有取数任务共享同一个令牌桶与熔断器）
+def get_provider():
+    global _provider
+    with _provider_lock:
+        if _provider is None:
+            _provider = MarketDataProvider()
+        return _provider
+
+# 替换进程内共用的 provider（回放、基准测试时指向模拟服务器）
+def set_provider(provider):
+    global _provider
+    with _provider_lock:
+        _provider = provider
+    return provider
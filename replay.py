@@ -0,0 +1,270 @@
+import argparse
+import glob
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import monitor
+from monitor import compute_ticker_state, new_ticker_state, send_email_alert
+from signal_store import SignalEventStore
+from signals import DEFAULT_THRESHOLDS
+
+# 每次回放计算时取的K线数（相当于实时取数的时间范围）
+REPLAY_WINDOW = 390
+
+OPTION_COLUMNS = ["pcr", "max_oi_strike", "max_oi_type", "avg_iv", "straddle_cost"]
+
+# 读取K线 CSV（仪表板下载的格式即可）：文件名中第一个 "_" 之前为股票代号
+def load_bar_files(paths, ticker=None):
+    files = []
+    for path in paths:
+        files.extend(sorted(glob.glob(os.path.join(path, "*.csv"))) if os.path.isdir(path) else [path])
+    histories = {}
+    for path in files:
+        name = ticker or os.path.basename(path).split("_")[0].split(".")[0].upper()
+        data = pd.read_csv(path)
+        if "Date" in data.columns:
+            data = data.rename(columns={"Date": "Datetime"})
+        data["Datetime"] = pd.to_datetime(data["Datetime"], utc=True)
+        data = data[["Datetime", "Open", "High", "Low", "Close", "Volume"]]
+        histories[name] = pd.concat([histories[name], data]) if name in histories else data
+    return {name: data.drop_duplicates("Datetime").sort_values("Datetime").reset_index(drop=True)
+            for name, data in histories.items()}
+
+# 读取期权快照 CSV：ticker、Datetime 及 pcr / max_oi_strike / max_oi_type / avg_iv / straddle_cost
+def load_option_snapshots(path):
+    snapshots = pd.read_csv(path)
+    snapshots["Datetime"] = pd.to_datetime(snapshots["Datetime"], utc=True)
+    for column in OPTION_COLUMNS:
+        if column not in snapshots.columns:
+            snapshots[column] = None
+    return {ticker.upper(): group.sort_values("Datetime").reset_index(drop=True)
+            for ticker, group in snapshots.groupby("ticker")}
+
+# 取 K 线时刻之前最近的一笔期权快照
+def options_at(snapshots, bar_time):
+    if snapshots is None or snapshots.empty:
+        return None
+    position = snapshots["Datetime"].searchsorted(bar_time, side="right") - 1
+    if position < 0:
+        return None
+    row = snapshots.iloc[position]
+    return tuple(None if pd.isna(row[column]) else row[column] for column in OPTION_COLUMNS)
+
+# 每根K线对应的“前收盘价”：日内K线取上一交易日最后一根的收盘价，日K线取前一根的收盘价
+def previous_closes(data):
+    dates = data["Datetime"].dt.date
+    last_close = data.groupby(dates, sort=True)["Close"].last()
+    prior = pd.Series(last_close.shift(1).to_numpy(), index=last_close.index)
+    return dates.map(prior).to_numpy(dtype=float)
+
+def _percentiles(values):
+    if not values:
+        return {"p50": None, "p95": None, "p99": None, "max": None}
+    values = np.asarray(values) * 1000
+    return {"p50": float(np.percentile(values, 50)), "p95": float(np.percentile(values, 95)),
+            "p99": float(np.percentile(values, 99)), "max": float(values.max())}
+
+def _resource_usage():
+    try:
+        import resource
+    except ImportError:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime, usage.ru_maxrss / 1024
+
+# 回放：按K线时间顺序把每根K线送进 取数 → 指标 → 信号 → 提醒 全流程
+# speed 为时间倍率（1 即实时、100 即百倍速），0 表示尽快；延迟从K线按倍率“到达”的时刻算起
+def replay(histories, thresholds=None, speed=0.0, window=REPLAY_WINDOW, workers=1, option_snapshots=None,
+           store=None, send_alert=send_email_alert, progress=None, interval=None):
+    thresholds = dict(DEFAULT_THRESHOLDS, **(thresholds or {}))
+    option_snapshots = option_snapshots or {}
+    closes = {ticker: previous_closes(data) for ticker, data in histories.items()}
+    events = sorted((data["Datetime"].iloc[i], ticker, i)
+                    for ticker, data in histories.items() for i in range(1, len(data)))
+
+    results = []
+    errors = []
+    results_lock = threading.Lock()
+    slots = threading.Semaphore(workers * 2)
+
+    def process(ticker, i, arrived_at):
+        try:
+            data = histories[ticker]
+            bar_time = data["Datetime"].iloc[i]
+            started = time.perf_counter()
+            # 取数：截取到当前这根为止的窗口（相当于实时模式的一次 history() 调用）
+            bars = data.iloc[max(0, i + 1 - window):i + 1].reset_index(drop=True)
+            previous_close = closes[ticker][i]
+            state = compute_ticker_state(new_ticker_state(ticker), bars, thresholds,
+                                         options_at(option_snapshots.get(ticker), bar_time),
+                                         None if np.isnan(previous_close) else previous_close, store, interval)
+            computed = time.perf_counter()
+            alert_error = None
+            if state["alert_msg"]:
+                try:
+                    send_alert(ticker, state["price_pct_change"], state["volume_pct_change"], state["pcr"],
+                               state["avg_iv"], thresholds=thresholds,
+                               rolling_success_rates=state["rolling_success_rates"], **state["alert_flags"])
+                except Exception as e:
+                    alert_error = str(e)
+            finished = time.perf_counter()
+            result = {"ticker": ticker, "bar_time": bar_time, "queued": started - arrived_at,
+                      "compute": computed - started, "total": finished - arrived_at,
+                      "alert": bool(state["alert_msg"]) and alert_error is None, "alert_error": alert_error}
+            with results_lock:
+                results.append(result)
+        except Exception as e:
+            # 计算或提醒流程中的异常要记入报告，否则只表现为K线变少、延迟变低
+            with results_lock:
+                errors.append({"ticker": ticker, "bar_time": histories[ticker]["Datetime"].iloc[i],
+                               "error": f"{type(e).__name__}: {e}"})
+        finally:
+            slots.release()
+
+    usage_before = _resource_usage()
+    first_time = events[0][0] if events else None
+    start = time.perf_counter()
+    max_lag = 0.0
+    futures = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for n, (bar_time, ticker, i) in enumerate(events):
+            if speed > 0:
+                arrived_at = start + (bar_time - first_time).total_seconds() / speed
+                delay = arrived_at - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    max_lag = max(max_lag, -delay)
+            slots.acquire()
+            if speed <= 0:
+                arrived_at = time.perf_counter()
+            futures.append(executor.submit(process, ticker, i, arrived_at))
+            if progress and n % 1000 == 0:
+                progress(n, len(events))
+    elapsed = time.perf_counter() - start
+    for future in futures:
+        error = future.exception()
+        if error is not None:
+            errors.append({"ticker": None, "bar_time": None, "error": f"{type(error).__name__}: {error}"})
+    usage_after = _resource_usage()
+
+    alerts = [r for r in results if r["alert"]]
+    report = {
+        "tickers": len(histories),
+        "bars": len(results),
+        "alerts": len(alerts),
+        "alert_errors": sum(1 for r in results if r["alert_error"]),
+        "errors": len(errors),
+        "error_samples": errors[:5],
+        "elapsed_s": elapsed,
+        "bars_per_s": len(results) / elapsed if elapsed else None,
+        "alerts_per_s": len(alerts) / elapsed if elapsed else None,
+        "speed": speed,
+        "max_schedule_lag_s": max_lag,
+        "bar_to_alert_ms": _percentiles([r["total"] for r in alerts]),
+        "compute_ms": _percentiles([r["compute"] for r in results]),
+        "queue_ms": _percentiles([r["queued"] for r in results]),
+    }
+    if usage_before and usage_after:
+        cpu = usage_after[0] - usage_before[0]
+        report.update({"cpu_s": cpu, "cpu_util_pct": cpu / elapsed * 100 if elapsed else None,
+                       "peak_rss_mb": usage_after[1]})
+    return report
+
+def format_report(report):
+    def ms(stats):
+        if stats["p50"] is None:
+            return "—"
+        return f"p50 {stats['p50']:.1f}  p95 {stats['p95']:.1f}  p99 {stats['p99']:.1f}  max {stats['max']:.1f} ms"
+
+    speed = "尽快" if report["speed"] <= 0 else f"{report['speed']:g}×"
+    lines = [
+        f"回放倍率：{speed}，{report['tickers']} 檔股票，{report['bars']} 根K線，耗時 {report['elapsed_s']:.2f} 秒",
+        f"吞吐：{report['bars_per_s']:.1f} 根K線/秒，{report['alerts_per_s']:.2f} 則提醒/秒"
+        f"（共 {report['alerts']} 則，發送失敗 {report['alert_errors']} 則）",
+        f"K線到提醒延遲：{ms(report['bar_to_alert_ms'])}",
+        f"單根計算耗時：{ms(report['compute_ms'])}",
+        f"排隊等待：{ms(report['queue_ms'])}",
+    ]
+    if report["errors"]:
+        lines.append(f"❌ 處理失敗 {report['errors']} 根K線（未計入上述統計）：")
+        lines.extend(f"   {e['ticker']} {e['bar_time']}：{e['error']}" for e in report["error_samples"])
+    if report["speed"] > 0:
+        lines.append(f"最大落後排程：{report['max_schedule_lag_s']:.3f} 秒")
+    if "cpu_s" in report:
+        lines.append(f"CPU：{report['cpu_s']:.2f} 秒（平均 {report['cpu_util_pct']:.0f}% 單核），峰值記憶體 {report['peak_rss_mb']:.0f} MB")
+    return "\n".join(lines)
+
+# 让 send_email_alert 发到本地 SMTP 替身，返回替身
+def use_smtp_sink():
+    from smtp_sink import SmtpSink
+
+    sink = SmtpSink(keep_messages=False).start()
+    monitor.SMTP_HOST, monitor.SMTP_PORT = sink.address
+    monitor.SMTP_SSL = False
+    monitor.SENDER_EMAIL = monitor.SENDER_EMAIL or "replay@localhost"
+    monitor.SENDER_PASSWORD = monitor.SENDER_PASSWORD or "replay"
+    monitor.RECIPIENT_EMAIL = monitor.RECIPIENT_EMAIL or "replay@localhost"
+    return sink
+
+def _parse_speed(text):
+    return 0.0 if text.lower() in ("max", "0", "inf") else float(text.rstrip("xX×"))
+
+def main():
+    parser = argparse.ArgumentParser(description="以历史K线回放 取数 → 指标 → 信号 → 提醒 全流程")
+    parser.add_argument("bars", nargs="*", help="K线 CSV 文件或目录（文件名前缀为股票代号）")
+    parser.add_argument("--ticker", help="只有一个 CSV 时指定股票代号")
+    parser.add_argument("--fetch", help="改为先取数再回放：股票代號（逗號分隔）")
+    parser.add_argument("--period", default="5d")
+    parser.add_argument("--interval", default="1m", help="K线间隔（取数用，也用于区分事件库中的设置）")
+    parser.add_argument("--options", help="期权快照 CSV（ticker, Datetime, pcr, max_oi_strike, max_oi_type, avg_iv, straddle_cost）")
+    parser.add_argument("--speed", action="append", default=[], help="回放倍率，可重复：1、100、max（默认 max）")
+    parser.add_argument("--window", type=int, default=REPLAY_WINDOW, help="每次计算取的K线数")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--store", help="信号事件库目录（默认临时目录，结束后删除）")
+    parser.add_argument("--real-smtp", action="store_true", help="使用 .env 中的真实发信服务器，而非本地替身")
+    args = parser.parse_args()
+
+    if args.fetch:
+        from signal_optimizer import fetch_histories
+
+        histories = fetch_histories([t.strip().upper() for t in args.fetch.split(",") if t.strip()],
+                                    args.period, args.interval)
+    else:
+        histories = load_bar_files(args.bars, args.ticker)
+    if not histories:
+        parser.error("沒有可回放的K線")
+    option_snapshots = load_option_snapshots(args.options) if args.options else None
+    sink = None if args.real_smtp else use_smtp_sink()
+
+    failed = False
+    for speed in [_parse_speed(text) for text in args.speed] or [0.0]:
+        received_before = sink.received if sink is not None else 0
+        store_dir = args.store or tempfile.mkdtemp(prefix="replay-events-")
+        store = SignalEventStore(store_dir)
+        try:
+            report = replay(histories, speed=speed, window=args.window, workers=args.workers,
+                            option_snapshots=option_snapshots, store=store, interval=args.interval)
+        finally:
+            store.close()
+            if not args.store:
+                shutil.rmtree(store_dir, ignore_errors=True)
+        print(format_report(report))
+        if sink is not None:
+            print(f"SMTP 替身收到 {sink.received - received_before} 封郵件")
+        print()
+        failed = failed or bool(report["errors"] or report["alert_errors"])
+    # 有K线处理失败或提醒发送失败时以非零状态退出，便于脚本 / CI 判断
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows 没有 fcntl，只能假定单一发布者
+    fcntl = None
+
+import numpy as np
+import pandas as pd
+
+from signals import decode_signal_bitmask, encode_signal_bitmask, labels_from_bitmask
+
+# 共享数组目录：优先放在内存文件系统 /dev/shm，读者直接映射同一份页面
+SHARED_BARS_DIR = os.getenv(
+    "SHARED_BARS_DIR",
+    "/dev/shm/stock-monitor" if os.path.isdir("/dev/shm") else os.path.join(tempfile.gettempdir(), "stock-monitor"))
+
+SIGNAL_BITS_FILE = "signals.npy"
+GENERATION_META_FILE = "meta.json"
+
+# 保留的旧版本数：读者可能还映射着上一版的文件
+KEEP_GENERATIONS = 2
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (datetime, pd.Timestamp)):
+        return value.isoformat()
+    raise TypeError(f"无法序列化 {type(value).__name__}")
+
+# 同一只股票在不同的 period / interval / 阈值下是不同的数据，按设置哈希分开命名空间
+def shared_key(ticker, period, interval, thresholds):
+    settings = json.dumps([period, interval, thresholds], sort_keys=True, default=_json_default)
+    return f"{ticker}-{hashlib.blake2b(settings.encode('utf-8'), digest_size=6).hexdigest()}"
+
+# 跨进程互斥（每个 key 一个锁文件），保护版本号递增与写入
+@contextmanager
+def _locked(path):
+    if fcntl is None:
+        yield
+        return
+    with open(path, "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+def _write_array(path, values):
+    array = np.lib.format.open_memmap(path, mode="w+", dtype=values.dtype, shape=values.shape)
+    array[:] = values
+    array.flush()
+    del array
+
+# 发布端：内容有变化时写一个新版本目录，再原子替换元数据文件并递增版本号；
+# key 为 shared_key() 的结果，版本递增与写入在文件锁内进行，多个进程同时发布也不会写同一目录
+class SharedBarStore:
+    def __init__(self, root=SHARED_BARS_DIR):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def _meta_path(self, key):
+        return os.path.join(self.root, f"{key}.json")
+
+    def _read_json(self, path):
+        try:
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def read_meta(self, key, version=None):
+        if version is None:
+            return self._read_json(self._meta_path(key))
+        return self._read_json(os.path.join(self.root, f"{key}.v{version}", GENERATION_META_FILE))
+
+    def version(self, key):
+        meta = self.read_meta(key)
+        return meta["version"] if meta else 0
+
+    # 发布一只股票的 K 线、指标列与信号位图；extra 为随版本一起保存的轻量状态。
+    # 内容与当前版本相同时不写文件、不递增版本，读者也就不必重新读取
+    def publish(self, key, data, masks=None, extra=None):
+        arrays = []
+        for name in data.columns:
+            series = data[name]
+            if pd.api.types.is_datetime64_any_dtype(series):
+                tz = str(series.dt.tz) if series.dt.tz is not None else None
+                if tz:
+                    series = series.dt.tz_convert("UTC").dt.tz_localize(None)
+                arrays.append((name, series.to_numpy(dtype="datetime64[ns]").view(np.int64), "datetime", tz))
+            elif pd.api.types.is_bool_dtype(series) or pd.api.types.is_numeric_dtype(series):
+                arrays.append((name, series.to_numpy(), "value", None))
+        bits = encode_signal_bitmask(masks, len(data)) if masks is not None else None
+
+        digest = hashlib.blake2b(digest_size=16)
+        for name, values, kind, tz in arrays:
+            digest.update(json.dumps([name, kind, tz, values.dtype.str, len(values)], ensure_ascii=False).encode("utf-8"))
+            digest.update(np.ascontiguousarray(values).tobytes())
+        if bits is not None:
+            digest.update(bits.tobytes())
+        digest.update(json.dumps(extra or {}, sort_keys=True, default=_json_default).encode("utf-8"))
+        content_hash = digest.hexdigest()
+
+        with _locked(os.path.join(self.root, f"{key}.lock")):
+            current = self.read_meta(key)
+            if current and current.get("content_hash") == content_hash:
+                return current["version"]
+            version = (current["version"] if current else 0) + 1
+            generation = f"{key}.v{version}"
+            directory = os.path.join(self.root, generation)
+            os.makedirs(directory, exist_ok=True)
+
+            columns = []
+            for name, values, kind, tz in arrays:
+                file_name = f"c{len(columns)}.npy"
+                _write_array(os.path.join(directory, file_name), values)
+                columns.append({"name": name, "file": file_name, "kind": kind, "tz": tz})
+            if bits is not None:
+                _write_array(os.path.join(directory, SIGNAL_BITS_FILE), bits)
+
+            meta = {
+                "key": key,
+                "version": version,
+                "generation": generation,
+                "content_hash": content_hash,
+                "n_bars": len(data),
+                "columns": columns,
+                "signals": bits is not None,
+                "published_at": datetime.now().isoformat(),
+                "extra": extra or {},
+            }
+            # 版本目录内留一份元数据，读者可按确切版本挂载
+            for path in (os.path.join(directory, GENERATION_META_FILE), self._meta_path(key)):
+                temp_path = path + ".tmp"
+                with open(temp_path, "w", encoding="utf-8") as f:
+                    json.dump(meta, f, ensure_ascii=False, default=_json_default)
+                os.replace(temp_path, path)
+
+            stale = version - KEEP_GENERATIONS
+            while stale > 0 and os.path.isdir(os.path.join(self.root, f"{key}.v{stale}")):
+                shutil.rmtree(os.path.join(self.root, f"{key}.v{stale}"), ignore_errors=True)
+                stale -= 1
+        return version
+
+# 读取端：只映射不复制，版本号不变时直接复用已映射的数组
+class SharedBarReader:
+    def __init__(self, root=SHARED_BARS_DIR):
+        self.store = SharedBarStore(root)
+        self._attached = {}
+        self._frames = {}
+
+    # 返回 (meta, {列名: 只读 memmap})；version 指定时挂载该版本（已被清理则退回最新版），
+    # 否则挂载最新版；版本未变化时不重新打开文件
+    def attach(self, key, version=None):
+        cached = self._attached.get(key)
+        if cached and version is not None and cached[0]["version"] == version:
+            return cached
+        meta = self.store.read_meta(key, version) if version is not None else None
+        if meta is None:
+            meta = self.store.read_meta(key)
+        if meta is None:
+            return None, {}
+        if cached and cached[0]["version"] == meta["version"]:
+            return cached
+        try:
+            arrays = self._load(meta)
+        except FileNotFoundError:
+            # 读元数据与打开文件之间该版本被新发布清理，改挂最新版；最新版也没有时与未发布一样处理
+            meta = self.store.read_meta(key)
+            if meta is None:
+                return None, {}
+            arrays = self._load(meta)
+        self._attached[key] = (meta, arrays)
+        return meta, arrays
+
+    def _load(self, meta):
+        directory = os.path.join(self.store.root, meta["generation"])
+        arrays = {column["name"]: np.load(os.path.join(directory, column["file"]), mmap_mode="r")
+                  for column in meta["columns"]}
+        if meta["signals"]:
+            arrays[SIGNAL_BITS_FILE] = np.load(os.path.join(directory, SIGNAL_BITS_FILE), mmap_mode="r")
+        return arrays
+
+    def changed(self, key):
+        cached = self._attached.get(key)
+        return cached is None or cached[0]["version"] != self.store.version(key)
+
+    def masks(self, key, version=None):
+        _, arrays = self.attach(key, version)
+        bits = arrays.get(SIGNAL_BITS_FILE)
+        return decode_signal_bitmask(bits) if bits is not None else None
+
+    # 组装成 DataFrame（按版本缓存），并由位图还原異動標記：数值列直接引用只读 memmap、不复制，
+    # 只有带时区的时间列转换时会生成新数组；DataFrame 不能原地修改这些列
+    def frame(self, key, version=None):
+        meta, arrays = self.attach(key, version)
+        if meta is None:
+            return None
+        cached = self._frames.get(key)
+        if cached and cached[0] == meta["version"]:
+            return cached[1]
+        data = {}
+        for column in meta["columns"]:
+            values = arrays[column["name"]]
+            if column["kind"] == "datetime":
+                values = pd.to_datetime(values.view("datetime64[ns]"))
+                if column["tz"]:
+                    values = values.tz_localize("UTC").tz_convert(column["tz"])
+            data[column["name"]] = values
+        frame = pd.DataFrame(data, copy=False)
+        bits = arrays.get(SIGNAL_BITS_FILE)
+        if bits is not None:
+            frame["異動標記"] = labels_from_bitmask(bits)
+        self._frames[key] = (meta["version"], frame)
+        return frame
+
+# 子进程任务：取数并计算后把数组发布到共享目录，只把轻量状态传回主进程
+def build_and_publish(ticker, period, interval, thresholds, root=SHARED_BARS_DIR):
+    from monitor import build_ticker_state
+
+    state = build_ticker_state(ticker, period, interval, thresholds)
+    if state["error"]:
+        return state
+    data = state.pop("data")
+    masks = state.pop("signal_masks")
+    state["shared_key"] = shared_key(ticker, period, interval, thresholds)
+    state["shared_version"] = SharedBarStore(root).publish(state["shared_key"], data, masks)
+    return state
+
+# 主进程：把共享数组挂回状态，补齐 data 与 signal_masks
+def attach_shared_state(state, reader):
+    if state["error"] or "shared_version" not in state:
+        return state
+    state = dict(state)
+    state["data"] = reader.frame(state["shared_key"], state["shared_version"])
+    state["signal_masks"] = reader.masks(state["shared_key"], state["shared_version"])
+    return state
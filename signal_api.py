@@ -0,0 +1,268 @@
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+import numpy as np
+import pandas as pd
+
+from monitor import summarize_ticker_state
+from signals import split_signal_labels
+from snapshot import SNAPSHOT_PATH, load_snapshot
+
+# 信号接口的监听地址与端口（仪表板设置了 SIGNAL_API_PORT 时随仪表板一起启动）
+SIGNAL_API_HOST = os.getenv("SIGNAL_API_HOST", "127.0.0.1")
+SIGNAL_API_PORT = int(os.getenv("SIGNAL_API_PORT", "0"))
+
+# 每只股票返回的最近K线数与列
+SIGNAL_API_BARS = int(os.getenv("SIGNAL_API_BARS", "100"))
+API_COLUMNS = ["Datetime", "Open", "High", "Low", "Close", "Volume", "Price Change %", "Volume Change %", "前5均量",
+               "MACD", "Signal", "EMA5", "EMA10", "RSI", "RSI_MA9", "SMA50", "SMA200", "異動標記"]
+STATE_FIELDS = ["current_price", "price_change", "price_pct_change", "last_volume", "volume_change",
+                "volume_pct_change", "pcr", "max_oi_strike", "max_oi_type", "avg_iv", "straddle_cost"]
+
+# 同一组设置下，多个会话的自选股合并发布；超过这么多秒没有再被发布的股票才移除
+SIGNAL_API_STALE = float(os.getenv("SIGNAL_API_STALE", "900"))
+
+# 按股票子集拼接的批量响应最多缓存的组合数
+BATCH_CACHE_SIZE = 256
+
+# 预先算好的响应：原文、gzip 压缩后的内容与 ETag
+CachedResponse = namedtuple("CachedResponse", ["body", "gzipped", "etag"])
+
+def _plain(value):
+    if isinstance(value, dict):
+        return {str(key): _plain(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(item) for item in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not np.isfinite(value):
+        return None
+    if isinstance(value, (datetime, pd.Timestamp)):
+        return value.isoformat()
+    return value
+
+def _dumps(payload):
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def make_response(body, compress=True):
+    etag = 'W/"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+    return CachedResponse(body, gzip.compress(body, 6) if compress else None, etag)
+
+# 单只股票的接口内容：最新价格与期权数据、最新一根K线的信号、提醒及最近若干根K线与指标
+# （不含刷新时间，数据没变时内容与 ETag 保持不变，轮询方得到 304）
+def build_ticker_payload(state, n_bars=SIGNAL_API_BARS):
+    payload = {"ticker": state["ticker"], "error": state["error"], "warnings": list(state["warnings"])}
+    if state["error"]:
+        return payload
+    data = state["data"]
+    bars = data[[column for column in API_COLUMNS if column in data.columns]].tail(n_bars)
+    payload.update({name: _plain(state.get(name)) for name in STATE_FIELDS})
+    payload.update({
+        "bar_time": _plain(data["Datetime"].iloc[-1]),
+        "signals": split_signal_labels(data["異動標記"].iloc[-1]),
+        "alert": state["alert_msg"],
+        "alert_flags": [name for name, value in state["alert_flags"].items() if value],
+        "success_rates": _plain(state["success_rates"]),
+        "rolling_success_rates": _plain(state.get("rolling_success_rates", {})),
+        "bars": json.loads(bars.to_json(orient="split", index=False, date_format="iso", force_ascii=False)),
+    })
+    return payload
+
+# 预计算的信号接口：每次刷新后 publish 一次，请求只查表返回现成的字节。
+# 设置相同的发布按股票合并（各会话自选股不同也不会互相挤掉），设置不同则整体替换
+class SignalApi:
+    def __init__(self, n_bars=SIGNAL_API_BARS, stale=SIGNAL_API_STALE):
+        self.n_bars = n_bars
+        self.stale = stale
+        self.version = 0
+        self.published_at = None
+        self.settings = {}
+        self.tickers = []
+        # (各响应, 按股票子集拼接的批量响应缓存)：发布时整体替换，处理中的请求仍读到完整的旧版本
+        self.published = ({}, {})
+        self._summaries = {}
+        self._seen = {}
+        self._lock = threading.Lock()
+
+    # 内容未变的响应沿用上一版（不重新压缩，ETag 不变）
+    def publish(self, states, settings=None):
+        settings = _plain(settings or {})
+        now = time.monotonic()
+        with self._lock:
+            previous = self.published[0]
+            responses = {}
+
+            def put(key, body):
+                old = previous.get(key)
+                responses[key] = old if old is not None and old.body == body else make_response(body)
+
+            kept = []
+            if settings == self.settings:
+                kept = [ticker for ticker in self.tickers
+                        if ticker not in states and now - self._seen.get(ticker, now) < self.stale]
+            seen = {ticker: self._seen[ticker] for ticker in kept}
+            summaries = {ticker: self._summaries[ticker] for ticker in kept}
+            for ticker in kept:
+                responses[("ticker", ticker)] = previous[("ticker", ticker)]
+            for ticker in states:
+                put(("ticker", ticker), _dumps(build_ticker_payload(states[ticker], self.n_bars)))
+                summaries[ticker] = _dumps(_plain(summarize_ticker_state(states[ticker])))
+                seen[ticker] = now
+            # 已发布过的股票保持原来的顺序，新股票排在后面
+            tickers = [ticker for ticker in self.tickers if ticker in seen]
+            tickers += [ticker for ticker in states if ticker not in tickers]
+            put("summary", b"[" + b",".join(summaries[ticker] for ticker in tickers) + b"]")
+            put("batch", self._batch_body(responses, tickers))
+            changed = responses.keys() != previous.keys() or any(
+                previous[key] is not response for key, response in responses.items())
+            self.published = (responses, {})
+            self.tickers = tickers
+            self._summaries = summaries
+            self._seen = seen
+            self.settings = settings
+            self.published_at = datetime.now()
+            if changed:
+                self.version += 1
+        return self.version
+
+    # 批量响应直接拼接各股票已序列化的字节，不重新序列化
+    def _batch_body(self, responses, tickers):
+        parts = [_dumps(ticker) + b":" + responses[("ticker", ticker)].body for ticker in tickers]
+        return b'{"tickers":' + _dumps(tickers) + b',"signals":{' + b",".join(parts) + b"}}"
+
+    def batch(self, tickers):
+        responses, batches = self.published
+        key = tuple(tickers)
+        response = batches.get(key)
+        if response is None:
+            if len(batches) >= BATCH_CACHE_SIZE:
+                batches.clear()
+            found = [ticker for ticker in dict.fromkeys(tickers) if ("ticker", ticker) in responses]
+            response = batches[key] = make_response(self._batch_body(responses, found))
+        return response
+
+    def health(self):
+        return make_response(_dumps({"version": self.version, "published_at": _plain(self.published_at),
+                                     "tickers": len(self.tickers), "settings": self.settings}), compress=False)
+
+    # 路由：返回 (状态码, CachedResponse)
+    def lookup(self, path, query):
+        responses = self.published[0]
+        parts = [unquote(part) for part in path.strip("/").split("/") if part]
+        if parts == ["health"]:
+            return 200, self.health()
+        if parts == ["summary"]:
+            return (200, responses["summary"]) if "summary" in responses else (503, NOT_READY)
+        if parts == ["signals"]:
+            if "tickers" in query:
+                return 200, self.batch([t.strip().upper() for text in query["tickers"] for t in text.split(",") if t.strip()])
+            return (200, responses["batch"]) if "batch" in responses else (503, NOT_READY)
+        if len(parts) == 2 and parts[0] == "signals":
+            response = responses.get(("ticker", parts[1].upper()))
+            return (200, response) if response is not None else (404, NOT_FOUND)
+        return 404, NOT_FOUND
+
+NOT_FOUND = make_response(_dumps({"error": "Not Found"}), compress=False)
+NOT_READY = make_response(_dumps({"error": "尚未有計算結果"}), compress=False)
+
+def _etag_matches(header, etag):
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(",")]
+    return "*" in tags or etag.removeprefix("W/") in (tag.removeprefix("W/") for tag in tags)
+
+class SignalApiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        status, response = self.server.api.lookup(url.path, parse_qs(url.query))
+        if status == 200 and _etag_matches(self.headers.get("If-None-Match"), response.etag):
+            self.send_response(304)
+            self.send_header("ETag", response.etag)
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Vary", "Accept-Encoding")
+            self.end_headers()
+            return
+        body = response.body
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        if response.gzipped is not None and "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = response.gzipped
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        if status == 200:
+            self.send_header("ETag", response.etag)
+            self.send_header("Cache-Control", "no-cache")
+        self.send_header("Vary", "Accept-Encoding")
+        self.end_headers()
+        self.wfile.write(body)
+
+class SignalApiServer(ThreadingHTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    # 数百个轮询客户端同时建连时，默认的 5 个排队名额会让多余的连接被重置
+    request_queue_size = 256
+
+    def __init__(self, api, host=SIGNAL_API_HOST, port=SIGNAL_API_PORT):
+        super().__init__((host, port), SignalApiHandler)
+        self.api = api
+
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    # 在后台线程运行，返回自身
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+# 独立运行时：监视仪表板每次刷新写出的快照文件，有变化就重新发布
+def watch_snapshot(api, path=SNAPSHOT_PATH, poll=1.0):
+    last_mtime = None
+    while True:
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime is not None and mtime != last_mtime:
+            snapshot = load_snapshot(path)
+            if snapshot is not None:
+                api.publish(snapshot["states"], snapshot["settings"])
+                last_mtime = mtime
+        time.sleep(poll)
+
+def main():
+    parser = argparse.ArgumentParser(description="信号 JSON 接口：读取仪表板的快照文件，提供预计算的最新K线、指标与信号")
+    parser.add_argument("--host", default=SIGNAL_API_HOST)
+    parser.add_argument("--port", type=int, default=SIGNAL_API_PORT or 8787)
+    parser.add_argument("--snapshot", default=SNAPSHOT_PATH, help="仪表板写出的快照文件")
+    parser.add_argument("--poll", type=float, default=1.0, help="检查快照文件的间隔（秒）")
+    parser.add_argument("--bars", type=int, default=SIGNAL_API_BARS, help="每只股票返回的最近K线数")
+    args = parser.parse_args()
+
+    api = SignalApi(args.bars)
+    server = SignalApiServer(api, args.host, args.port).start()
+    print(f"signal api listening on {server.url()}  (/signals, /signals/<ticker>, /signals?tickers=A,B, /summary, /health)",
+          flush=True)
+    try:
+        watch_snapshot(api, args.snapshot, args.poll)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+import argparse
+import itertools
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from signals import (DEFAULT_THRESHOLDS, KEY_PIVOT_SIGNAL, SELL_SIGNALS, SIGNAL_NAMES,
+                     compute_indicators, compute_signal_masks, signal_outcomes)
+
+# 默认扫描网格（未列出的阈值取 DEFAULT_THRESHOLDS）
+DEFAULT_GRID = {
+    "PRICE_THRESHOLD": [20.0, 40.0, 60.0, 80.0, 100.0],
+    "VOLUME_THRESHOLD": [20.0, 40.0, 60.0, 80.0, 100.0],
+    "GAP_THRESHOLD": [0.5, 1.0, 2.0, 3.0],
+    "CONTINUOUS_UP_THRESHOLD": [2, 3, 4, 5],
+    "PCR_THRESHOLD": [1.2, 1.5, 2.0],
+}
+
+# 每次广播计算的阈值组合数，控制 (组合数 × K线数) 掩码的内存占用
+SWEEP_CHUNK_SIZE = 512
+
+# 展开阈值网格为组合表，每行一组阈值
+def build_threshold_grid(grid=None):
+    grid = dict(DEFAULT_GRID if grid is None else grid)
+    unknown = set(grid) - set(DEFAULT_THRESHOLDS)
+    if unknown:
+        raise ValueError(f"未知的阈值：{', '.join(sorted(unknown))}")
+    names = list(grid)
+    combos = pd.DataFrame(list(itertools.product(*(grid[name] for name in names))), columns=names)
+    return combos
+
+# 单只股票的阈值扫描：返回每组阈值 × 每个信号的触发次数与成功次数
+def sweep_ticker(data, combos, pcr=None, avg_iv=None, chunk_size=SWEEP_CHUNK_SIZE):
+    if "MACD" not in data.columns:
+        data = compute_indicators(data.copy())
+    signal_names = SIGNAL_NAMES + [KEY_PIVOT_SIGNAL]
+    up_success, down_success = signal_outcomes(data)
+    n_bars = len(data)
+    triggers = np.zeros((len(combos), len(signal_names)), dtype=np.int64)
+    successes = np.zeros((len(combos), len(signal_names)), dtype=np.int64)
+
+    for start in range(0, len(combos), chunk_size):
+        chunk = combos.iloc[start:start + chunk_size]
+        thresholds = {name: chunk[name].to_numpy(dtype=float)[:, None] for name in chunk.columns}
+        masks = compute_signal_masks(data, thresholds, pcr, avg_iv)
+        for j, name in enumerate(signal_names):
+            outcome = down_success if name in SELL_SIGNALS else up_success
+            mask = np.asarray(masks[name])
+            # 与阈值无关的信号只算一次，再广播到所有组合
+            if mask.ndim < 2:
+                mask = np.broadcast_to(mask, (n_bars,))
+                triggers[start:start + len(chunk), j] = mask.sum()
+                successes[start:start + len(chunk), j] = (mask & outcome).sum()
+            else:
+                mask = np.broadcast_to(mask, (len(chunk), n_bars))
+                triggers[start:start + len(chunk), j] = mask.sum(axis=1)
+                successes[start:start + len(chunk), j] = (mask & outcome).sum(axis=1)
+    return triggers, successes
+
+def _sweep_job(args):
+    ticker, data, combos, pcr, avg_iv = args
+    return ticker, sweep_ticker(data, combos, pcr, avg_iv)
+
+# 实际扫描的网格：没有任何期权数据时 PCR 信号不会触发，去掉 PCR_THRESHOLD，免得组合数成倍增加却全是零触发
+def effective_grid(grid=None, options=None):
+    grid = dict(DEFAULT_GRID if grid is None else grid)
+    if not any(pcr is not None for pcr, _ in (options or {}).values()):
+        grid.pop("PCR_THRESHOLD", None)
+    return grid
+
+# 多只股票并行扫描，汇总后输出每组阈值下各信号的成功率与触发次数
+# histories: {ticker: 历史K线 DataFrame}；options: {ticker: (pcr, avg_iv)}
+def run_threshold_sweep(histories, grid=None, options=None, max_workers=None):
+    options = options or {}
+    combos = build_threshold_grid(effective_grid(grid, options))
+    jobs = [(ticker, data, combos) + tuple(options.get(ticker, (None, None)))
+            for ticker, data in histories.items() if len(data) >= 2]
+    signal_names = SIGNAL_NAMES + [KEY_PIVOT_SIGNAL]
+    triggers = np.zeros((len(combos), len(signal_names)), dtype=np.int64)
+    successes = np.zeros_like(triggers)
+    if jobs:
+        workers = max_workers or min(len(jobs), os.cpu_count() or 1)
+        if workers > 1:
+            # 仪表板在多线程的 Streamlit 进程里调用，fork 会复制持锁的线程状态，统一用 spawn
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+                results = list(executor.map(_sweep_job, jobs))
+        else:
+            results = [_sweep_job(job) for job in jobs]
+        for _, (ticker_triggers, ticker_successes) in results:
+            triggers += ticker_triggers
+            successes += ticker_successes
+
+    result = combos.loc[combos.index.repeat(len(signal_names))].reset_index(drop=True)
+    result["信号"] = signal_names * len(combos)
+    result["触发次数"] = triggers.ravel()
+    result["成功次数"] = successes.ravel()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        result["成功率 (%)"] = np.where(triggers.ravel() > 0, successes.ravel() / triggers.ravel() * 100, 0.0)
+    return result
+
+# 一次性拉取历史数据（经 provider 限速与熔断），供扫描重复使用
+def fetch_histories(tickers, period="1y", interval="1d"):
+    from provider import EmptyHistoryError, get_provider
+
+    histories = {}
+    for ticker in tickers:
+        try:
+            data = get_provider().ticker(ticker).history(period=period, interval=interval).reset_index()
+        except EmptyHistoryError:
+            continue
+        if "Date" in data.columns:
+            data = data.rename(columns={"Date": "Datetime"})
+        if not data.empty:
+            histories[ticker] = data
+    return histories
+
+# 每个信号取成功率最高的若干组阈值
+def best_thresholds(result, min_triggers=5, top=3):
+    ranked = result[result["触发次数"] >= min_triggers].sort_values(
+        ["信号", "成功率 (%)", "触发次数"], ascending=[True, False, False])
+    return ranked.groupby("信号", sort=False).head(top).reset_index(drop=True)
+
+def _parse_values(text):
+    return [float(value) for value in text.split(",") if value.strip()]
+
+def main():
+    parser = argparse.ArgumentParser(description="信号阈值网格扫描")
+    parser.add_argument("tickers", help="股票代號（逗號分隔）")
+    parser.add_argument("--period", default="1y")
+    parser.add_argument("--interval", default="1d")
+    parser.add_argument("--grid", action="append", default=[], metavar="NAME=v1,v2,...",
+                        help="覆盖默认网格，例如 GAP_THRESHOLD=0.5,1,2")
+    parser.add_argument("--min-triggers", type=int, default=5)
+    parser.add_argument("--top", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--output", help="完整结果写入 CSV")
+    args = parser.parse_args()
+
+    grid = dict(DEFAULT_GRID)
+    for item in args.grid:
+        name, _, values = item.partition("=")
+        try:
+            grid[name.strip().upper()] = _parse_values(values)
+        except ValueError:
+            parser.error(f"--grid {item}：候选值须为逗号分隔的数字")
+
+    tickers = [t.strip().upper() for t in args.tickers.split(",") if t.strip()]
+    histories = fetch_histories(tickers, args.period, args.interval)
+    result = run_threshold_sweep(histories, grid, max_workers=args.workers)
+    if args.output:
+        result.to_csv(args.output, index=False)
+    print(best_thresholds(result, args.min_triggers, args.top).to_string(index=False))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+from signals import KEY_PIVOT_SIGNAL, SIGNAL_NAMES
+
+# 信号事件库目录（每月一个 SQLite 分区文件）
+SIGNAL_STORE_DIR = os.getenv("SIGNAL_STORE_DIR", "signal_events")
+
+# 期权信号只反映当前快照，只记录在最新一根K线上（随每次刷新覆盖为最新数值）
+OPTION_SIGNALS = ["📉 高PCR看跌信号", "📈 低PCR看涨信号", "⚠️ 高IV波动预警"]
+
+# 跳空分类与关键转折点都要看下一根K线，比其他信号晚一根K线才定案
+GAP_SIGNALS = [name for name in SIGNAL_NAMES if "跳空" in name]
+LATE_SIGNALS = GAP_SIGNALS + [KEY_PIVOT_SIGNAL]
+
+# 分区文件后缀：表结构加入设置键后换了文件名，旧格式的分区文件保留但不再读取
+_PARTITION_SUFFIX = ".v2.sqlite"
+
+EVENT_COLUMNS = ["settings", "ticker", "bar_time", "signal", "close", "volume", "price_change_pct",
+                 "volume_change_pct", "rsi", "macd", "recorded_at"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    settings TEXT NOT NULL,
+    signal TEXT NOT NULL,
+    bar_time TEXT NOT NULL,
+    ticker TEXT NOT NULL,
+    close REAL,
+    volume REAL,
+    price_change_pct REAL,
+    volume_change_pct REAL,
+    rsi REAL,
+    macd REAL,
+    recorded_at TEXT NOT NULL,
+    PRIMARY KEY (settings, signal, bar_time, ticker)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS events_ticker ON events (settings, ticker, bar_time);
+CREATE TABLE IF NOT EXISTS alerts (
+    settings TEXT NOT NULL,
+    ticker TEXT NOT NULL,
+    bar_time TEXT NOT NULL,
+    signal TEXT NOT NULL,
+    sent_at TEXT NOT NULL,
+    PRIMARY KEY (settings, ticker, bar_time, signal, sent_at)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS pair_alerts (
+    settings TEXT NOT NULL,
+    ticker_a TEXT NOT NULL,
+    ticker_b TEXT NOT NULL,
+    bar_time TEXT NOT NULL,
+    signal TEXT NOT NULL,
+    sent_at TEXT NOT NULL,
+    PRIMARY KEY (settings, ticker_a, ticker_b, bar_time, signal, sent_at)
+) WITHOUT ROWID;
+"""
+
+# 设置键：K线间隔 + 阈值哈希。不同间隔或阈值算出的信号各自成一组事件，互不覆盖
+def settings_key(interval, thresholds):
+    digest = hashlib.blake2b(json.dumps(thresholds, sort_keys=True, default=str).encode(), digest_size=6)
+    return f"{interval or ''}-{digest.hexdigest()}"
+
+# 统一转成 UTC 字符串，字典序即时间序
+def _to_utc_text(value):
+    ts = pd.Timestamp(value)
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert("UTC").tz_localize(None)
+    return ts.strftime("%Y-%m-%d %H:%M:%S")
+
+# K线时间转成 UTC（无时区）索引，便于与已入库的时间比较
+def _utc_index(values):
+    index = pd.DatetimeIndex(values)
+    if index.tz is not None:
+        index = index.tz_convert("UTC").tz_localize(None)
+    return index
+
+def _partition_of(bar_time_text):
+    return bar_time_text[:7]
+
+def _months_between(start, end):
+    month = datetime(start.year, start.month, 1)
+    while month <= end:
+        yield month.strftime("%Y-%m")
+        month = datetime(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+# 只追加的信号事件库：事件、单只股票的邮件提醒与股票对的邮件提醒各一张表，重复写入同一事件会被忽略。
+# 最后一根K线还在形成、跳空分类还要看下一根K线，只有定案的K线才写入
+class SignalEventStore:
+    def __init__(self, root=SIGNAL_STORE_DIR):
+        self.root = root
+        self._connections = {}
+        self._lock = threading.Lock()
+        # (设置键, ticker, 滞后K线数) -> 已写入到的K线时间（UTC 字符串），之后只看更新的K线
+        self._written_until = {}
+        os.makedirs(root, exist_ok=True)
+
+    def _connection(self, partition, create=True):
+        conn = self._connections.get(partition)
+        if conn is None:
+            path = os.path.join(self.root, f"{partition}{_PARTITION_SUFFIX}")
+            if not create and not os.path.exists(path):
+                return None
+            conn = sqlite3.connect(path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            self._connections[partition] = conn
+        return conn
+
+    def partitions(self):
+        return sorted(name[:-len(_PARTITION_SUFFIX)] for name in os.listdir(self.root)
+                      if name.endswith(_PARTITION_SUFFIX))
+
+    # 已入库的最后一个事件时间（按月分区由新到旧找），进程重启后从这里接着写
+    def _last_stored(self, settings, ticker, signals):
+        sql = (f"SELECT MAX(bar_time) FROM events WHERE settings = ? AND ticker = ? "
+               f"AND signal IN ({', '.join('?' * len(signals))})")
+        for partition in reversed(self.partitions()):
+            row = self._connection(partition).execute(sql, [settings, ticker, *signals]).fetchone()
+            if row[0] is not None:
+                return row[0]
+        return None
+
+    # 写入一只股票已定案的信号事件，返回新增的事件数：
+    # 普通信号写到倒数第二根K线，跳空分类与关键转折点写到倒数第三根，只写上次之后的新K线；
+    # 期权信号写在最新一根K线上，重复刷新时更新为最新数值。settings 为 settings_key() 的结果
+    def append_events(self, ticker, data, masks, settings=""):
+        n_bars = len(data)
+        if n_bars == 0:
+            return 0
+        times = _utc_index(data["Datetime"])
+        columns = [data[name].to_numpy(dtype=float) for name in
+                   ["Close", "Volume", "Price Change %", "Volume Change %", "RSI", "MACD"]]
+        recorded_at = _to_utc_text(datetime.now(timezone.utc))
+
+        def row(i, name):
+            values = [None if np.isnan(column[i]) else float(column[i]) for column in columns]
+            bar_time = _to_utc_text(times[i])
+            return _partition_of(bar_time), (settings, ticker, bar_time, name, *values, recorded_at)
+
+        final_rows, option_rows = {}, {}
+        with self._lock:
+            for lag, names in ((1, [name for name in SIGNAL_NAMES
+                                    if name not in LATE_SIGNALS and name not in OPTION_SIGNALS]),
+                               (2, LATE_SIGNALS)):
+                stop = n_bars - lag
+                if stop <= 0:
+                    continue
+                key = (settings, ticker, lag)
+                if key not in self._written_until:
+                    self._written_until[key] = self._last_stored(settings, ticker, names)
+                written_until = self._written_until[key]
+                start = 0 if written_until is None else times.searchsorted(pd.Timestamp(written_until), side="right")
+                for name in names:
+                    for i in start + np.flatnonzero(np.broadcast_to(masks[name], (n_bars,))[start:stop]):
+                        partition, values = row(i, name)
+                        final_rows.setdefault(partition, []).append(values)
+                self._written_until[key] = max(written_until or "", _to_utc_text(times[stop - 1]))
+            for name in OPTION_SIGNALS:
+                if np.broadcast_to(masks[name], (n_bars,))[-1]:
+                    partition, values = row(n_bars - 1, name)
+                    option_rows.setdefault(partition, []).append(values)
+
+            inserted = 0
+            placeholders = ", ".join("?" * len(EVENT_COLUMNS))
+            updates = ", ".join(f"{column} = excluded.{column}" for column in EVENT_COLUMNS[4:])
+            for partition in set(final_rows) | set(option_rows):
+                conn = self._connection(partition)
+                with conn:
+                    before = conn.total_changes
+                    conn.executemany(f"INSERT OR IGNORE INTO events ({', '.join(EVENT_COLUMNS)}) "
+                                     f"VALUES ({placeholders})", final_rows.get(partition, []))
+                    inserted += conn.total_changes - before
+                    conn.executemany(f"INSERT INTO events ({', '.join(EVENT_COLUMNS)}) VALUES ({placeholders}) "
+                                     f"ON CONFLICT (settings, signal, bar_time, ticker) DO UPDATE SET {updates}",
+                                     option_rows.get(partition, []))
+        return inserted
+
+    # 记录已通过邮件发送的信号
+    def record_alert(self, ticker, bar_time, signals, settings=""):
+        bar_time = _to_utc_text(bar_time)
+        sent_at = _to_utc_text(datetime.now(timezone.utc))
+        rows = [(settings, ticker, bar_time, signal, sent_at) for signal in signals]
+        if not rows:
+            return
+        with self._lock:
+            conn = self._connection(_partition_of(bar_time))
+            with conn:
+                conn.executemany("INSERT OR IGNORE INTO alerts VALUES (?, ?, ?, ?, ?)", rows)
+
+    # 某根K线的某个信号是否已发过邮件（跨页面重跑、会话与重启都有效）
+    def has_alert(self, ticker, bar_time, signal, settings=""):
+        bar_time = _to_utc_text(bar_time)
+        with self._lock:
+            conn = self._connection(_partition_of(bar_time), create=False)
+            if conn is None:
+                return False
+            return conn.execute("SELECT 1 FROM alerts WHERE settings = ? AND ticker = ? AND bar_time = ? "
+                                "AND signal = ? LIMIT 1", (settings, ticker, bar_time, signal)).fetchone() is not None
+
+    # 记录已通过邮件发送的股票对信号（如走势背离），pair 为 (股票A, 股票B)，不分先后
+    def record_pair_alert(self, pair, bar_time, signals, settings=""):
+        bar_time = _to_utc_text(bar_time)
+        sent_at = _to_utc_text(datetime.now(timezone.utc))
+        ticker_a, ticker_b = sorted(pair)
+        rows = [(settings, ticker_a, ticker_b, bar_time, signal, sent_at) for signal in signals]
+        if not rows:
+            return
+        with self._lock:
+            conn = self._connection(_partition_of(bar_time))
+            with conn:
+                conn.executemany("INSERT OR IGNORE INTO pair_alerts VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+    # 某根K线上某对股票的信号是否已发过邮件
+    def has_pair_alert(self, pair, bar_time, signal, settings=""):
+        bar_time = _to_utc_text(bar_time)
+        ticker_a, ticker_b = sorted(pair)
+        with self._lock:
+            conn = self._connection(_partition_of(bar_time), create=False)
+            if conn is None:
+                return False
+            return conn.execute("SELECT 1 FROM pair_alerts WHERE settings = ? AND ticker_a = ? AND ticker_b = ? "
+                                "AND bar_time = ? AND signal = ? LIMIT 1",
+                                (settings, ticker_a, ticker_b, bar_time, signal)).fetchone() is not None
+
+    # 查询事件：signals / tickers 为空表示不过滤，start / end 为K线时间范围，settings 为 None 时不区分设置
+    def query(self, signals=None, tickers=None, start=None, end=None, limit=None, settings=None):
+        end_text = _to_utc_text(end if end is not None else datetime.now(timezone.utc))
+        start_text = _to_utc_text(start) if start is not None else None
+        if start_text is not None:
+            partitions = list(_months_between(pd.Timestamp(start_text), pd.Timestamp(end_text)))
+        else:
+            partitions = [p for p in self.partitions() if p <= end_text[:7]]
+
+        where = ["e.bar_time <= ?"]
+        params = [end_text]
+        if start_text is not None:
+            where.append("e.bar_time >= ?")
+            params.append(start_text)
+        if settings is not None:
+            where.append("e.settings = ?")
+            params.append(settings)
+        if signals:
+            where.append(f"e.signal IN ({', '.join('?' * len(signals))})")
+            params.extend(signals)
+        if tickers:
+            where.append(f"e.ticker IN ({', '.join('?' * len(tickers))})")
+            params.extend(tickers)
+        sql = (f"SELECT {', '.join('e.' + c for c in EVENT_COLUMNS)}, "
+               "EXISTS (SELECT 1 FROM alerts a WHERE a.settings = e.settings AND a.ticker = e.ticker AND a.bar_time = e.bar_time "
+               "AND a.signal = e.signal) AS alerted "
+               f"FROM events e WHERE {' AND '.join(where)} ORDER BY e.bar_time DESC")
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+
+        rows = []
+        with self._lock:
+            for partition in reversed(partitions):
+                conn = self._connection(partition, create=False)
+                if conn is None:
+                    continue
+                rows.extend(conn.execute(sql, params).fetchall())
+                if limit and len(rows) >= limit:
+                    break
+        events = pd.DataFrame(rows[:limit] if limit else rows, columns=EVENT_COLUMNS + ["alerted"])
+        events["alerted"] = events["alerted"].astype(bool)
+        return events
+
+    # 最近 N 天的事件
+    def recent(self, days=30, signals=None, tickers=None, limit=None, settings=None):
+        start = datetime.now(timezone.utc) - timedelta(days=days)
+        return self.query(signals, tickers, start=start, limit=limit, settings=settings)
+
+    def close(self):
+        with self._lock:
+            for conn in self._connections.values():
+                conn.close()
+            self._connections.clear()
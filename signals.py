@@ -0,0 +1,343 @@
+import numpy as np
+import pandas as pd
+
+# 默认阈值（与仪表板输入框的默认值一致）
+DEFAULT_THRESHOLDS = {
+    "PRICE_THRESHOLD": 80.0,
+    "VOLUME_THRESHOLD": 80.0,
+    "PRICE_CHANGE_THRESHOLD": 5.0,
+    "VOLUME_CHANGE_THRESHOLD": 10.0,
+    "GAP_THRESHOLD": 1.0,
+    "CONTINUOUS_UP_THRESHOLD": 3,
+    "CONTINUOUS_DOWN_THRESHOLD": 3,
+    "PCR_THRESHOLD": 1.5,
+    "IV_THRESHOLD": 50.0,
+}
+
+# 所有信号名称（顺序即異動標記中的显示顺序）
+SIGNAL_NAMES = [
+    "✅ 量價", "📈 Low>High", "📉 High<Low", "📈 MACD買入", "📉 MACD賣出",
+    "📈 EMA買入", "📉 EMA賣出", "📈 價格趨勢買入", "📉 價格趨勢賣出",
+    "📈 價格趨勢買入(量)", "📉 價格趨勢賣出(量)", "📈 價格趨勢買入(量%)", "📉 價格趨勢賣出(量%)",
+    "📈 衰竭跳空(上)", "📈 持續跳空(上)", "📈 突破跳空(上)", "📈 普通跳空(上)",
+    "📉 衰竭跳空(下)", "📉 持續跳空(下)", "📉 突破跳空(下)", "📉 普通跳空(下)",
+    "📈 連續向上買入", "📉 連續向下賣出", "📈 SMA50上升趨勢", "📉 SMA50下降趨勢",
+    "📈 SMA50_200上升趨勢", "📉 SMA50_200下降趨勢", "📈 新买入信号", "📉 新卖出信号",
+    "🔄 新转折点", "📉 高PCR看跌信号", "📈 低PCR看涨信号", "⚠️ 高IV波动预警",
+]
+
+# 同一根K线上的信号数超过该值时追加关键转折点
+KEY_PIVOT_SIGNAL = "🔥 关键转折点"
+KEY_PIVOT_MIN_SIGNALS = 8
+
+# 含关键转折点在内的全部信号，下标即信号位图中的位序
+ALL_SIGNAL_NAMES = SIGNAL_NAMES + [KEY_PIVOT_SIGNAL]
+
+# 滚动成功率的窗口（最近 N 次触发）
+ROLLING_SUCCESS_WINDOWS = [50, 200]
+
+SELL_SIGNALS = [
+    "📉 High<Low", "📉 MACD賣出", "📉 EMA賣出", "📉 價格趨勢賣出", "📉 價格趨勢賣出(量)",
+    "📉 價格趨勢賣出(量%)", "📉 普通跳空(下)", "📉 突破跳空(下)", "📉 持續跳空(下)",
+    "📉 衰竭跳空(下)", "📉 連續向下賣出", "📉 SMA50下降趨勢", "📉 SMA50_200下降趨勢",
+    "📉 新卖出信号", "📉 RSI-MACD Overbought Crossover", "📉 EMA-SMA Sell",
+    "📉 Volume-MACD Sell", "📉 高PCR看跌信号"
+]
+
+# MACD 计算函数
+def calculate_macd(data, fast=12, slow=26, signal=9):
+    exp1 = data["Close"].ewm(span=fast, adjust=False).mean()
+    exp2 = data["Close"].ewm(span=slow, adjust=False).mean()
+    macd = exp1 - exp2
+    signal_line = macd.ewm(span=signal, adjust=False).mean()
+    return macd, signal_line
+
+# RSI 计算函数
+def calculate_rsi(data, periods=14):
+    delta = data["Close"].diff()
+    gain = (delta.where(delta > 0, 0)).rolling(window=periods).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=periods).mean()
+    rs = gain / loss
+    rsi = 100 - (100 / (1 + rs))
+    return rsi
+
+# 计算所有技术指标（原地添加到 data 中）
+def compute_indicators(data):
+    # 计算涨跌幅百分比
+    data["Price Change %"] = data["Close"].pct_change().round(4) * 100
+    data["Volume Change %"] = data["Volume"].pct_change().round(4) * 100
+    data["Close_Difference"] = data['Close'].diff().round(2)
+
+    # 计算前 5 周期平均收盘价与平均成交量
+    data["前5均價"] = data["Price Change %"].rolling(window=5).mean()
+    data["前5均價ABS"] = abs(data["Price Change %"]).rolling(window=5).mean()
+    data["前5均量"] = data["Volume"].rolling(window=5).mean()
+    data["📈 股價漲跌幅 (%)"] = ((abs(data["Price Change %"]) - data["前5均價ABS"]) / data["前5均價ABS"]).round(4) * 100
+    data["📊 成交量變動幅 (%)"] = ((data["Volume"] - data["前5均量"]) / data["前5均量"]).round(4) * 100
+
+    # 计算 MACD
+    data["MACD"], data["Signal"] = calculate_macd(data)
+
+    # 计算 EMA5 和 EMA10
+    data["EMA5"] = data["Close"].ewm(span=5, adjust=False).mean()
+    data["EMA10"] = data["Close"].ewm(span=10, adjust=False).mean()
+
+    # 计算 RSI
+    data["RSI"] = calculate_rsi(data)
+    data["RSI_MA9"] = data["RSI"].rolling(window=9).mean()
+
+    # 计算连续上涨/下跌计数
+    data['Up'] = (data['Close'] > data['Close'].shift(1)).astype(int)
+    data['Down'] = (data['Close'] < data['Close'].shift(1)).astype(int)
+    data['Continuous_Up'] = data['Up'] * (data['Up'].groupby((data['Up'] == 0).cumsum()).cumcount() + 1)
+    data['Continuous_Down'] = data['Down'] * (data['Down'].groupby((data['Down'] == 0).cumsum()).cumcount() + 1)
+
+    # 计算 SMA50 和 SMA200
+    data["SMA50"] = data["Close"].rolling(window=50).mean()
+    data["SMA200"] = data["Close"].rolling(window=200).mean()
+    return data
+
+# 数组平移（空位补 NaN）
+def _shift(values, periods):
+    shifted = np.full(len(values), np.nan)
+    if periods > 0:
+        shifted[periods:] = values[:-periods]
+    elif periods < 0:
+        shifted[:periods] = values[-periods:]
+    else:
+        shifted[:] = values
+    return shifted
+
+# 向量化计算所有信号的布尔掩码
+# thresholds 中的每个阈值可以是标量，也可以是形状为 (k, 1) 的数组；
+# 后者会与 K 线维度广播成 (k, n)，一次算出 k 组阈值下的信号。
+# 与阈值无关的信号保持 (n,) 形状，期权信号为标量或 (k, 1)。
+def compute_signal_masks(data, thresholds=None, pcr=None, avg_iv=None):
+    t = dict(DEFAULT_THRESHOLDS, **(thresholds or {}))
+    t = {name: np.asarray(value, dtype=float) for name, value in t.items()}
+
+    open_ = data["Open"].to_numpy(dtype=float)
+    high = data["High"].to_numpy(dtype=float)
+    low = data["Low"].to_numpy(dtype=float)
+    close = data["Close"].to_numpy(dtype=float)
+    volume = data["Volume"].to_numpy(dtype=float)
+    prev_close = _shift(close, 1)
+    prev_high = _shift(high, 1)
+    prev_low = _shift(low, 1)
+    prev_volume = _shift(volume, 1)
+    next_close = _shift(close, -1)
+    macd = data["MACD"].to_numpy(dtype=float)
+    prev_macd = _shift(macd, 1)
+    ema5 = data["EMA5"].to_numpy(dtype=float)
+    ema10 = data["EMA10"].to_numpy(dtype=float)
+    prev_ema5 = _shift(ema5, 1)
+    prev_ema10 = _shift(ema10, 1)
+    avg_volume5 = data["前5均量"].to_numpy(dtype=float)
+    price_change = data["Price Change %"].to_numpy(dtype=float)
+    volume_change = data["Volume Change %"].to_numpy(dtype=float)
+    sma50 = data["SMA50"].to_numpy(dtype=float)
+    sma200 = data["SMA200"].to_numpy(dtype=float)
+
+    masks = {}
+    masks["✅ 量價"] = ((np.abs(data["📈 股價漲跌幅 (%)"].to_numpy(dtype=float)) >= t["PRICE_THRESHOLD"]) &
+                      (np.abs(data["📊 成交量變動幅 (%)"].to_numpy(dtype=float)) >= t["VOLUME_THRESHOLD"]))
+    masks["📈 Low>High"] = low > prev_high
+    masks["📉 High<Low"] = high < prev_low
+    masks["📈 MACD買入"] = (macd > 0) & (prev_macd <= 0)
+    masks["📉 MACD賣出"] = (macd <= 0) & (prev_macd > 0)
+    masks["📈 EMA買入"] = (ema5 > ema10) & (prev_ema5 <= prev_ema10) & (volume > prev_volume)
+    masks["📉 EMA賣出"] = (ema5 < ema10) & (prev_ema5 >= prev_ema10) & (volume > prev_volume)
+
+    trend_up = (high > prev_high) & (low > prev_low) & (close > prev_close)
+    trend_down = (high < prev_high) & (low < prev_low) & (close < prev_close)
+    high_volume = volume > avg_volume5
+    masks["📈 價格趨勢買入"] = trend_up
+    masks["📉 價格趨勢賣出"] = trend_down
+    masks["📈 價格趨勢買入(量)"] = trend_up & high_volume
+    masks["📉 價格趨勢賣出(量)"] = trend_down & high_volume
+    masks["📈 價格趨勢買入(量%)"] = trend_up & (volume_change > 15)
+    masks["📉 價格趨勢賣出(量%)"] = trend_down & (volume_change > 15)
+
+    # 跳空信号：前 5 根收盘均价作为趋势，不足 5 根时视为 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        gap_pct = (open_ - prev_close) / prev_close * 100
+    positions = np.arange(len(close))
+    rolling_close = data["Close"].rolling(window=5, min_periods=1).mean().to_numpy(dtype=float)
+    trend = np.where(positions >= 5, _shift(rolling_close, 1), 0)
+    prev_trend = np.where(positions >= 6, _shift(rolling_close, 2), trend)
+    is_up_trend = (close > trend) & (trend > prev_trend)
+    is_down_trend = (close < trend) & (trend < prev_trend)
+    is_up_gap = gap_pct > t["GAP_THRESHOLD"]
+    is_down_gap = gap_pct < -t["GAP_THRESHOLD"]
+    up_exhaustion = is_up_gap & (next_close < close) & high_volume
+    up_runaway = is_up_gap & ~up_exhaustion & is_up_trend & high_volume
+    up_breakaway = is_up_gap & ~up_exhaustion & ~up_runaway & (high > prev_high) & high_volume
+    down_exhaustion = is_down_gap & (next_close > close) & high_volume
+    down_runaway = is_down_gap & ~down_exhaustion & is_down_trend & high_volume
+    down_breakaway = is_down_gap & ~down_exhaustion & ~down_runaway & (low < prev_low) & high_volume
+    masks["📈 衰竭跳空(上)"] = up_exhaustion
+    masks["📈 持續跳空(上)"] = up_runaway
+    masks["📈 突破跳空(上)"] = up_breakaway
+    masks["📈 普通跳空(上)"] = is_up_gap & ~(up_exhaustion | up_runaway | up_breakaway)
+    masks["📉 衰竭跳空(下)"] = down_exhaustion
+    masks["📉 持續跳空(下)"] = down_runaway
+    masks["📉 突破跳空(下)"] = down_breakaway
+    masks["📉 普通跳空(下)"] = is_down_gap & ~(down_exhaustion | down_runaway | down_breakaway)
+
+    masks["📈 連續向上買入"] = data["Continuous_Up"].to_numpy() >= t["CONTINUOUS_UP_THRESHOLD"]
+    masks["📉 連續向下賣出"] = data["Continuous_Down"].to_numpy() >= t["CONTINUOUS_DOWN_THRESHOLD"]
+    masks["📈 SMA50上升趨勢"] = close > sma50
+    masks["📉 SMA50下降趨勢"] = close < sma50
+    masks["📈 SMA50_200上升趨勢"] = (close > sma50) & (sma50 > sma200)
+    masks["📉 SMA50_200下降趨勢"] = (close < sma50) & (sma50 < sma200)
+    masks["📈 新买入信号"] = (close > open_) & (open_ > prev_close)
+    masks["📉 新卖出信号"] = (close < open_) & (open_ < prev_close)
+    masks["🔄 新转折点"] = ((np.abs(price_change) > t["PRICE_CHANGE_THRESHOLD"]) &
+                        (np.abs(volume_change) > t["VOLUME_CHANGE_THRESHOLD"]))
+
+    # 期权信号对所有 K 线取同一个当前值
+    pcr = np.nan if pcr is None else pcr
+    avg_iv = np.nan if avg_iv is None else avg_iv
+    masks["📉 高PCR看跌信号"] = pcr > t["PCR_THRESHOLD"]
+    masks["📈 低PCR看涨信号"] = pcr < (1 / t["PCR_THRESHOLD"])
+    masks["⚠️ 高IV波动预警"] = avg_iv > t["IV_THRESHOLD"] / 100
+
+    signal_count = sum(masks[name].astype(int) for name in SIGNAL_NAMES)
+    masks[KEY_PIVOT_SIGNAL] = signal_count > KEY_PIVOT_MIN_SIGNALS
+    return masks
+
+# 由信号掩码生成每根 K 线的異動標記字符串（只适用于单组阈值）
+def build_signal_labels(masks, length):
+    labels = np.full(length, "", dtype=object)
+    signal_count = np.zeros(length, dtype=int)
+    for name in SIGNAL_NAMES:
+        mask = np.broadcast_to(masks[name], (length,))
+        labels[mask] = labels[mask] + (name + ", ")
+        signal_count += mask
+    for index in np.flatnonzero(np.broadcast_to(masks[KEY_PIVOT_SIGNAL], (length,))):
+        labels[index] += f"{KEY_PIVOT_SIGNAL} (信号数: {signal_count[index]}), "
+    return [label[:-2] for label in labels]
+
+# 把信号掩码压缩成每根K线一个 uint64 位图
+def encode_signal_bitmask(masks, length):
+    bits = np.zeros(length, dtype=np.uint64)
+    for position, name in enumerate(ALL_SIGNAL_NAMES):
+        mask = np.broadcast_to(masks[name], (length,))
+        bits[mask] |= np.uint64(1 << position)
+    return bits
+
+# 由位图还原信号掩码
+def decode_signal_bitmask(bits):
+    bits = np.asarray(bits, dtype=np.uint64)
+    return {name: (bits & np.uint64(1 << position)) != 0 for position, name in enumerate(ALL_SIGNAL_NAMES)}
+
+# 由位图直接生成異動標記：相同的信号组合只拼一次字符串（组合数远少于K线数）
+def labels_from_bitmask(bits):
+    patterns, inverse = np.unique(np.asarray(bits, dtype=np.uint64), return_inverse=True)
+    labels = np.array(build_signal_labels(decode_signal_bitmask(patterns), len(patterns)), dtype=object)
+    return labels[inverse.ravel()]
+
+# 把異動標記字符串拆回信号名称（关键转折点去掉信号数）
+def split_signal_labels(label):
+    return [KEY_PIVOT_SIGNAL if name.startswith(KEY_PIVOT_SIGNAL) else name
+            for name in (label or "").split(", ") if name]
+
+# 标记量价异动、Low > High、High < Low、MACD、EMA、价格趋势及期权信号
+def mark_signals(data, thresholds=None, pcr=None, avg_iv=None):
+    masks = compute_signal_masks(data, thresholds, pcr, avg_iv)
+    data["異動標記"] = build_signal_labels(masks, len(data))
+    return masks
+
+# 信号成功的判定：买入信号看下一根K线是否创新高且收高，卖出信号看是否创新低且收低
+def signal_outcomes(data):
+    high = data["High"].to_numpy(dtype=float)
+    low = data["Low"].to_numpy(dtype=float)
+    close = data["Close"].to_numpy(dtype=float)
+    up_success = (_shift(high, -1) > high) & (_shift(close, -1) > close)
+    down_success = (_shift(low, -1) < low) & (_shift(close, -1) < close)
+    return up_success, down_success
+
+# 由異動標記字符串还原信号掩码（没有掩码时使用）
+def masks_from_labels(labels):
+    rows = [set(split_signal_labels(label)) for label in labels]
+    return {name: np.array([name in row for row in rows], dtype=bool) for name in ALL_SIGNAL_NAMES}
+
+# 计算所有信号的成功率（包含期权信号）：整段数据一个数字，只列出触发过的信号
+def calculate_signal_success_rate(data, masks=None):
+    if masks is None:
+        masks = masks_from_labels(data["異動標記"])
+    up_success, down_success = signal_outcomes(data)
+    success_rates = {}
+    for name in ALL_SIGNAL_NAMES:
+        mask = np.broadcast_to(masks[name], (len(data),))
+        total_signals = int(mask.sum())
+        if total_signals == 0:
+            continue
+        direction = "down" if name in SELL_SIGNALS else "up"
+        success_count = int((mask & (down_success if direction == "down" else up_success)).sum())
+        success_rates[name] = {
+            "success_rate": success_count / total_signals * 100,
+            "total_signals": total_signals,
+            "direction": direction,
+        }
+    return success_rates
+
+# 每个信号逐根K线“已揭晓”的触发数与成功数（信号数 × K线数）：
+# 第 i 根K线上的触发要到第 i+1 根才知道成败，因此计在第 i+1 根，滚动成功率不会用到未来数据
+def resolved_signal_matrices(data, masks):
+    n_bars = len(data)
+    up_success, down_success = signal_outcomes(data)
+    triggers = np.zeros((len(ALL_SIGNAL_NAMES), n_bars), dtype=np.int64)
+    successes = np.zeros_like(triggers)
+    for j, name in enumerate(ALL_SIGNAL_NAMES):
+        mask = np.broadcast_to(masks[name], (n_bars,))
+        outcome = down_success if name in SELL_SIGNALS else up_success
+        triggers[j, 1:] = mask[:-1]
+        successes[j, 1:] = (mask & outcome)[:-1]
+    return triggers, successes
+
+# 滚动（前进式）成功率：unit="triggers" 取每个信号最近 window 次已揭晓的触发，unit="bars" 取最近 window 根K线内的触发。
+# 对触发矩阵与成功矩阵各做一次累计和，每个窗口只是两次相减，所有窗口合计 O(n)。
+# 返回 {window: (成功率 %, 样本数)}，均为 index 与 data 相同、列为信号名的 DataFrame；没有样本时成功率为 NaN
+def rolling_success_rates(data, masks, windows=None, unit="triggers"):
+    windows = ROLLING_SUCCESS_WINDOWS if windows is None else windows
+    triggers, successes = resolved_signal_matrices(data, masks)
+    n_bars = triggers.shape[1]
+    trigger_sums = np.zeros((len(ALL_SIGNAL_NAMES), n_bars + 1), dtype=np.int64)
+    success_sums = np.zeros_like(trigger_sums)
+    np.cumsum(triggers, axis=1, out=trigger_sums[:, 1:])
+    np.cumsum(successes, axis=1, out=success_sums[:, 1:])
+    rows = np.arange(len(ALL_SIGNAL_NAMES))[:, None]
+
+    # trigger_ends[j, m]：信号 j 第 m 次触发之后的累计和下标（每根K线至多一次触发）
+    trigger_ends = np.zeros_like(trigger_sums)
+    if unit != "bars":
+        for j in range(len(ALL_SIGNAL_NAMES)):
+            ends = np.flatnonzero(triggers[j]) + 1
+            trigger_ends[j, 1:len(ends) + 1] = ends
+
+    results = {}
+    for window in windows:
+        if unit == "bars":
+            starts = np.broadcast_to(np.maximum(np.arange(1, n_bars + 1) - window, 0), trigger_sums[:, 1:].shape)
+        else:
+            # 窗口起点：去掉最早的 (累计触发数 - window) 次触发
+            starts = trigger_ends[rows, np.maximum(trigger_sums[:, 1:] - window, 0)]
+        counts = trigger_sums[:, 1:] - trigger_sums[rows, starts]
+        wins = success_sums[:, 1:] - success_sums[rows, starts]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rates = np.where(counts > 0, wins / counts * 100, np.nan)
+        results[window] = (pd.DataFrame(rates.T, index=data.index, columns=ALL_SIGNAL_NAMES),
+                           pd.DataFrame(counts.T, index=data.index, columns=ALL_SIGNAL_NAMES))
+    return results
+
+# 最新一根K线处各信号的滚动成功率：{信号: {window: {"success_rate": %, "total_signals": 样本数}}}，只列出有样本的信号
+def latest_rolling_success_rates(data, masks, windows=None, unit="triggers"):
+    latest = {}
+    for window, (rates, counts) in rolling_success_rates(data, masks, windows, unit).items():
+        for name in ALL_SIGNAL_NAMES:
+            total_signals = int(counts[name].iloc[-1])
+            if total_signals:
+                latest.setdefault(name, {})[window] = {"success_rate": float(rates[name].iloc[-1]),
+                                                        "total_signals": total_signals}
+    return latest
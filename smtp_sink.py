@@ -0,0 +1,107 @@
+import argparse
+import socketserver
+import threading
+import time
+
+# 本地 SMTP 替身：接受任何帐号密码与收件人，只记录收到的邮件，不转发
+# （配合 SMTP_HOST=127.0.0.1 SMTP_PORT=<端口> SMTP_SSL=0 使用）
+class SmtpSink(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host="127.0.0.1", port=0, keep_messages=True):
+        super().__init__((host, port), SmtpSinkHandler)
+        self.keep_messages = keep_messages
+        self.messages = []
+        self.received = 0
+        self._lock = threading.Lock()
+
+    @property
+    def address(self):
+        return self.server_address[:2]
+
+    def deliver(self, mail_from, recipients, data):
+        with self._lock:
+            self.received += 1
+            if self.keep_messages:
+                self.messages.append({"received_at": time.time(), "from": mail_from, "to": recipients, "data": data})
+
+    # 在后台线程运行，返回自身
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+class SmtpSinkHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        self.reply("220 smtp-sink ready")
+        mail_from, recipients = None, []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors="replace").strip()
+            verb = command.split(" ", 1)[0].upper()
+            if verb == "EHLO":
+                self.wfile.write(b"250-smtp-sink\r\n250-AUTH PLAIN LOGIN\r\n250 8BITMIME\r\n")
+            elif verb == "HELO":
+                self.reply("250 smtp-sink")
+            elif verb == "AUTH":
+                parts = command.split()
+                if len(parts) == 2 and parts[1].upper() == "LOGIN":
+                    # AUTH LOGIN：依次索取帐号与密码
+                    self.reply("334 VXNlcm5hbWU6")
+                    self.rfile.readline()
+                    self.reply("334 UGFzc3dvcmQ6")
+                    self.rfile.readline()
+                elif len(parts) == 2:
+                    self.reply("334 ")
+                    self.rfile.readline()
+                self.reply("235 2.7.0 Authentication successful")
+            elif verb == "MAIL":
+                mail_from, recipients = command.split(":", 1)[1].strip(), []
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                recipients.append(command.split(":", 1)[1].strip())
+                self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                lines = []
+                while True:
+                    data_line = self.rfile.readline()
+                    if not data_line or data_line in (b".\r\n", b".\n"):
+                        break
+                    lines.append(data_line[1:] if data_line.startswith(b"..") else data_line)
+                self.server.deliver(mail_from, recipients, b"".join(lines))
+                self.reply("250 OK: queued")
+            elif verb == "RSET":
+                mail_from, recipients = None, []
+                self.reply("250 OK")
+            elif verb == "NOOP":
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+def main():
+    parser = argparse.ArgumentParser(description="本地 SMTP 替身（只记录、不转发）")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1025)
+    args = parser.parse_args()
+
+    sink = SmtpSink(args.host, args.port, keep_messages=False)
+    print(f"smtp sink listening on {args.host}:{args.port}  (SMTP_HOST={args.host} SMTP_PORT={args.port} SMTP_SSL=0)",
+          flush=True)
+    try:
+        sink.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"received {sink.received} messages")
+
+if __name__ == "__main__":
+    main()
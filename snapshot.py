@@ -0,0 +1,37 @@
+import os
+import pickle
+import tempfile
+from datetime import datetime
+
+# 最近一次计算结果的快照文件，下次启动时先渲染它
+SNAPSHOT_PATH = os.getenv("SNAPSHOT_PATH", "monitor_snapshot.pkl")
+
+# 保存各股票状态：先写同目录下的独立临时文件再替换，避免中途退出留下半个文件，
+# 多个进程同时保存也不会互相覆盖临时文件；写入失败时删除临时文件并抛出异常
+def save_snapshot(states, settings, path=SNAPSHOT_PATH):
+    snapshot = {
+        "saved_at": datetime.now(),
+        "settings": settings,
+        "states": {ticker: state for ticker, state in states.items() if not state.get("error")},
+    }
+    directory, name = os.path.split(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix=f"{name}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+    return snapshot
+
+# 读取快照；文件不存在或已损坏时返回 None
+def load_snapshot(path=SNAPSHOT_PATH):
+    try:
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+        return None
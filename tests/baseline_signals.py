@@ -0,0 +1,151 @@
+import pandas as pd
+
+from signals import calculate_macd, calculate_rsi
+
+# 对照实现：原 v1.py 中逐行判断的 mark_signal（含指标计算），只用于核对向量化的 mark_signals
+def baseline_mark_signals(data, pcr=None, avg_iv=None, PRICE_THRESHOLD=80.0, VOLUME_THRESHOLD=80.0, PRICE_CHANGE_THRESHOLD=5.0, VOLUME_CHANGE_THRESHOLD=10.0, GAP_THRESHOLD=1.0, CONTINUOUS_UP_THRESHOLD=3, CONTINUOUS_DOWN_THRESHOLD=3, PCR_THRESHOLD=1.5, IV_THRESHOLD=50.0):
+    # 计算涨跌幅百分比
+    data["Price Change %"] = data["Close"].pct_change().round(4) * 100
+    data["Volume Change %"] = data["Volume"].pct_change().round(4) * 100
+    data["Close_Difference"] = data['Close'].diff().round(2)
+
+    # 计算前 5 周期平均收盘价与平均成交量
+    data["前5均價"] = data["Price Change %"].rolling(window=5).mean()
+    data["前5均價ABS"] = abs(data["Price Change %"]).rolling(window=5).mean()
+    data["前5均量"] = data["Volume"].rolling(window=5).mean()
+    data["📈 股價漲跌幅 (%)"] = ((abs(data["Price Change %"]) - data["前5均價ABS"]) / data["前5均價ABS"]).round(4) * 100
+    data["📊 成交量變動幅 (%)"] = ((data["Volume"] - data["前5均量"]) / data["前5均量"]).round(4) * 100
+
+    # 计算 MACD
+    data["MACD"], data["Signal"] = calculate_macd(data)
+
+    # 计算 EMA5 和 EMA10
+    data["EMA5"] = data["Close"].ewm(span=5, adjust=False).mean()
+    data["EMA10"] = data["Close"].ewm(span=10, adjust=False).mean()
+
+    # 计算 RSI
+    data["RSI"] = calculate_rsi(data)
+    data["RSI_MA9"] = data["RSI"].rolling(window=9).mean()
+
+    # 计算连续上涨/下跌计数
+    data['Up'] = (data['Close'] > data['Close'].shift(1)).astype(int)
+    data['Down'] = (data['Close'] < data['Close'].shift(1)).astype(int)
+    data['Continuous_Up'] = data['Up'] * (data['Up'].groupby((data['Up'] == 0).cumsum()).cumcount() + 1)
+    data['Continuous_Down'] = data['Down'] * (data['Down'].groupby((data['Down'] == 0).cumsum()).cumcount() + 1)
+
+    # 计算 SMA50 和 SMA200
+    data["SMA50"] = data["Close"].rolling(window=50).mean()
+    data["SMA200"] = data["Close"].rolling(window=200).mean()
+
+    # 标记量价异动、Low > High、High < Low、MACD、EMA、价格趋势及期权信号
+    def mark_signal(row, index):
+        signals = []
+        if abs(row["📈 股價漲跌幅 (%)"]) >= PRICE_THRESHOLD and abs(row["📊 成交量變動幅 (%)"]) >= VOLUME_THRESHOLD:
+            signals.append("✅ 量價")
+        if index > 0 and row["Low"] > data["High"].iloc[index-1]:
+            signals.append("📈 Low>High")
+        if index > 0 and row["High"] < data["Low"].iloc[index-1]:
+            signals.append("📉 High<Low")
+        if index > 0 and row["MACD"] > 0 and data["MACD"].iloc[index-1] <= 0:
+            signals.append("📈 MACD買入")
+        if index > 0 and row["MACD"] <= 0 and data["MACD"].iloc[index-1] > 0:
+            signals.append("📉 MACD賣出")
+        if (index > 0 and row["EMA5"] > row["EMA10"] and 
+            data["EMA5"].iloc[index-1] <= data["EMA10"].iloc[index-1] and 
+            row["Volume"] > data["Volume"].iloc[index-1]):
+            signals.append("📈 EMA買入")
+        if (index > 0 and row["EMA5"] < row["EMA10"] and 
+            data["EMA5"].iloc[index-1] >= data["EMA10"].iloc[index-1] and 
+            row["Volume"] > data["Volume"].iloc[index-1]):
+            signals.append("📉 EMA賣出")
+        if (index > 0 and row["High"] > data["High"].iloc[index-1] and 
+            row["Low"] > data["Low"].iloc[index-1] and 
+            row["Close"] > data["Close"].iloc[index-1]):
+            signals.append("📈 價格趨勢買入")
+        if (index > 0 and row["High"] < data["High"].iloc[index-1] and 
+            row["Low"] < data["Low"].iloc[index-1] and 
+            row["Close"] < data["Close"].iloc[index-1]):
+            signals.append("📉 價格趨勢賣出")
+        if (index > 0 and row["High"] > data["High"].iloc[index-1] and 
+            row["Low"] > data["Low"].iloc[index-1] and 
+            row["Close"] > data["Close"].iloc[index-1] and 
+            row["Volume"] > data["前5均量"].iloc[index]):
+            signals.append("📈 價格趨勢買入(量)")
+        if (index > 0 and row["High"] < data["High"].iloc[index-1] and 
+            row["Low"] < data["Low"].iloc[index-1] and 
+            row["Close"] < data["Close"].iloc[index-1] and 
+            row["Volume"] > data["前5均量"].iloc[index]):
+            signals.append("📉 價格趨勢賣出(量)")
+        if (index > 0 and row["High"] > data["High"].iloc[index-1] and 
+            row["Low"] > data["Low"].iloc[index-1] and 
+            row["Close"] > data["Close"].iloc[index-1] and 
+            row["Volume Change %"] > 15):
+            signals.append("📈 價格趨勢買入(量%)")
+        if (index > 0 and row["High"] < data["High"].iloc[index-1] and 
+            row["Low"] < data["Low"].iloc[index-1] and 
+            row["Close"] < data["Close"].iloc[index-1] and 
+            row["Volume Change %"] > 15):
+            signals.append("📉 價格趨勢賣出(量%)")
+        if index > 0:
+            gap_pct = ((row["Open"] - data["Close"].iloc[index-1]) / data["Close"].iloc[index-1]) * 100
+            is_up_gap = gap_pct > GAP_THRESHOLD
+            is_down_gap = gap_pct < -GAP_THRESHOLD
+            if is_up_gap or is_down_gap:
+                trend = data["Close"].iloc[index-5:index].mean() if index >= 5 else 0
+                prev_trend = data["Close"].iloc[index-6:index-1].mean() if index >= 6 else trend
+                is_up_trend = row["Close"] > trend and trend > prev_trend
+                is_down_trend = row["Close"] < trend and trend < prev_trend
+                is_high_volume = row["Volume"] > data["前5均量"].iloc[index]
+                is_price_reversal = (index < len(data) - 1 and
+                                    ((is_up_gap and data["Close"].iloc[index+1] < row["Close"]) or
+                                     (is_down_gap and data["Close"].iloc[index+1] > row["Close"])))
+                if is_up_gap:
+                    if is_price_reversal and is_high_volume:
+                        signals.append("📈 衰竭跳空(上)")
+                    elif is_up_trend and is_high_volume:
+                        signals.append("📈 持續跳空(上)")
+                    elif row["High"] > data["High"].iloc[index-1:index].max() and is_high_volume:
+                        signals.append("📈 突破跳空(上)")
+                    else:
+                        signals.append("📈 普通跳空(上)")
+                elif is_down_gap:
+                    if is_price_reversal and is_high_volume:
+                        signals.append("📉 衰竭跳空(下)")
+                    elif is_down_trend and is_high_volume:
+                        signals.append("📉 持續跳空(下)")
+                    elif row["Low"] < data["Low"].iloc[index-1:index].min() and is_high_volume:
+                        signals.append("📉 突破跳空(下)")
+                    else:
+                        signals.append("📉 普通跳空(下)")
+        if row['Continuous_Up'] >= CONTINUOUS_UP_THRESHOLD:
+            signals.append("📈 連續向上買入")
+        if row['Continuous_Down'] >= CONTINUOUS_DOWN_THRESHOLD:
+            signals.append("📉 連續向下賣出")
+        if pd.notna(row["SMA50"]):
+            if row["Close"] > row["SMA50"]:
+                signals.append("📈 SMA50上升趨勢")
+            elif row["Close"] < row["SMA50"]:
+                signals.append("📉 SMA50下降趨勢")
+        if pd.notna(row["SMA50"]) and pd.notna(row["SMA200"]):
+            if row["Close"] > row["SMA50"] and row["SMA50"] > row["SMA200"]:
+                signals.append("📈 SMA50_200上升趨勢")
+            elif row["Close"] < row["SMA50"] and row["SMA50"] < row["SMA200"]:
+                signals.append("📉 SMA50_200下降趨勢")
+        if index > 0 and row["Close"] > row["Open"] and row["Open"] > data["Close"].iloc[index-1]:
+            signals.append("📈 新买入信号")
+        if index > 0 and row["Close"] < row["Open"] and row["Open"] < data["Close"].iloc[index-1]:
+            signals.append("📉 新卖出信号")
+        if index > 0 and abs(row["Price Change %"]) > PRICE_CHANGE_THRESHOLD and abs(row["Volume Change %"]) > VOLUME_CHANGE_THRESHOLD:
+            signals.append("🔄 新转折点")
+        if pcr is not None and pcr > PCR_THRESHOLD:
+            signals.append("📉 高PCR看跌信号")
+        if pcr is not None and pcr < (1 / PCR_THRESHOLD):
+            signals.append("📈 低PCR看涨信号")
+        if avg_iv is not None and avg_iv > IV_THRESHOLD / 100:
+            signals.append("⚠️ 高IV波动预警")
+        if len(signals) > 8:
+            signals.append(f"🔥 关键转折点 (信号数: {len(signals)})")
+        return ", ".join(signals) if signals else ""
+
+    data["異動標記"] = [mark_signal(row, i) for i, row in data.iterrows()]
+    return data
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from bench_comovement import factor_returns
+from comovement import CoMovementMonitor
+
+WINDOW = 30
+MIN_PERIODS = 10
+
+# 对照：按窗口内两只股票都有数据的K线，用 np.corrcoef 批量计算相关系数与标准化价差
+def batch_z(window_frame, values, a, b):
+    common = window_frame.iloc[:, [a, b]].dropna().to_numpy()
+    if len(common) < MIN_PERIODS:
+        return None, None
+    corr = np.corrcoef(common[:, 0], common[:, 1])[0, 1]
+    mean, std = common.mean(axis=0), common.std(axis=0)
+    u, v = (values[a] - mean[0]) / std[0], (values[b] - mean[1]) / std[1]
+    return corr, (u - np.sign(corr) * v) / np.sqrt(2 * max(1 - abs(corr), 1e-6))
+
+@pytest.fixture
+def returns():
+    return factor_returns(6, 120, seed=3)
+
+def test_incremental_correlation_matches_corrcoef(returns):
+    monitor = CoMovementMonitor(WINDOW, MIN_PERIODS)
+    monitor.update(returns.iloc[:45])
+    for t in range(45, len(returns)):
+        monitor.update(returns.iloc[:t + 1])
+        window_frame = returns.iloc[t + 1 - WINDOW:t + 1]
+        corr = monitor.correlation().to_numpy()
+        for a in range(6):
+            for b in range(a + 1, 6):
+                common = window_frame.iloc[:, [a, b]].dropna().to_numpy()
+                if len(common) >= MIN_PERIODS:
+                    expected = np.corrcoef(common[:, 0], common[:, 1])[0, 1]
+                    assert corr[a, b] == pytest.approx(expected, abs=1e-9)
+
+def test_divergence_z_matches_batch(returns):
+    # 阈值设为 0：每对有足够共同K线的股票都会列出，逐一核对 z
+    monitor = CoMovementMonitor(WINDOW, MIN_PERIODS, corr_threshold=0.0, z_threshold=0.0)
+    monitor.update(returns.iloc[:45])
+    rng = np.random.default_rng(0)
+    for t in range(45, len(returns)):
+        # 先送入一版还在形成的最后一根K线，再送入最终数值
+        forming = returns.iloc[:t + 1].copy()
+        forming.iloc[-1] += rng.normal(0, 0.05, 6)
+        monitor.update(forming)
+        divergences = {item["pair"]: item for item in monitor.update(returns.iloc[:t + 1])}
+        window_frame = returns.iloc[t - WINDOW:t]
+        values = returns.iloc[t].to_numpy()
+        for a in range(6):
+            for b in range(a + 1, 6):
+                pair = (returns.columns[a], returns.columns[b])
+                corr, z = batch_z(window_frame, values, a, b)
+                if corr is None or np.isnan(values[a]) or np.isnan(values[b]):
+                    assert pair not in divergences
+                    continue
+                assert divergences[pair]["corr"] == pytest.approx(corr, abs=1e-9)
+                assert divergences[pair]["z"] == pytest.approx(z, rel=1e-6, abs=1e-6)
+
+def test_leveraged_pair_divergence_flagged(returns):
+    returns.iloc[-1, 0], returns.iloc[-1, 1] = 1.0, 0.0
+    monitor = CoMovementMonitor(WINDOW, MIN_PERIODS)
+    monitor.update(returns.iloc[:-1])
+    divergences = monitor.update(returns)
+    assert ("T000", "T001") in [item["pair"] for item in divergences]
@@ -0,0 +1,98 @@
+import time
+
+import pandas as pd
+import pytest
+
+from provider import CircuitBreaker, CircuitOpenError, EmptyHistoryError, MarketDataProvider, classify_error
+
+# 按脚本依次返回结果或抛出异常的后端
+class ScriptedBackend:
+    name = "scripted"
+
+    def __init__(self, *steps):
+        self.steps = list(steps)
+        self.calls = 0
+
+    def history(self, ticker, period, interval):
+        self.calls += 1
+        step = self.steps.pop(0) if self.steps else "ok"
+        if isinstance(step, Exception):
+            raise step
+        if step == "empty":
+            return pd.DataFrame()
+        return pd.DataFrame({"Close": [1.0, 2.0]})
+
+# yfinance 的异常类名（测试环境不必安装 yfinance）
+class YFPricesMissingError(Exception):
+    pass
+
+def make_provider(backend, cooldown=60):
+    return MarketDataProvider(backend, rate=1e9, burst=1e9, failure_threshold=3, cooldown=cooldown)
+
+def test_breaker_transitions():
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=0.05)
+    assert breaker.allow() and breaker.state == "closed"
+    breaker.record_failure(RuntimeError("a"))
+    assert breaker.state == "closed"
+    breaker.record_failure(RuntimeError("b"))
+    assert breaker.state == "open" and not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow() and breaker.state == "half_open"
+    assert not breaker.allow()  # 半开时只放行一次试探
+    breaker.record_failure(RuntimeError("c"))
+    assert breaker.state == "open" and breaker.trips == 2
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.failures == 0 and breaker.allow()
+
+def test_client_error_releases_half_open_probe():
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=0.01)
+    breaker.record_failure(RuntimeError("down"))
+    time.sleep(0.02)
+    assert breaker.allow()
+    breaker.record_client_error()
+    assert breaker.state == "closed" and breaker.allow()
+
+def test_classify_error():
+    assert classify_error(EmptyHistoryError("x")) == "no_data"
+    assert classify_error(YFPricesMissingError("possibly delisted")) == "no_data"
+    assert classify_error(TimeoutError("timed out")) == "timeout"
+    assert classify_error(RuntimeError("429 Too Many Requests")) == "throttled"
+    assert classify_error(RuntimeError("boom")) == "error"
+
+def test_no_data_does_not_trip_breaker_or_back_off():
+    provider = make_provider(ScriptedBackend(*(["empty"] * 5 + [YFPricesMissingError("delisted")] * 5)))
+    limit = provider.concurrency.limit
+    for _ in range(10):
+        with pytest.raises(EmptyHistoryError):
+            provider.call("history", "BAD", "1mo", "1d")
+    status = provider.status()["endpoints"]["history"]
+    assert status["state"] == "closed" and status["failures"] == 0 and status["no_data"] == 10
+    assert provider.concurrency.limit == limit and provider.concurrency.decreases == 0
+    assert status["cached_keys"] == 0
+
+def test_failures_open_breaker_and_serve_cache():
+    backend = ScriptedBackend("ok", RuntimeError("503"), RuntimeError("503"), RuntimeError("503"))
+    provider = make_provider(backend)
+    data, cached = provider.call("history", "AAA", "1mo", "1d")
+    assert not cached
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            provider.call("history", "AAA", "1mo", "1d")
+    # 第三次失败打开熔断器，改返回缓存
+    served, cached = provider.call("history", "AAA", "1mo", "1d")
+    assert cached and served is data
+    calls = backend.calls
+    assert provider.call("history", "AAA", "1mo", "1d")[1]
+    assert backend.calls == calls  # 熔断期间不访问数据源
+    with pytest.raises(CircuitOpenError):
+        provider.call("history", "BBB", "1mo", "1d")
+    assert provider.status()["endpoints"]["history"]["rejected"] == 1
+
+def test_timeouts_halve_concurrency():
+    provider = make_provider(ScriptedBackend(TimeoutError("timed out")))
+    limit = provider.concurrency.limit
+    with pytest.raises(TimeoutError):
+        provider.call("history", "AAA", "1mo", "1d")
+    assert provider.concurrency.limit == max(1, limit / 2)
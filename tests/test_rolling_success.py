@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from bench_rolling_success import naive_rolling
+from signals import (ALL_SIGNAL_NAMES, SELL_SIGNALS, compute_indicators, latest_rolling_success_rates, mark_signals,
+                     rolling_success_rates, signal_outcomes)
+from synthetic import synthetic_bars
+
+def marked_bars(n_bars, seed):
+    data = compute_indicators(synthetic_bars(n_bars, seed=seed))
+    return data, mark_signals(data, None, 1.7, 0.6)
+
+# 对照：最近 window 根K线内、在当前K线之前触发的信号逐一统计
+def naive_rolling_bars(data, masks, window):
+    up_success, down_success = signal_outcomes(data)
+    n_bars = len(data)
+    rates = np.full((n_bars, len(ALL_SIGNAL_NAMES)), np.nan)
+    for j, name in enumerate(ALL_SIGNAL_NAMES):
+        mask = np.broadcast_to(masks[name], (n_bars,))
+        outcome = down_success if name in SELL_SIGNALS else up_success
+        for i in range(n_bars):
+            positions = np.flatnonzero(mask[max(0, i - window):i]) + max(0, i - window)
+            if len(positions):
+                rates[i, j] = outcome[positions].mean() * 100
+    return rates
+
+@pytest.mark.parametrize("window", [1, 5, 50])
+def test_trigger_windows_match_brute_force(window):
+    data, masks = marked_bars(400, seed=window)
+    rates, _ = rolling_success_rates(data, masks, [window])[window]
+    np.testing.assert_allclose(rates.to_numpy(), naive_rolling(data, masks, window), equal_nan=True)
+
+@pytest.mark.parametrize("window", [1, 20, 100])
+def test_bar_windows_match_brute_force(window):
+    data, masks = marked_bars(400, seed=window + 1)
+    rates, _ = rolling_success_rates(data, masks, [window], unit="bars")[window]
+    np.testing.assert_allclose(rates.to_numpy(), naive_rolling_bars(data, masks, window), equal_nan=True)
+
+def test_latest_matches_last_row():
+    data, masks = marked_bars(300, seed=9)
+    rates, counts = rolling_success_rates(data, masks, [50])[50]
+    latest = latest_rolling_success_rates(data, masks, [50])
+    for name in ALL_SIGNAL_NAMES:
+        if counts[name].iloc[-1]:
+            assert latest[name][50] == {"success_rate": rates[name].iloc[-1], "total_signals": counts[name].iloc[-1]}
+        else:
+            assert name not in latest
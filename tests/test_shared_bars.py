@@ -0,0 +1,52 @@
+import os
+import shutil
+
+import numpy as np
+
+from shared_bars import SharedBarReader, SharedBarStore
+from signals import DEFAULT_THRESHOLDS, compute_indicators, mark_signals
+from synthetic import synthetic_bars
+
+def marked_bars(n_bars, seed=0):
+    data = synthetic_bars(n_bars, seed=seed)
+    compute_indicators(data)
+    return data, mark_signals(data, DEFAULT_THRESHOLDS)
+
+def test_frame_round_trip_without_copy(tmp_path):
+    data, masks = marked_bars(500)
+    store = SharedBarStore(str(tmp_path))
+    version = store.publish("AAA", data, masks)
+    reader = SharedBarReader(str(tmp_path))
+    frame = reader.frame("AAA", version)
+    _, arrays = reader.attach("AAA", version)
+
+    assert list(frame["異動標記"]) == list(data["異動標記"])
+    assert np.array_equal(frame["Close"].to_numpy(), data["Close"].to_numpy())
+    assert (frame["Datetime"] == data["Datetime"]).all()
+    assert np.shares_memory(frame["Close"].to_numpy(), arrays["Close"])
+
+def test_unchanged_publish_keeps_version(tmp_path):
+    data, masks = marked_bars(50)
+    store = SharedBarStore(str(tmp_path))
+    assert store.publish("AAA", data, masks) == store.publish("AAA", data, masks) == 1
+
+def test_attach_missing_key(tmp_path):
+    reader = SharedBarReader(str(tmp_path))
+    assert reader.attach("AAA") == (None, {})
+    assert reader.frame("AAA") is None
+
+# 元数据读到之后、打开数组之前整个 key 被清理：按未发布处理，而不是抛出 TypeError
+def test_attach_when_generation_and_meta_disappear(tmp_path, monkeypatch):
+    data, masks = marked_bars(50)
+    store = SharedBarStore(str(tmp_path))
+    store.publish("AAA", data, masks)
+    reader = SharedBarReader(str(tmp_path))
+    load = reader._load
+
+    def vanishing_load(meta):
+        shutil.rmtree(os.path.join(str(tmp_path), meta["generation"]))
+        os.remove(os.path.join(str(tmp_path), "AAA.json"))
+        return load(meta)
+
+    monkeypatch.setattr(reader, "_load", vanishing_load)
+    assert reader.attach("AAA") == (None, {})
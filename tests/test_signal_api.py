@@ -0,0 +1,73 @@
+import gzip
+import json
+from http.client import HTTPConnection
+
+import pytest
+
+from monitor import compute_ticker_state, new_ticker_state
+from signal_api import SignalApi, SignalApiServer
+from signals import DEFAULT_THRESHOLDS
+from synthetic import synthetic_bars
+
+def ticker_states(tickers, n_bars=120):
+    return {ticker: compute_ticker_state(new_ticker_state(ticker), synthetic_bars(n_bars, seed=i), DEFAULT_THRESHOLDS)
+            for i, ticker in enumerate(tickers)}
+
+@pytest.fixture
+def server():
+    api = SignalApi(n_bars=20)
+    server = SignalApiServer(api, "127.0.0.1", 0).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def get(server, path, **headers):
+    host, port = server.server_address[:2]
+    conn = HTTPConnection(host, port, timeout=10)
+    try:
+        conn.request("GET", path, headers=headers)
+        response = conn.getresponse()
+        return response.status, dict(response.getheaders()), response.read()
+    finally:
+        conn.close()
+
+def test_not_ready_then_published(server):
+    assert get(server, "/summary")[0] == 503
+    server.api.publish(ticker_states(["AAA", "BBB"]), {"interval": "1m"})
+    status, headers, body = get(server, "/signals/aaa")
+    assert status == 200
+    assert json.loads(body)["ticker"] == "AAA"
+    assert headers["Vary"] == "Accept-Encoding"
+    assert get(server, "/signals/ZZZ")[0] == 404
+
+def test_etag_returns_304_until_content_changes(server):
+    states = ticker_states(["AAA"])
+    server.api.publish(states, {})
+    status, headers, _ = get(server, "/signals/AAA")
+    etag = headers["ETag"]
+    status, headers, body = get(server, "/signals/AAA", **{"If-None-Match": etag})
+    assert status == 304 and body == b"" and headers["ETag"] == etag
+    # 内容未变的重新发布沿用同一 ETag
+    server.api.publish(states, {})
+    assert get(server, "/signals/AAA", **{"If-None-Match": f'"x", {etag}'})[0] == 304
+    server.api.publish(ticker_states(["AAA"], n_bars=121), {})
+    status, headers, _ = get(server, "/signals/AAA", **{"If-None-Match": etag})
+    assert status == 200 and headers["ETag"] != etag
+
+def test_gzip_only_when_accepted(server):
+    server.api.publish(ticker_states(["AAA", "BBB"]), {})
+    status, headers, plain = get(server, "/signals")
+    assert status == 200 and "Content-Encoding" not in headers
+    assert int(headers["Content-Length"]) == len(plain)
+    status, headers, compressed = get(server, "/signals", **{"Accept-Encoding": "gzip, deflate"})
+    assert headers["Content-Encoding"] == "gzip"
+    assert int(headers["Content-Length"]) == len(compressed)
+    assert gzip.decompress(compressed) == plain
+    assert set(json.loads(plain)["tickers"]) == {"AAA", "BBB"}
+
+def test_batch_query(server):
+    server.api.publish(ticker_states(["AAA", "BBB", "CCC"]), {})
+    status, _, body = get(server, "/signals?tickers=ccc,AAA,NOPE")
+    payload = json.loads(body)
+    assert status == 200
+    assert payload["tickers"] == ["CCC", "AAA"] and set(payload["signals"]) == {"CCC", "AAA"}
@@ -0,0 +1,77 @@
+import numpy as np
+
+from signal_store import GAP_SIGNALS, LATE_SIGNALS, OPTION_SIGNALS, SignalEventStore, settings_key
+from signals import ALL_SIGNAL_NAMES, DEFAULT_THRESHOLDS, KEY_PIVOT_SIGNAL, compute_indicators, mark_signals
+from synthetic import synthetic_bars
+
+def marked_bars(n_bars, seed=0, freq="min"):
+    data = synthetic_bars(n_bars, seed=seed, freq=freq)
+    compute_indicators(data)
+    return data, mark_signals(data, DEFAULT_THRESHOLDS)
+
+# 预期写入的事件数：普通信号到倒数第二根，跳空与关键转折点到倒数第三根
+def expected_events(masks, n_bars, start=0):
+    count = 0
+    for name in ALL_SIGNAL_NAMES:
+        if name in OPTION_SIGNALS:
+            continue
+        stop = n_bars - (2 if name in LATE_SIGNALS else 1)
+        count += int(np.broadcast_to(masks[name], (n_bars,))[start:stop].sum())
+    return count
+
+def test_key_pivot_waits_for_next_bar():
+    assert KEY_PIVOT_SIGNAL in LATE_SIGNALS
+    assert set(GAP_SIGNALS) <= set(LATE_SIGNALS)
+
+def test_intervals_do_not_share_watermark(tmp_path):
+    store = SignalEventStore(str(tmp_path))
+    minute, minute_masks = marked_bars(600, seed=1)
+    five, five_masks = marked_bars(120, seed=2, freq="5min")
+    minute_key = settings_key("1m", DEFAULT_THRESHOLDS)
+    five_key = settings_key("5m", DEFAULT_THRESHOLDS)
+    assert minute_key != five_key
+
+    assert store.append_events("AAA", minute, minute_masks, minute_key) == expected_events(minute_masks, 600)
+    # 5 分钟K线与 1 分钟K线时间重叠，且都早于 1 分钟的写入水位，仍要全部写入
+    assert store.append_events("AAA", five, five_masks, five_key) == expected_events(five_masks, 120)
+
+    events = store.query(tickers=["AAA"], start=minute["Datetime"].iloc[0], end=minute["Datetime"].iloc[-1],
+                         settings=five_key)
+    assert len(events) == expected_events(five_masks, 120)
+    assert set(events["settings"]) == {five_key}
+
+def test_thresholds_change_settings_key():
+    assert settings_key("1m", DEFAULT_THRESHOLDS) != settings_key("1m", dict(DEFAULT_THRESHOLDS, PRICE_CHANGE_THRESHOLD=9))
+
+def test_restart_resumes_from_stored_watermark(tmp_path):
+    data, masks = marked_bars(400, seed=3)
+    key = settings_key("1m", DEFAULT_THRESHOLDS)
+    store = SignalEventStore(str(tmp_path))
+    store.append_events("AAA", data.iloc[:300], {name: np.broadcast_to(mask, (400,))[:300] for name, mask in masks.items()},
+                        key)
+    store.close()
+
+    restarted = SignalEventStore(str(tmp_path))
+    assert restarted.append_events("AAA", data.iloc[:300],
+                                   {name: np.broadcast_to(mask, (400,))[:300] for name, mask in masks.items()}, key) == 0
+    restarted.append_events("AAA", data, masks, key)
+    stored = restarted.query(tickers=["AAA"], start=data["Datetime"].iloc[0], end=data["Datetime"].iloc[-1], settings=key)
+    assert len(stored) == expected_events(masks, 400)
+    assert not stored.duplicated(["signal", "bar_time"]).any()
+
+def test_alerts_are_scoped_by_settings(tmp_path):
+    store = SignalEventStore(str(tmp_path))
+    data, _ = marked_bars(10)
+    bar_time = data["Datetime"].iloc[-1]
+    store.record_alert("AAA", bar_time, ["📈 MACD買入"], "1m-x")
+    assert store.has_alert("AAA", bar_time, "📈 MACD買入", "1m-x")
+    assert not store.has_alert("AAA", bar_time, "📈 MACD買入", "5m-x")
+
+def test_pair_alerts_have_their_own_table(tmp_path):
+    store = SignalEventStore(str(tmp_path))
+    data, _ = marked_bars(10)
+    bar_time = data["Datetime"].iloc[-1]
+    store.record_pair_alert(("TSLA", "TSLL"), bar_time, ["🔗 走勢背離"], "1m-x")
+    assert store.has_pair_alert(("TSLL", "TSLA"), bar_time, "🔗 走勢背離", "1m-x")
+    assert not store.has_pair_alert(("TSLA", "TSLL"), bar_time, "🔗 走勢背離", "5m-x")
+    assert not store.has_alert("TSLA/TSLL", bar_time, "🔗 走勢背離", "1m-x")
@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from baseline_signals import baseline_mark_signals
+from signal_optimizer import build_threshold_grid, run_threshold_sweep, sweep_ticker
+from signals import (ALL_SIGNAL_NAMES, DEFAULT_THRESHOLDS, calculate_signal_success_rate, compute_indicators,
+                     mark_signals)
+
+# 波动较大的日K线，跳空、连续涨跌等信号都会出现
+def volatile_bars(n_bars, seed):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, n_bars)))
+    open_ = close * np.exp(rng.normal(0, 0.015, n_bars))
+    high = np.maximum(open_, close) * (1 + rng.uniform(0, 0.01, n_bars))
+    low = np.minimum(open_, close) * (1 - rng.uniform(0, 0.01, n_bars))
+    return pd.DataFrame({"Datetime": pd.date_range("2024-01-01", periods=n_bars, freq="D"), "Open": open_,
+                         "High": high, "Low": low, "Close": close, "Volume": rng.integers(100_000, 10_000_000, n_bars)})
+
+@pytest.mark.parametrize("n_bars", [3, 6, 60, 300])
+@pytest.mark.parametrize("pcr, avg_iv", [(None, None), (2.0, 0.9), (0.5, 0.1)])
+@pytest.mark.parametrize("thresholds", [{}, {"GAP_THRESHOLD": 0.5, "PRICE_THRESHOLD": 10, "VOLUME_THRESHOLD": 20,
+                                             "CONTINUOUS_UP_THRESHOLD": 2}])
+def test_vectorized_masks_match_baseline(n_bars, pcr, avg_iv, thresholds):
+    expected = baseline_mark_signals(volatile_bars(n_bars, n_bars), pcr, avg_iv, **thresholds)
+    data = compute_indicators(volatile_bars(n_bars, n_bars))
+    mark_signals(data, dict(DEFAULT_THRESHOLDS, **thresholds), pcr, avg_iv)
+    mismatches = int((expected["異動標記"] != data["異動標記"]).sum())
+    assert mismatches == 0
+
+def test_sweep_matches_success_rate():
+    histories = {f"T{i}": volatile_bars(250, i) for i in range(3)}
+    grid = {"GAP_THRESHOLD": [0.5, 1.0], "PRICE_CHANGE_THRESHOLD": [1.0, 5.0]}
+    result = run_threshold_sweep(histories, grid, max_workers=1)
+    for combo in build_threshold_grid(grid).to_dict("records"):
+        thresholds = dict(DEFAULT_THRESHOLDS, **combo)
+        expected = {name: [0, 0] for name in ALL_SIGNAL_NAMES}
+        for data in histories.values():
+            data = compute_indicators(data.copy())
+            for name, rate in calculate_signal_success_rate(data, mark_signals(data, thresholds)).items():
+                expected[name][0] += rate["total_signals"]
+                expected[name][1] += round(rate["success_rate"] * rate["total_signals"] / 100)
+        rows = result[(result["GAP_THRESHOLD"] == combo["GAP_THRESHOLD"]) &
+                      (result["PRICE_CHANGE_THRESHOLD"] == combo["PRICE_CHANGE_THRESHOLD"])]
+        for name, triggers, successes in zip(rows["信号"], rows["触发次数"], rows["成功次数"]):
+            assert [triggers, successes] == expected[name]
+
+def test_sweep_ticker_chunks_agree():
+    data = compute_indicators(volatile_bars(200, 7))
+    combos = build_threshold_grid({"GAP_THRESHOLD": [0.5, 1.0, 2.0], "VOLUME_THRESHOLD": [20, 80]})
+    whole = sweep_ticker(data, combos, chunk_size=len(combos))
+    chunked = sweep_ticker(data, combos, chunk_size=2)
+    assert np.array_equal(whole[0], chunked[0]) and np.array_equal(whole[1], chunked[1])
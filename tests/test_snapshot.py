@@ -0,0 +1,31 @@
+import os
+import threading
+
+import pytest
+
+from snapshot import load_snapshot, save_snapshot
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "snapshot.pkl")
+    save_snapshot({"AAA": {"ticker": "AAA", "error": None}, "BBB": {"ticker": "BBB", "error": "x"}}, {"interval": "1m"}, path)
+    snapshot = load_snapshot(path)
+    assert list(snapshot["states"]) == ["AAA"]
+    assert snapshot["settings"] == {"interval": "1m"}
+
+def test_failed_write_keeps_previous_snapshot(tmp_path):
+    path = str(tmp_path / "snapshot.pkl")
+    save_snapshot({"AAA": {"ticker": "AAA"}}, {}, path)
+    with pytest.raises(Exception):
+        save_snapshot({"AAA": {"ticker": "AAA", "lock": threading.Lock()}}, {}, path)
+    assert list(load_snapshot(path)["states"]) == ["AAA"]
+    assert os.listdir(tmp_path) == ["snapshot.pkl"]
+
+def test_concurrent_saves_use_separate_temp_files(tmp_path):
+    path = str(tmp_path / "snapshot.pkl")
+    threads = [threading.Thread(target=save_snapshot, args=({f"T{i}": {"ticker": f"T{i}"}}, {}, path)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert load_snapshot(path) is not None
+    assert os.listdir(tmp_path) == ["snapshot.pkl"]
@@ -1,227 +1,506 @@
+import time
+SCRIPT_START = time.perf_counter()
+
 import streamlit as st
-import yfinance as yf
 import pandas as pd
 from datetime import datetime
-import time
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import multiprocessing
+import threading
+import hashlib
+import logging
 import os
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 import numpy as np
+from signals import (SIGNAL_NAMES, KEY_PIVOT_SIGNAL, ROLLING_SUCCESS_WINDOWS, masks_from_labels, rolling_success_rates,
+                     split_signal_labels)
+from signal_store import SignalEventStore, settings_key
+from signal_optimizer import (DEFAULT_GRID, run_threshold_sweep, fetch_histories, best_thresholds, build_threshold_grid,
+                              effective_grid)
+from monitor import (RECIPIENT_EMAIL, alert_signal_names, bar_row_hashes, build_ticker_state, calculate_options_metrics,
+                     send_divergence_alert, send_email_alert, summarize_ticker_state)
+from comovement import (COMOVEMENT_WINDOW, DIVERGENCE_CORR_THRESHOLD, DIVERGENCE_SIGNAL, DIVERGENCE_Z_THRESHOLD,
+                        CoMovementMonitor, returns_frame)
+from snapshot import load_snapshot, save_snapshot
+from shared_bars import SHARED_BARS_DIR, SharedBarReader, attach_shared_state, build_and_publish
+from provider import get_provider
+from signal_api import SIGNAL_API_HOST, SIGNAL_API_PORT, SignalApi, SignalApiServer, watch_snapshot
 
 st.set_page_config(page_title="股票監控儀表板", layout="wide")
 
-load_dotenv()
+# 运行日志（首次绘制耗时、信号 API 状态、快照写入失败等）输出到终端；
+# DASHBOARD_LOG_LEVEL=DEBUG 时另记录每次刷新推送给浏览器的字节数
+logger = logging.getLogger("dashboard")
+if not logger.handlers:
+    log_handler = logging.StreamHandler()
+    log_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(name)s] %(message)s"))
+    logger.addHandler(log_handler)
+    logger.setLevel(os.getenv("DASHBOARD_LOG_LEVEL", "INFO").upper())
+    logger.propagate = False
+
 # 异动阈值设定
 REFRESH_INTERVAL = 144  # 秒，5 分钟自动刷新
 
-# Gmail 发信者帐号设置
-SENDER_EMAIL = os.getenv("SENDER_EMAIL")
-SENDER_PASSWORD = os.getenv("SENDER_PASSWORD")
-RECIPIENT_EMAIL = os.getenv("RECIPIENT_EMAIL")
-
-# MACD 计算函数
-def calculate_macd(data, fast=12, slow=26, signal=9):
-    exp1 = data["Close"].ewm(span=fast, adjust=False).mean()
-    exp2 = data["Close"].ewm(span=slow, adjust=False).mean()
-    macd = exp1 - exp2
-    signal_line = macd.ewm(span=signal, adjust=False).mean()
-    return macd, signal_line
-
-# RSI 计算函数
-def calculate_rsi(data, periods=14):
-    delta = data["Close"].diff()
-    gain = (delta.where(delta > 0, 0)).rolling(window=periods).mean()
-    loss = (-delta.where(delta < 0, 0)).rolling(window=periods).mean()
-    rs = gain / loss
-    rsi = 100 - (100 / (1 + rs))
-    return rsi
-
-# 计算期权相关指标
-def calculate_options_metrics(ticker, stock):
-    try:
-        # 获取最近的期权到期日
-        expiration_dates = stock.options
-        if not expiration_dates:
-            return None, None, None, None
-        
-        nearest_expiry = expiration_dates[0]
-        option_chain = stock.option_chain(nearest_expiry)
-        
-        # 计算看跌/看涨比率 (PCR)
-        put_volume = option_chain.puts['volume'].sum()
-        call_volume = option_chain.calls['volume'].sum()
-        pcr = put_volume / call_volume if call_volume > 0 else np.nan
-        
-        # 获取最高未平仓量的行权价
-        max_oi_call = option_chain.calls.loc[option_chain.calls['openInterest'].idxmax()] if not option_chain.calls.empty else None
-        max_oi_put = option_chain.puts.loc[option_chain.puts['openInterest'].idxmax()] if not option_chain.puts.empty else None
-        max_oi_strike = max_oi_call['strike'] if max_oi_call is not None else np.nan
-        max_oi_type = 'Call' if max_oi_call is not None and (max_oi_put is None or max_oi_call['openInterest'] > max_oi_put['openInterest']) else 'Put'
-        
-        # 计算隐含波动率均值
-        iv_call = option_chain.calls['impliedVolatility'].mean() if not option_chain.calls.empty else np.nan
-        iv_put = option_chain.puts['impliedVolatility'].mean() if not option_chain.puts.empty else np.nan
-        avg_iv = np.nanmean([iv_call, iv_put])
-        
-        # 计算跨式期权成本
-        atm_strike = option_chain.calls[abs(option_chain.calls['strike'] - stock.info.get('regularMarketPrice', stock.info.get('previousClose', 0))).idxmin()]
-        straddle_cost = None
-        if not option_chain.calls.empty and not option_chain.puts.empty:
-            call_price = option_chain.calls[option_chain.calls['strike'] == atm_strike['strike']]['lastPrice'].iloc[0] if not option_chain.calls[option_chain.calls['strike'] == atm_strike['strike']].empty else 0
-            put_price = option_chain.puts[option_chain.puts['strike'] == atm_strike['strike']]['lastPrice'].iloc[0] if not option_chain.puts[option_chain.puts['strike'] == atm_strike['strike']].empty else 0
-            straddle_cost = call_price + put_price
-        
-        return pcr, max_oi_strike, max_oi_type, avg_iv, straddle_cost
-    except Exception as e:
-        st.warning(f"⚠️ 無法取得 {ticker} 的期权数据：{e}")
-        return None, None, None, None
-
-# 邮件发送函数（已包含期权信号）
-def send_email_alert(ticker, price_pct, volume_pct, pcr=None, iv=None, low_high_signal=False, high_low_signal=False, 
-                     macd_buy_signal=False, macd_sell_signal=False, ema_buy_signal=False, ema_sell_signal=False,
-                     price_trend_buy_signal=False, price_trend_sell_signal=False,
-                     price_trend_vol_buy_signal=False, price_trend_vol_sell_signal=False,
-                     price_trend_vol_pct_buy_signal=False, price_trend_vol_pct_sell_signal=False,
-                     gap_common_up=False, gap_common_down=False, gap_breakaway_up=False, gap_breakaway_down=False,
-                     gap_runaway_up=False, gap_runaway_down=False, gap_exhaustion_up=False, gap_exhaustion_down=False,
-                     continuous_up_buy_signal=False, continuous_down_sell_signal=False,
-                     sma50_up_trend=False, sma50_down_trend=False,
-                     sma50_200_up_trend=False, sma50_200_down_trend=False,
-                     new_buy_signal=False, new_sell_signal=False, new_pivot_signal=False):
-    subject = f"📣 股票異動通知：{ticker}"
-    body = f"""
-    股票代號：{ticker}
-    股價變動：{price_pct:.2f}%
-    成交量變動：{volume_pct:.2f}%
-    """
+# 后台取数线程数
+FETCH_WORKERS = 8
+
+# 历史资料表的列
+HISTORY_COLUMNS = ["Datetime", "Low", "High", "Close", "Volume", "Price Change %", "Volume Change %",
+                   "📈 股價漲跌幅 (%)", "📊 成交量變動幅 (%)", "Close_Difference", "異動標記"]
+
+# 详细面板的各区块，依序排列
+PANEL_SECTIONS = ["head", "chart", "reliability", "ranges", "history", "download"]
+
+# 滚动成功率图显示的最近K线数
+RELIABILITY_CHART_BARS = 200
+
+# 联动监控显示的股票对数；自选股不超过此数时附相关系数热图
+COMOVEMENT_TOP_PAIRS = 20
+COMOVEMENT_HEATMAP_MAX = 30
+
+# 摘要表每页行数；详细面板最多同时展开的股票数，以及自选股不超过此数时默认全部展开
+SUMMARY_PAGE_SIZES = [10, 20, 50]
+DETAIL_MAX_PANELS = 5
+DETAIL_DEFAULT_LIMIT = 3
+
+# K 线图（含 EMA）、成交量柱状图、RSI 和期权数据子图（Plotly 在第一次画图时才导入）
+def build_ticker_figure(ticker, data, pcr):
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+
+    fig = make_subplots(rows=4, cols=1, shared_xaxes=True, 
+                        subplot_titles=(f"{ticker} K線與EMA", "成交量", "RSI", "看跌/看涨比率 (PCR)"),
+                        vertical_spacing=0.1, row_heights=[0.4, 0.2, 0.2, 0.2])
+
+    # 添加 K 线图
+    fig.add_trace(go.Candlestick(x=data.tail(50)["Datetime"],
+                                open=data.tail(50)["Open"],
+                                high=data.tail(50)["High"],
+                                low=data.tail(50)["Low"],
+                                close=data.tail(50)["Close"],
+                                name="K線"), row=1, col=1)
+
+    # 添加 EMA5、EMA10 和 SMA50
+    fig.add_trace(go.Scatter(x=data.tail(50)["Datetime"], y=data.tail(50)["EMA5"], mode='lines', name='EMA5', line=dict(color='blue')), row=1, col=1)
+    fig.add_trace(go.Scatter(x=data.tail(50)["Datetime"], y=data.tail(50)["EMA10"], mode='lines', name='EMA10', line=dict(color='green')), row=1, col=1)
+    fig.add_trace(go.Scatter(x=data.tail(50)["Datetime"], y=data.tail(50)["SMA50"], mode='lines', name='SMA50', line=dict(color='orange')), row=1, col=1)
+
+    # 添加成交量柱状图和移动平均线
+    fig.add_bar(x=data.tail(50)["Datetime"], y=data.tail(50)["Volume"], 
+               name="成交量", opacity=0.5, marker=dict(color='gray'), row=2, col=1)
+    fig.add_trace(go.Scatter(x=data.tail(50)["Datetime"], y=data.tail(50)["前5均量"], mode='lines', name='Volume MA5', line=dict(color='purple')), row=2, col=1)
+
+    # 添加 RSI 子图
+    fig.add_trace(go.Scatter(x=data.tail(50)["Datetime"], y=data.tail(50)["RSI"], mode='lines', name='RSI', line=dict(color='cyan')), row=3, col=1)
+    fig.add_trace(go.Scatter(x=data.tail(50)["Datetime"], y=data.tail(50)["RSI_MA9"], mode='lines', name='RSI MA9', line=dict(color='blue')), row=3, col=1)
+    fig.add_hline(y=70, line_dash="dash", line_color="red", row=3, col=1)
+    fig.add_hline(y=30, line_dash="dash", line_color="green", row=3, col=1)
+
+    # 添加 PCR 子图（假设有历史 PCR 数据，需从外部 API 获取，这里用单一值模拟）
+    pcr_data = [pcr] * len(data.tail(50)) if pcr is not None else [np.nan] * len(data.tail(50))
+    fig.add_trace(go.Scatter(x=data.tail(50)["Datetime"], y=pcr_data, mode='lines', name='PCR', line=dict(color='purple')), row=4, col=1)
+    fig.add_hline(y=PCR_THRESHOLD, line_dash="dash", line_color="red", row=4, col=1)
+    fig.add_hline(y=1/PCR_THRESHOLD, line_dash="dash", line_color="green", row=4, col=1)
+
+    # 标记信号
+    recent_count = len(data.tail(50))
+    for i in range(1, recent_count):
+        idx = -recent_count + i
+        if (data["EMA5"].iloc[idx] > data["EMA10"].iloc[idx] and 
+            data["EMA5"].iloc[idx-1] <= data["EMA10"].iloc[idx-1]):
+            fig.add_annotation(x=data["Datetime"].iloc[idx], y=data["Close"].iloc[idx],
+                             text="📈 EMA買入", showarrow=True, arrowhead=2, ax=20, ay=-30, row=1, col=1)
+        elif (data["EMA5"].iloc[idx] < data["EMA10"].iloc[idx] and 
+              data["EMA5"].iloc[idx-1] >= data["EMA10"].iloc[idx-1]):
+            fig.add_annotation(x=data["Datetime"].iloc[idx], y=data["Close"].iloc[idx],
+                             text="📉 EMA賣出", showarrow=True, arrowhead=2, ax=20, ay=30, row=1, col=1)
+        if "关键转折点" in data["異動標記"].iloc[idx]:
+            fig.add_scatter(x=[data["Datetime"].iloc[idx]], y=[data["Close"].iloc[idx]],
+                           mode="markers+text", marker=dict(symbol="star", size=12, color="yellow"),
+                           text=[f"🔥 转折点 ${data['Close'].iloc[idx]:.2f}"],
+                           textposition="top center", name="关键转折点", row=1, col=1)
+        if "新买入信号" in data["異動標記"].iloc[idx]:
+            fig.add_scatter(x=[data["Datetime"].iloc[idx]], y=[data["Close"].iloc[idx]],
+                           mode="markers+text", marker=dict(symbol="triangle-up", size=10, color="green"),
+                           text=[f"📈 新买入 ${data['Close'].iloc[idx]:.2f}"],
+                           textposition="bottom center", name="新买入信号", row=1, col=1)
+        if "新卖出信号" in data["異動標記"].iloc[idx]:
+            fig.add_scatter(x=[data["Datetime"].iloc[idx]], y=[data["Close"].iloc[idx]],
+                           mode="markers+text", marker=dict(symbol="triangle-down", size=10, color="red"),
+                           text=[f"📉 新卖出 ${data['Close'].iloc[idx]:.2f}"],
+                           textposition="top center", name="新卖出信号", row=1, col=1)
+        if "新转折点" in data["異動標記"].iloc[idx]:
+            fig.add_scatter(x=[data["Datetime"].iloc[idx]], y=[data["Close"].iloc[idx]],
+                           mode="markers+text", marker=dict(symbol="star", size=10, color="purple"),
+                           text=[f"🔄 新转折点 ${data['Close'].iloc[idx]:.2f}"],
+                           textposition="top center", name="新转折点", row=1, col=1)
+        if "高PCR看跌信号" in data["異動標記"].iloc[idx]:
+            fig.add_scatter(x=[data["Datetime"].iloc[idx]], y=[data["Close"].iloc[idx]],
+                           mode="markers+text", marker=dict(symbol="diamond", size=10, color="red"),
+                           text=[f"📉 高PCR ${data['Close'].iloc[idx]:.2f}"],
+                           textposition="top center", name="高PCR看跌", row=1, col=1)
+        if "低PCR看涨信号" in data["異動標記"].iloc[idx]:
+            fig.add_scatter(x=[data["Datetime"].iloc[idx]], y=[data["Close"].iloc[idx]],
+                           mode="markers+text", marker=dict(symbol="diamond", size=10, color="green"),
+                           text=[f"📈 低PCR ${data['Close'].iloc[idx]:.2f}"],
+                           textposition="bottom center", name="低PCR看涨", row=1, col=1)
+        if "高IV波动预警" in data["異動標記"].iloc[idx]:
+            fig.add_scatter(x=[data["Datetime"].iloc[idx]], y=[data["Close"].iloc[idx]],
+                           mode="markers+text", marker=dict(symbol="circle", size=10, color="orange"),
+                           text=[f"⚠️ 高IV ${data['Close'].iloc[idx]:.2f}"],
+                           textposition="top center", name="高IV波动", row=1, col=1)
+
+    fig.update_layout(yaxis_title="價格", yaxis2_title="成交量", yaxis3_title="RSI", yaxis4_title="PCR", showlegend=True)
+    return fig
+
+# 期权数据、价格与成交量、各信号成功率及异动提醒
+def render_ticker_head(state):
+    ticker = state["ticker"]
+    for warning in state["warnings"]:
+        st.warning(warning)
+    if state["error"]:
+        st.warning(state["error"])
+        return
+
+    pcr, max_oi_strike, max_oi_type, avg_iv, straddle_cost = (
+        state["pcr"], state["max_oi_strike"], state["max_oi_type"], state["avg_iv"], state["straddle_cost"])
+    current_price, price_change, price_pct_change = state["current_price"], state["price_change"], state["price_pct_change"]
+    last_volume, volume_change, volume_pct_change = state["last_volume"], state["volume_change"], state["volume_pct_change"]
+
+    # 显示期权数据
+    st.subheader(f"📊 {ticker} 期权数据")
     if pcr is not None:
-        body += f"\n📊 看跌/看涨比率 (PCR)：{pcr:.2f}"
-    if iv is not None:
-        body += f"\n📈 平均隐含波动率 (IV)：{iv:.2f}"
-    if low_high_signal:
-        body += f"\n⚠️ 當前最低價高於前一時段最高價！"
-    if high_low_signal:
-        body += f"\n⚠️ 當前最高價低於前一時段最低價！"
-    if macd_buy_signal:
-        body += f"\n📈 MACD 買入訊號：MACD 線由負轉正！"
-    if macd_sell_signal:
-        body += f"\n📉 MACD 賣出訊號：MACD 線由正轉負！"
-    if ema_buy_signal:
-        body += f"\n📈 EMA 買入訊號：EMA5 上穿 EMA10，成交量放大！"
-    if ema_sell_signal:
-        body += f"\n📉 EMA 賣出訊號：EMA5 下破 EMA10，成交量放大！"
-    if price_trend_buy_signal:
-        body += f"\n📈 價格趨勢買入訊號：最高價、最低價、收盤價均上漲！"
-    if price_trend_sell_signal:
-        body += f"\n📉 價格趨勢賣出訊號：最高價、最低價、收盤價均下跌！"
-    if price_trend_vol_buy_signal:
-        body += f"\n📈 價格趨勢買入訊號（量）：最高價、最低價、收盤價均上漲且成交量放大！"
-    if price_trend_vol_sell_signal:
-        body += f"\n📉 價格趨勢賣出訊號（量）：最高價、最低價、收盤價均下跌且成交量放大！"
-    if price_trend_vol_pct_buy_signal:
-        body += f"\n📈 價格趨勢買入訊號（量%）：最高價、最低價、收盤價均上漲且成交量變化 > 15%！"
-    if price_trend_vol_pct_sell_signal:
-        body += f"\n📉 價格趨勢賣出訊號（量%）：最高價、最低價、收盤價均下跌且成交量變化 > 15%！"
-    if gap_common_up:
-        body += f"\n📈 普通跳空(上)：價格向上跳空，未伴隨明顯趨勢或成交量放大！"
-    if gap_common_down:
-        body += f"\n📉 普通跳空(下)：價格向下跳空，未伴隨明顯趨勢或成交量放大！"
-    if gap_breakaway_up:
-        body += f"\n📈 突破跳空(上)：價格向上跳空，突破前高且成交量放大！"
-    if gap_breakaway_down:
-        body += f"\n📉 突破跳空(下)：價格向下跳空，跌破前低且成交量放大！"
-    if gap_runaway_up:
-        body += f"\n📈 持續跳空(上)：價格向上跳空，處於上漲趨勢且成交量放大！"
-    if gap_runaway_down:
-        body += f"\n📉 持續跳空(下)：價格向下跳空，處於下跌趨勢且成交量放大！"
-    if gap_exhaustion_up:
-        body += f"\n📈 衰竭跳空(上)：價格向上跳空，趨勢末端且隨後價格下跌，成交量放大！"
-    if gap_exhaustion_down:
-        body += f"\n📉 衰竭跳空(下)：價格向下跳空，趨勢末端且隨後價格上漲，成交量放大！"
-    if continuous_up_buy_signal:
-        body += f"\n📈 連續向上策略買入訊號：至少連續 {CONTINUOUS_UP_THRESHOLD} 根K線上漲！"
-    if continuous_down_sell_signal:
-        body += f"\n📉 連續向下策略賣出訊號：至少連續 {CONTINUOUS_DOWN_THRESHOLD} 根K線下跌！"
-    if sma50_up_trend:
-        body += f"\n📈 SMA50 上升趨勢：當前價格高於 SMA50！"
-    if sma50_down_trend:
-        body += f"\n📉 SMA50 下降趨勢：當前價格低於 SMA50！"
-    if sma50_200_up_trend:
-        body += f"\n📈 SMA50_200 上升趨勢：當前價格高於 SMA50 且 SMA50 高於 SMA200！"
-    if sma50_200_down_trend:
-        body += f"\n📉 SMA50_200 下降趨勢：當前價格低於 SMA50 且 SMA50 低於 SMA200！"
-    if new_buy_signal:
-        body += f"\n📈 新买入信号：今日收盘价大于开盘价且今日开盘价大于前日收盘价！"
-    if new_sell_signal:
-        body += f"\n📉 新卖出信号：今日收盘价小于开盘价且今日开盘价小于前日收盘价！"
-    if new_pivot_signal:
-        body += f"\n🔄 新转折点：|Price Change %| > {PRICE_CHANGE_THRESHOLD}% 且 |Volume Change %| > {VOLUME_CHANGE_THRESHOLD}%！"
-    
-    body += "\n系統偵測到異常變動，請立即查看市場情況。"
-    msg = MIMEMultipart()
-    msg["From"] = SENDER_EMAIL
-    msg["To"] = RECIPIENT_EMAIL
-    msg["Subject"] = subject
-    msg.attach(MIMEText(body, "plain"))
-
+        st.metric(f"{ticker} 看跌/看涨比率 (PCR)", f"{pcr:.2f}")
+    if max_oi_strike is not None:
+        st.metric(f"{ticker} 最高未平仓量行权价", f"${max_oi_strike:.2f} ({max_oi_type})")
+    if avg_iv is not None:
+        st.metric(f"{ticker} 平均隐含波动率 (IV)", f"{avg_iv:.2f}")
+    if straddle_cost is not None:
+        st.metric(f"{ticker} 跨式期权成本", f"${straddle_cost:.2f}")
+
+    # 显示当前资料
+    st.metric(f"{ticker} 🟢 股價變動", f"${current_price:.2f}",
+              f"{price_change:.2f} ({price_pct_change:.2f}%)")
+    st.metric(f"{ticker} 🔵 成交量變動", f"{last_volume:,}",
+              f"{volume_change:,} ({volume_pct_change:.2f}%)")
+
+    # 显示所有信号的成功率（整段数据与最近 N 次触发）
+    success_rates = state["success_rates"]
+    rolling_rates = state.get("rolling_success_rates", {})
+    st.subheader(f"📊 {ticker} 各信号成功率")
+    success_data = []
+    for signal, metrics in success_rates.items():
+        success_rate = metrics["success_rate"]
+        total_signals = metrics["total_signals"]
+        direction = metrics["direction"]
+        success_definition = "下一交易日的最低价低于当前最低价且收盘价低于当前收盘价" if direction == "down" else "下一交易日的最高价高于当前最高价且收盘价高于当前收盘价"
+        row = {
+            "信号": signal,
+            "成功率 (%)": f"{success_rate:.2f}%",
+            "触发次数": total_signals,
+        }
+        for window in ROLLING_SUCCESS_WINDOWS:
+            rate = rolling_rates.get(signal, {}).get(window)
+            row[f"近{window}次成功率 (%)"] = f"{rate['success_rate']:.2f}% ({rate['total_signals']})" if rate else "—"
+        row["成功定义"] = success_definition
+        success_data.append(row)
+        st.metric(f"{ticker} {signal} 成功率", 
+                  f"{success_rate:.2f}%",
+                  f"基于 {total_signals} 次信号 ({'下跌' if direction == 'down' else '上涨'})")
+        if total_signals > 0 and total_signals < 5:
+            st.warning(f"⚠️ {ticker} {signal} 样本量过少（{total_signals} 次），成功率可能不稳定")
+
+    if success_data:
+        st.dataframe(
+            pd.DataFrame(success_data),
+            use_container_width=True,
+            column_config={
+                "信号": st.column_config.TextColumn("信号", width="medium"),
+                "成功率 (%)": st.column_config.TextColumn("成功率 (%)", width="small"),
+                "触发次数": st.column_config.NumberColumn("触发次数", width="small"),
+                **{f"近{window}次成功率 (%)": st.column_config.TextColumn(f"近{window}次成功率 (%)", width="small")
+                   for window in ROLLING_SUCCESS_WINDOWS},
+                "成功定义": st.column_config.TextColumn("成功定义", width="large")
+            }
+        )
+
+    if state["alert_msg"]:
+        st.warning(f"📣 {state['alert_msg']}")
+
+# 添加 K 线图（含 EMA）、成交量柱状图、RSI 和期权数据子图
+def render_ticker_chart(state):
+    ticker, data = state["ticker"], state["data"]
+    st.subheader(f"📈 {ticker} K線圖與技術指標")
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+    fig = build_ticker_figure(ticker, data, state["pcr"])
+    st.plotly_chart(fig, use_container_width=True, key=f"chart_{ticker}_{timestamp}")
+
+# 各信号滚动成功率随时间的变化（最近 N 次已揭晓的触发）；最新一根K线上出现的信号默认显示，其余可在图例中点开
+def render_ticker_reliability(state):
+    import plotly.graph_objects as go
+
+    ticker, data = state["ticker"], state["data"]
+    window = ROLLING_SUCCESS_WINDOWS[0]
+    masks = state.get("signal_masks")
+    if masks is None:
+        masks = masks_from_labels(data["異動標記"])
+    rates, counts = rolling_success_rates(data, masks, [window])[window]
+    rates, counts = rates.tail(RELIABILITY_CHART_BARS).round(1), counts.tail(RELIABILITY_CHART_BARS)
+    times = data["Datetime"].tail(RELIABILITY_CHART_BARS)
+    latest_signals = set(split_signal_labels(data["異動標記"].iloc[-1]))
+    st.subheader(f"📈 {ticker} 信號滾動成功率（最近 {window} 次觸發）")
+    fig = go.Figure()
+    for signal in rates.columns:
+        if counts[signal].iloc[-1] == 0:
+            continue
+        # 成功率只在有触发揭晓时变化：阶梯线只画变化点，推送的数据量与触发次数成正比
+        rate, count = rates[signal], counts[signal]
+        keep = rate.notna() & (rate.ne(rate.shift()) | count.ne(count.shift()))
+        keep.iloc[-1] = True
+        fig.add_trace(go.Scatter(x=times[keep], y=rate[keep], mode="lines", line_shape="hv", name=signal,
+                                 customdata=count[keep], hovertemplate="%{y:.1f}%（樣本 %{customdata}）",
+                                 visible=True if signal in latest_signals else "legendonly"))
+    if not fig.data:
+        st.write("尚無已揭曉的信號可計算成功率")
+        return
+    fig.add_hline(y=50, line_dash="dash", line_color="gray")
+    fig.update_layout(yaxis_title="成功率 (%)", yaxis_range=[0, 100], showlegend=True)
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+    st.plotly_chart(fig, use_container_width=True, key=f"reliability_{ticker}_{timestamp}")
+
+# 合并显示五项指标前 X% 的范围到表格
+def render_ticker_ranges(state):
+    ticker, data = state["ticker"], state["data"]
+    st.subheader(f"📊 {ticker} 前 {PERCENTILE_THRESHOLD}% 數據範圍")
+    range_data = []
+
+    sorted_price_changes = data["Price Change %"].dropna().sort_values(ascending=False)
+    if len(sorted_price_changes) > 0:
+        top_percent_count = max(1, int(len(sorted_price_changes) * PERCENTILE_THRESHOLD / 100))
+        top_percent = sorted_price_changes.head(top_percent_count)
+        range_data.append({
+            "指標": "Price Change %",
+            "範圍類型": "最高到最低",
+            "最大值": f"{top_percent.max():.2f}%",
+            "最小值": f"{top_percent.min():.2f}%"
+        })
+    sorted_price_changes_asc = data["Price Change %"].dropna().sort_values(ascending=True)
+    if len(sorted_price_changes_asc) > 0:
+        bottom_percent_count = max(1, int(len(sorted_price_changes_asc) * PERCENTILE_THRESHOLD / 100))
+        bottom_percent = sorted_price_changes_asc.head(bottom_percent_count)
+        range_data.append({
+            "指標": "Price Change %",
+            "範圍類型": "最低到最高",
+            "最大值": f"{bottom_percent.max():.2f}%",
+            "最小值": f"{bottom_percent.min():.2f}%"
+        })
+
+    sorted_volume_changes = data["Volume Change %"].dropna().sort_values(ascending=False)
+    if len(sorted_volume_changes) > 0:
+        top_volume_percent_count = max(1, int(len(sorted_volume_changes) * PERCENTILE_THRESHOLD / 100))
+        top_volume_percent = sorted_volume_changes.head(top_volume_percent_count)
+        range_data.append({
+            "指標": "Volume Change %",
+            "範圍類型": "最高到最低",
+            "最大值": f"{top_volume_percent.max():.2f}%",
+            "最小值": f"{top_volume_percent.min():.2f}%"
+        })
+    sorted_volume_changes_asc = data["Volume Change %"].dropna().sort_values(ascending=True)
+    if len(sorted_volume_changes_asc) > 0:
+        bottom_volume_percent_count = max(1, int(len(sorted_volume_changes_asc) * PERCENTILE_THRESHOLD / 100))
+        bottom_volume_percent = sorted_volume_changes_asc.head(bottom_volume_percent_count)
+        range_data.append({
+            "指標": "Volume Change %",
+            "範圍類型": "最低到最高",
+            "最大值": f"{bottom_volume_percent.max():.2f}%",
+            "最小值": f"{bottom_volume_percent.min():.2f}%"
+        })
+
+    sorted_volumes = data["Volume"].dropna().sort_values(ascending=False)
+    if len(sorted_volumes) > 0:
+        top_volume_abs_count = max(1, int(len(sorted_volumes) * PERCENTILE_THRESHOLD / 100))
+        top_volume_abs = sorted_volumes.head(top_volume_abs_count)
+        range_data.append({
+            "指標": "Volume",
+            "範圍類型": "最高到最低",
+            "最大值": f"{int(top_volume_abs.max()):,}",
+            "最小值": f"{int(top_volume_abs.min()):,}"
+        })
+    sorted_volumes_asc = data["Volume"].dropna().sort_values(ascending=True)
+    if len(sorted_volumes_asc) > 0:
+        bottom_volume_abs_count = max(1, int(len(sorted_volumes_asc) * PERCENTILE_THRESHOLD / 100))
+        bottom_volume_abs = sorted_volumes_asc.head(bottom_volume_abs_count)
+        range_data.append({
+            "指標": "Volume",
+            "範圍類型": "最低到最高",
+            "最大值": f"{int(bottom_volume_abs.max()):,}",
+            "最小值": f"{int(bottom_volume_abs.min()):,}"
+        })
+
+    sorted_price_change_abs = data["📈 股價漲跌幅 (%)"].dropna().sort_values(ascending=False)
+    if len(sorted_price_change_abs) > 0:
+        top_price_change_abs_count = max(1, int(len(sorted_price_change_abs) * PERCENTILE_THRESHOLD / 100))
+        top_price_change_abs = sorted_price_change_abs.head(top_price_change_abs_count)
+        range_data.append({
+            "指標": "📈 股價漲跌幅 (%)",
+            "範圍類型": "最高到最低",
+            "最大值": f"{top_price_change_abs.max():.2f}%",
+            "最小值": f"{top_price_change_abs.min():.2f}%"
+        })
+    sorted_price_change_abs_asc = data["📈 股價漲跌幅 (%)"].dropna().sort_values(ascending=True)
+    if len(sorted_price_change_abs_asc) > 0:
+        bottom_price_change_abs_count = max(1, int(len(sorted_price_change_abs_asc) * PERCENTILE_THRESHOLD / 100))
+        bottom_price_change_abs = sorted_price_change_abs_asc.head(bottom_price_change_abs_count)
+        range_data.append({
+            "指標": "📈 股價漲跌幅 (%)",
+            "範圍類型": "最低到最高",
+            "最大值": f"{bottom_price_change_abs.max():.2f}%",
+            "最小值": f"{bottom_price_change_abs.min():.2f}%"
+        })
+
+    sorted_volume_change_abs = data["📊 成交量變動幅 (%)"].dropna().sort_values(ascending=False)
+    if len(sorted_volume_change_abs) > 0:
+        top_volume_change_abs_count = max(1, int(len(sorted_volume_change_abs) * PERCENTILE_THRESHOLD / 100))
+        top_volume_change_abs = sorted_volume_change_abs.head(top_volume_change_abs_count)
+        range_data.append({
+            "指標": "📊 成交量變動幅 (%)",
+            "範圍類型": "最高到最低",
+            "最大值": f"{top_volume_change_abs.max():.2f}%",
+            "最小值": f"{top_volume_change_abs.min():.2f}%"
+        })
+    sorted_volume_change_abs_asc = data["📊 成交量變動幅 (%)"].dropna().sort_values(ascending=True)
+    if len(sorted_volume_change_abs_asc) > 0:
+        bottom_volume_change_abs_count = max(1, int(len(sorted_volume_change_abs_asc) * PERCENTILE_THRESHOLD / 100))
+        bottom_volume_change_abs = sorted_volume_change_abs_asc.head(bottom_volume_change_abs_count)
+        range_data.append({
+            "指標": "📊 成交量變動幅 (%)",
+            "範圍類型": "最低到最高",
+            "最大值": f"{bottom_volume_change_abs.max():.2f}%",
+            "最小值": f"{bottom_volume_change_abs.min():.2f}%"
+        })
+
+    if range_data:
+        range_df = pd.DataFrame(range_data)
+        st.dataframe(
+            range_df,
+            use_container_width=True,
+            column_config={
+                "指標": st.column_config.TextColumn("指標", width="medium"),
+                "範圍類型": st.column_config.TextColumn("範圍類型", width="medium"),
+                "最大值": st.column_config.TextColumn("最大值", width="small"),
+                "最小值": st.column_config.TextColumn("最小值", width="small")
+            }
+        )
+    else:
+        st.write("無有效數據範圍可顯示")
+
+# 显示含异动标记的历史资料
+def render_ticker_history(state):
+    ticker, data = state["ticker"], state["data"]
+    st.subheader(f"📋 歷史資料：{ticker}")
+    display_data = data[HISTORY_COLUMNS].tail(15)
+    if not display_data.empty:
+        st.dataframe(
+            display_data,
+            height=600,
+            use_container_width=True,
+            column_config={
+                "異動標記": st.column_config.TextColumn(width="large")
+            }
+        )
+    else:
+        st.warning(f"⚠️ {ticker} 歷史數據表無內容可顯示")
+
+# 添加下载按钮
+def render_ticker_download(state):
+    ticker, data = state["ticker"], state["data"]
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+    csv = data.to_csv(index=False)
+    st.download_button(
+        label=f"📥 下載 {ticker} 數據 (CSV)",
+        data=csv,
+        file_name=f"{ticker}_數據_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+        mime="text/csv",
+        key=f"download_{ticker}_{timestamp}",
+    )
+
+def fingerprint(*parts):
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(part.tobytes() if isinstance(part, np.ndarray) else repr(part).encode())
+    return digest.hexdigest()
+
+# 渲染单只股票（实时数据与快照共用）：panel 保存各区块的位置与上次渲染的指纹，
+# 差异更新时只重绘指纹有变化的区块
+def render_ticker(state, panel):
+    if not panel:
+        panel["slots"] = {section: st.empty() for section in PANEL_SECTIONS}
+        panel["fingerprints"] = {}
+    slots, fingerprints = panel["slots"], panel["fingerprints"]
+
+    head_fingerprint = fingerprint(state["warnings"], state["error"], *(
+        state.get(key) for key in ("pcr", "max_oi_strike", "max_oi_type", "avg_iv", "straddle_cost", "current_price",
+                                   "price_change", "last_volume", "volume_change", "success_rates",
+                                   "rolling_success_rates", "alert_msg")))
+    if fingerprints.get("head") != head_fingerprint:
+        with slots["head"].container():
+            render_ticker_head(state)
+        fingerprints["head"] = head_fingerprint
+    if state["error"]:
+        for section in PANEL_SECTIONS[1:]:
+            slots[section].empty()
+            fingerprints.pop(section, None)
+        return
+
+    bars_fingerprint = fingerprint(bar_row_hashes(state["data"]))
+    if fingerprints.get("chart") != (bars_fingerprint, state["pcr"]):
+        with slots["chart"].container():
+            render_ticker_chart(state)
+        fingerprints["chart"] = (bars_fingerprint, state["pcr"])
+    for section, render in (("reliability", render_ticker_reliability), ("ranges", render_ticker_ranges),
+                            ("history", render_ticker_history), ("download", render_ticker_download)):
+        if fingerprints.get(section) != bars_fingerprint:
+            with slots[section].container():
+                render(state)
+            fingerprints[section] = bars_fingerprint
+
+# 信号事件库（所有会话共用）
+@st.cache_resource
+def get_signal_store():
+    return SignalEventStore()
+
+# 后台取数线程池（所有会话共用）
+@st.cache_resource
+def get_fetch_executor():
+    return ThreadPoolExecutor(max_workers=FETCH_WORKERS)
+
+# 子进程取数计算池：结果数组经共享内存传回，不再整表 pickle
+@st.cache_resource
+def get_process_executor():
+    return ProcessPoolExecutor(max_workers=FETCH_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+
+# 共享数组读取端（版本号不变时复用已映射的数组）
+@st.cache_resource
+def get_shared_reader():
+    return SharedBarReader(SHARED_BARS_DIR)
+
+# 信号 JSON 接口（设置 SIGNAL_API_PORT 时随仪表板启动，所有会话共用）：
+# 只由一个后台线程监视快照文件来发布，各会话不直接写入；端口已被占用（例如另一个仪表板进程已启动接口）时返回 None
+@st.cache_resource
+def get_signal_api():
+    api = SignalApi()
     try:
-        server = smtplib.SMTP_SSL("smtp.gmail.com", 465)
-        server.login(SENDER_EMAIL, SENDER_PASSWORD)
-        server.sendmail(SENDER_EMAIL, RECIPIENT_EMAIL, msg.as_string())
-        server.quit()
-        st.toast(f"📬 Email 已發送給 {RECIPIENT_EMAIL}")
-    except Exception as e:
-        st.error(f"Email 發送失敗：{e}")
-
-# 计算所有信号的成功率（包含期权信号）
-def calculate_signal_success_rate(data):
-    data["Next_Close_Higher"] = data["Close"].shift(-1) > data["Close"]
-    data["Next_Close_Lower"] = data["Close"].shift(-1) < data["Close"]
-    data["Next_High_Higher"] = data["High"].shift(-1) > data["High"]
-    data["Next_Low_Lower"] = data["Low"].shift(-1) < data["Low"]
-    
-    sell_signals = [
-        "📉 High<Low", "📉 MACD賣出", "📉 EMA賣出", "📉 價格趨勢賣出", "📉 價格趨勢賣出(量)", 
-        "📉 價格趨勢賣出(量%)", "📉 普通跳空(下)", "📉 突破跳空(下)", "📉 持續跳空(下)", 
-        "📉 衰竭跳空(下)", "📉 連續向下賣出", "📉 SMA50下降趨勢", "📉 SMA50_200下降趨勢", 
-        "📉 新卖出信号", "📉 RSI-MACD Overbought Crossover", "📉 EMA-SMA Sell", 
-        "📉 Volume-MACD Sell", "📉 高PCR看跌信号"
-    ]
-    
-    all_signals = set()
-    for signals in data["異動標記"].dropna():
-        for signal in signals.split(", "):
-            if signal:
-                all_signals.add(signal)
-    
-    success_rates = {}
-    for signal in all_signals:
-        signal_rows = data[data["異動標記"].str.contains(signal, na=False)]
-        total_signals = len(signal_rows)
-        if total_signals == 0:
-            success_rates[signal] = {"success_rate": 0.0, "total_signals": 0, "direction": "up" if signal not in sell_signals else "down"}
-        else:
-            if signal in sell_signals:
-                success_count = (signal_rows["Next_Low_Lower"] & signal_rows["Next_Close_Lower"]).sum() if not signal_rows.empty else 0
-                success_rates[signal] = {
-                    "success_rate": (success_count / total_signals) * 100,
-                    "total_signals": total_signals,
-                    "direction": "down"
-                }
-            else:
-                success_count = (signal_rows["Next_High_Higher"] & signal_rows["Next_Close_Higher"]).sum() if not signal_rows.empty else 0
-                success_rates[signal] = {
-                    "success_rate": (success_count / total_signals) * 100,
-                    "total_signals": total_signals,
-                    "direction": "up"
-                }
-    
-    return success_rates
+        server = SignalApiServer(api, SIGNAL_API_HOST, SIGNAL_API_PORT).start()
+    except OSError as e:
+        logger.warning("signal api not started on %s:%s: %s", SIGNAL_API_HOST, SIGNAL_API_PORT, e)
+        return None
+    threading.Thread(target=watch_snapshot, args=(api,), daemon=True).start()
+    logger.info("signal api listening on %s", server.url())
+    return api
+
+# 缓存历史数据，供阈值扫描重复使用
+@st.cache_data(ttl=3600, show_spinner=False)
+def load_histories(tickers, period, interval):
+    return fetch_histories(tickers, period, interval)
 
 # UI 设定
 period_options = ["1d", "5d", "1mo", "3mo", "6mo", "1y", "2y", "5y", "10y", "ytd", "max"]
@@ -245,674 +524,360 @@ PCR_THRESHOLD = st.number_input("PCR 異動閾值", min_value=0.1, max_value=5.0
 IV_THRESHOLD = st.number_input("隱含波動率異動閾值 (%)", min_value=0.1, max_value=100.0, value=50.0, step=0.1)
 PERCENTILE_THRESHOLD = st.selectbox("選擇 Price Change %、Volume Change %、Volume、股價漲跌幅 (%)、成交量變動幅 (%) 數據範圍 (%)", percentile_options, index=1)
 REFRESH_INTERVAL = st.selectbox("選擇刷新間隔 (秒)", refresh_options, index=refresh_options.index(144))
-
-placeholder = st.empty()
-
+use_worker_processes = st.checkbox("⚙️ 以子進程取數與計算（結果經共享記憶體傳回）", value=False)
+comovement_window = st.number_input("聯動監控窗口 (根K線)", min_value=10, max_value=2000, value=COMOVEMENT_WINDOW, step=10)
+divergence_corr_threshold = st.number_input("背離提醒：|相關係數| 下限", min_value=0.0, max_value=1.0,
+                                            value=DIVERGENCE_CORR_THRESHOLD, step=0.05)
+divergence_z_threshold = st.number_input("背離提醒：價差偏離 (σ)", min_value=0.5, max_value=10.0,
+                                         value=DIVERGENCE_Z_THRESHOLD, step=0.5)
+diff_updates = st.checkbox("⚡ 差異更新（只重繪數據有變化的股票與區塊）", value=True)
+THRESHOLDS = {
+    "PRICE_THRESHOLD": PRICE_THRESHOLD,
+    "VOLUME_THRESHOLD": VOLUME_THRESHOLD,
+    "PRICE_CHANGE_THRESHOLD": PRICE_CHANGE_THRESHOLD,
+    "VOLUME_CHANGE_THRESHOLD": VOLUME_CHANGE_THRESHOLD,
+    "GAP_THRESHOLD": GAP_THRESHOLD,
+    "CONTINUOUS_UP_THRESHOLD": CONTINUOUS_UP_THRESHOLD,
+    "CONTINUOUS_DOWN_THRESHOLD": CONTINUOUS_DOWN_THRESHOLD,
+    "PCR_THRESHOLD": PCR_THRESHOLD,
+    "IV_THRESHOLD": IV_THRESHOLD,
+}
+
+# 阈值优化模式：对历史数据做网格扫描，不进入实时监控循环
+optimizer_mode = st.checkbox("🧪 閾值優化模式（以歷史數據網格掃描各閾值組合）", value=False)
+if optimizer_mode:
+    st.subheader("🧪 閾值網格掃描")
+    sweep_grid = {}
+    for name, values in DEFAULT_GRID.items():
+        text = st.text_input(f"{name} 候選值（逗號分隔）", value=", ".join(str(v) for v in values))
+        try:
+            sweep_grid[name] = [float(v) for v in text.split(",") if v.strip()]
+        except ValueError:
+            st.error(f"❌ {name} 的候選值須為逗號分隔的數字：{text}")
+            st.stop()
+    min_triggers = st.number_input("最少觸發次數", min_value=1, max_value=1000, value=5, step=1)
+    if st.button("🚀 開始掃描"):
+        sweep_start = time.time()
+        histories = load_histories(tuple(selected_tickers), selected_period, selected_interval)
+        sweep_options = {}
+        for ticker in histories:
+            pcr, _, _, avg_iv, _ = calculate_options_metrics(ticker, get_provider().ticker(ticker))
+            sweep_options[ticker] = (pcr, avg_iv)
+        with st.spinner("掃描中..."):
+            sweep_result = run_threshold_sweep(histories, sweep_grid, sweep_options)
+        st.success(f"✅ 共 {len(build_threshold_grid(effective_grid(sweep_grid, sweep_options)))} 組閾值 × {len(histories)} 檔股票，耗時 {time.time() - sweep_start:.1f} 秒")
+        st.dataframe(best_thresholds(sweep_result, min_triggers), use_container_width=True)
+        st.download_button(
+            label="📥 下載完整掃描結果 (CSV)",
+            data=sweep_result.to_csv(index=False),
+            file_name=f"閾值掃描_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+            mime="text/csv",
+        )
+    st.stop()
+
+signal_store = get_signal_store()
+# 事件库按 K线间隔 + 阈值 分组，切换间隔或调整阈值不会与之前的事件混在一起
+store_settings = settings_key(selected_interval, THRESHOLDS)
+
+# 信号事件查询：直接读事件库，不重新计算历史
+with st.expander("📒 信號事件記錄查詢"):
+    all_signal_names = SIGNAL_NAMES + [KEY_PIVOT_SIGNAL]
+    query_signals = st.multiselect("信號", all_signal_names, default=["📈 MACD買入"])
+    query_tickers = st.multiselect("股票（留空為全部）", selected_tickers, default=selected_tickers)
+    query_days = st.number_input("最近天數", min_value=1, max_value=3650, value=30, step=1)
+    query_start = time.perf_counter()
+    events = signal_store.recent(query_days, query_signals, query_tickers, limit=5000, settings=store_settings)
+    st.caption(f"共 {len(events)} 筆事件，查詢耗時 {(time.perf_counter() - query_start) * 1000:.1f} ms")
+    st.dataframe(events, use_container_width=True)
+
+# 摘要表分页与详细面板选择：页面内容只随每页行数与展开数增长，与自选股数量无关
+summary_page_size = st.selectbox("摘要表每頁行數", SUMMARY_PAGE_SIZES, index=1)
+summary_pages = max(1, -(-len(selected_tickers) // summary_page_size))
+summary_page = st.number_input(f"摘要表頁碼（共 {summary_pages} 頁）", min_value=1, max_value=summary_pages, value=1, step=1)
+detail_tickers = st.multiselect(
+    f"展開詳細面板的股票（最多 {DETAIL_MAX_PANELS} 檔）", selected_tickers,
+    default=selected_tickers if len(selected_tickers) <= DETAIL_DEFAULT_LIMIT else [],
+    max_selections=DETAIL_MAX_PANELS)
+
+# 异动提醒 + Email 推播
+def dispatch_alert(state):
+    ticker = state["ticker"]
+    # 同一根K线上已发过邮件的信号不再重发（每次刷新都会重新判断最新一根K线）
+    bar_time = state["data"]["Datetime"].iloc[-1]
+    signals = alert_signal_names(state["price_pct_change"], state["volume_pct_change"], state["pcr"], state["avg_iv"],
+                                 state["alert_flags"], THRESHOLDS)
+    if all(signal_store.has_alert(ticker, bar_time, signal, store_settings) for signal in signals):
+        return
+    st.toast(f"📣 {state['alert_msg']}")
+    try:
+        send_email_alert(ticker, state["price_pct_change"], state["volume_pct_change"], state["pcr"], state["avg_iv"],
+                         thresholds=THRESHOLDS, rolling_success_rates=state["rolling_success_rates"], **state["alert_flags"])
+    except Exception as e:
+        st.error(f"Email 發送失敗：{e}")
+        return
+    st.toast(f"📬 Email 已發送給 {RECIPIENT_EMAIL}")
+    signal_store.record_alert(ticker, bar_time, signals, store_settings)
+
+# 股票对走势背离：同一对股票在同一根K线上只发一次邮件
+def dispatch_divergence_alert(divergences):
+    for item in divergences:
+        st.toast(f"🔗 {item['message']}")
+    # 已发送记录存在事件库的股票对提醒表里，页面重跑、多个会话或重启后都不会重复发送
+    unsent = [item for item in divergences
+              if not signal_store.has_pair_alert(item["pair"], item["bar_time"], DIVERGENCE_SIGNAL, pair_settings)]
+    if not unsent:
+        return
+    try:
+        send_divergence_alert(unsent)
+    except Exception as e:
+        st.error(f"Email 發送失敗：{e}")
+        return
+    for item in unsent:
+        signal_store.record_pair_alert(item["pair"], item["bar_time"], [DIVERGENCE_SIGNAL], pair_settings)
+    st.toast(f"📬 背離提醒 Email 已發送給 {RECIPIENT_EMAIL}")
+
+# 提交后台取数任务，返回 {ticker: future}
+def submit_refresh(tickers):
+    if use_worker_processes:
+        executor = get_process_executor()
+        return {ticker: executor.submit(build_and_publish, ticker, selected_period, selected_interval, THRESHOLDS, SHARED_BARS_DIR)
+                for ticker in tickers}
+    executor = get_fetch_executor()
+    return {ticker: executor.submit(build_ticker_state, ticker, selected_period, selected_interval, THRESHOLDS, signal_store)
+            for ticker in tickers}
+
+# 取回后台结果；子进程模式下从共享内存挂回数组，并在主进程写入信号事件
+def collect_refresh(pending):
+    states = {}
+    for ticker, future in pending.items():
+        state = future.result()
+        if "shared_version" in state:
+            state = attach_shared_state(state, get_shared_reader())
+            if not state["error"]:
+                signal_store.append_events(ticker, state["data"], state["signal_masks"], store_settings)
+        states[ticker] = state
+    return states
+
+# 数据源限流与熔断状态（令牌桶、自适应并发、各端点熔断器）
+def render_provider_status(status):
+    endpoints = status["endpoints"]
+    open_endpoints = [name for name, endpoint in endpoints.items() if endpoint["state"] != "closed"]
+    title = "🚦 數據源狀態：" + ("、".join(open_endpoints) + " 熔斷中" if open_endpoints else "正常")
+    with st.expander(title, expanded=bool(open_endpoints)):
+        bucket = status["bucket"]
+        concurrency = status["concurrency"]
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("限速 (次/秒)", f"{bucket['rate']:g}")
+        col2.metric("累計限速等待 (秒)", f"{bucket['waited_s']:.1f}")
+        col3.metric("並發上限", concurrency["limit"], f"{concurrency['in_flight']} 進行中", delta_color="off")
+        col4.metric("並發減半次數", concurrency["decreases"])
+        st.dataframe(pd.DataFrame.from_dict(endpoints, orient="index"), use_container_width=True)
+        if use_worker_processes:
+            st.caption("子進程模式下每個子進程各有一組限流器與熔斷器，此處僅顯示主進程的狀態")
+
+# 摘要表：每只股票一行，只渲染当前页
+def render_summary(states, tickers):
+    page_tickers = tickers[(summary_page - 1) * summary_page_size:summary_page * summary_page_size]
+    rows = [summarize_ticker_state(states[ticker]) for ticker in page_tickers if ticker in states]
+    caption = (f"第 {summary_page} / {summary_pages} 頁，共 {len(tickers)} 檔股票；"
+               f"{sum(1 for state in states.values() if not state['error'] and state['alert_msg'])} 檔觸發異動提醒")
+    summary_fingerprint = fingerprint(caption, rows)
+    if rendered.get("summary") == summary_fingerprint:
+        return
+    rendered["summary"] = summary_fingerprint
+    with summary_slot.container():
+        st.caption(caption)
+        if rows:
+            render_summary_table(rows)
+
+def render_summary_table(rows):
+    st.dataframe(
+        pd.DataFrame(rows),
+        use_container_width=True,
+        hide_index=True,
+        column_config={
+            "最新價": st.column_config.NumberColumn("最新價", format="$%.2f"),
+            "漲跌": st.column_config.NumberColumn("漲跌", format="%.2f"),
+            "漲跌幅 (%)": st.column_config.NumberColumn("漲跌幅 (%)", format="%.2f%%"),
+            "成交量": st.column_config.NumberColumn("成交量", format="%d"),
+            "成交量變動 (%)": st.column_config.NumberColumn("成交量變動 (%)", format="%.2f%%"),
+            "PCR": st.column_config.NumberColumn("PCR", format="%.2f"),
+            "最新信號": st.column_config.TextColumn("最新信號", width="large"),
+            "提醒": st.column_config.CheckboxColumn("提醒"),
+            "狀態": st.column_config.TextColumn("狀態", width="medium"),
+        },
+    )
+
+# 摘要表 + 已选股票的详细面板（未选中的股票不画图、不算百分位表）；
+# 关闭差异更新时每次刷新清空全部指纹，所有区块整体重绘
+def render_dashboard(states, tickers, heading):
+    if not diff_updates:
+        rendered.clear()
+        for panel in panels.values():
+            panel.clear()
+    heading_slot.subheader(heading)
+    render_summary(states, tickers)
+    for ticker in detail_tickers:
+        if ticker not in states:
+            continue
+        panel = panels[ticker]
+        try:
+            if panel:
+                render_ticker(states[ticker], panel)
+            else:
+                with detail_slots[ticker].container(border=True):
+                    render_ticker(states[ticker], panel)
+        except Exception as e:
+            panel.clear()
+            detail_slots[ticker].warning(f"⚠️ {ticker} 詳細面板繪製失敗：{e}")
+
+# 联动监控：相关系数最高的股票对与最新一根K线上的背离，股票不多时附相关系数热图
+def render_comovement(divergences):
+    pairs = comovement.pairs(COMOVEMENT_TOP_PAIRS)
+    comovement_fingerprint = fingerprint(pairs.round(2).to_dict("list"), [item["message"] for item in divergences])
+    if rendered.get("comovement") == comovement_fingerprint:
+        return
+    rendered["comovement"] = comovement_fingerprint
+    title = f"🔗 聯動監控（最近 {comovement_window} 根K線的 Price Change % 相關係數）"
+    if divergences:
+        title += f"：{len(divergences)} 對走勢背離"
+    with comovement_slot.container():
+        with st.expander(title, expanded=bool(divergences)):
+            for item in divergences:
+                st.warning(f"🔗 {item['message']}")
+            if pairs.empty:
+                st.write("共同K線不足，暫無相關係數")
+                return
+            st.dataframe(
+                pairs,
+                use_container_width=True,
+                hide_index=True,
+                column_config={
+                    "相關係數": st.column_config.NumberColumn("相關係數", format="%.2f"),
+                    "β (A 對 B)": st.column_config.NumberColumn("β (A 對 B)", format="%.2f"),
+                },
+            )
+            if len(comovement.tickers) <= COMOVEMENT_HEATMAP_MAX:
+                import plotly.graph_objects as go
+
+                corr = comovement.correlation()
+                fig = go.Figure(go.Heatmap(z=corr.to_numpy().round(2), x=corr.columns, y=corr.index,
+                                           zmin=-1, zmax=1, colorscale="RdBu"))
+                fig.update_layout(height=max(300, 24 * len(corr)))
+                st.plotly_chart(fig, use_container_width=True,
+                                key=f"comovement_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}")
+
+# 数据源状态只在内容变化时重绘
+def update_provider_status(status):
+    status_fingerprint = fingerprint(status["concurrency"], status["endpoints"], status["bucket"]["waited_s"])
+    if rendered.get("provider") == status_fingerprint:
+        return
+    rendered["provider"] = status_fingerprint
+    with status_slot.container():
+        render_provider_status(status)
+
+# 统计推送给浏览器的字节数：包装本会话的消息出口，每条 ForwardMsg 按序列化大小累加
+def install_push_meter():
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+    ctx = get_script_run_ctx()
+    if ctx is None:
+        return {"bytes": 0, "messages": 0}
+    enqueue = ctx._enqueue
+    meter = getattr(enqueue, "push_meter", None)
+    if meter is None:
+        meter = {"bytes": 0, "messages": 0}
+
+        def metered_enqueue(msg):
+            meter["bytes"] += msg.ByteSize()
+            meter["messages"] += 1
+            enqueue(msg)
+
+        metered_enqueue.push_meter = meter
+        ctx._enqueue = metered_enqueue
+    return meter
+
+# 首次绘制耗时（快照或实时数据，取先到者）
+def report_first_paint(source):
+    first_paint = time.perf_counter() - SCRIPT_START
+    startup_slot.caption(f"🚀 首次繪製耗時 {first_paint:.2f} 秒（來源：{source}）")
+    logger.info("first paint from %s: %.3fs", source, first_paint)
+
+# 固定的界面区块：每个区块只在自身内容变化时重绘，其余区块保持不动
+startup_slot = st.empty()
+heading_slot = st.empty()
+summary_slot = st.empty()
+comovement_slot = st.empty()
+detail_slots = {ticker: st.empty() for ticker in detail_tickers}
+alert_slot = st.empty()
+status_slot = st.empty()
+footer_slot = st.empty()
+panels = {ticker: {} for ticker in detail_tickers}
+rendered = {}
+comovement = CoMovementMonitor(comovement_window, corr_threshold=divergence_corr_threshold,
+                               z_threshold=divergence_z_threshold)
+# 背离提醒按 K线间隔 + 联动窗口 去重（调整提醒阈值不会让同一根K线的背离重发）
+pair_settings = settings_key(selected_interval, {"COMOVEMENT_WINDOW": comovement_window})
+push_meter = install_push_meter()
+monitor_settings = {"period": selected_period, "interval": selected_interval, "thresholds": THRESHOLDS}
+if SIGNAL_API_PORT and get_signal_api() is None:
+    st.warning(f"⚠️ 信號接口未啟動：{SIGNAL_API_HOST}:{SIGNAL_API_PORT} 已被佔用")
+
+# 先提交取数任务，再渲染上次的快照；最新数据在后台线程中加载
+pending = submit_refresh(selected_tickers)
+first_paint_reported = False
+snapshot = load_snapshot()
+if snapshot and snapshot["settings"] == monitor_settings:
+    render_dashboard(snapshot["states"], selected_tickers,
+                     f"⏱ 快照時間：{snapshot['saved_at'].strftime('%Y-%m-%d %H:%M:%S')}（最新數據載入中…）")
+    report_first_paint("快照")
+    first_paint_reported = True
+
+refresh_count = 0
 while True:
-    with placeholder.container():
-        st.subheader(f"⏱ 更新時間：{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-
-        for ticker in selected_tickers:
-            try:
-                stock = yf.Ticker(ticker)
-                data = stock.history(period=selected_period, interval=selected_interval).reset_index()
-
-                if data.empty or len(data) < 2:
-                    st.warning(f"⚠️ {ticker} 無數據或數據不足（期間：{selected_period}，間隔：{selected_interval}），請嘗試其他時間範圍或間隔")
-                    continue
-
-                if "Date" in data.columns:
-                    data = data.rename(columns={"Date": "Datetime"})
-                elif "Datetime" not in data.columns:
-                    st.warning(f"⚠️ {ticker} 數據缺少時間列，無法處理")
-                    continue
-
-                # 计算涨跌幅百分比
-                data["Price Change %"] = data["Close"].pct_change().round(4) * 100
-                data["Volume Change %"] = data["Volume"].pct_change().round(4) * 100
-                data["Close_Difference"] = data['Close'].diff().round(2)
-                
-                # 计算前 5 周期平均收盘价与平均成交量
-                data["前5均價"] = data["Price Change %"].rolling(window=5).mean()
-                data["前5均價ABS"] = abs(data["Price Change %"]).rolling(window=5).mean()
-                data["前5均量"] = data["Volume"].rolling(window=5).mean()
-                data["📈 股價漲跌幅 (%)"] = ((abs(data["Price Change %"]) - data["前5均價ABS"]) / data["前5均價ABS"]).round(4) * 100
-                data["📊 成交量變動幅 (%)"] = ((data["Volume"] - data["前5均量"]) / data["前5均量"]).round(4) * 100
-
-                # 计算 MACD
-                data["MACD"], data["Signal"] = calculate_macd(data)
-                
-                # 计算 EMA5 和 EMA10
-                data["EMA5"] = data["Close"].ewm(span=5, adjust=False).mean()
-                data["EMA10"] = data["Close"].ewm(span=10, adjust=False).mean()
-                
-                # 计算 RSI
-                data["RSI"] = calculate_rsi(data)
-                data["RSI_MA9"] = data["RSI"].rolling(window=9).mean()
-                
-                # 计算连续上涨/下跌计数
-                data['Up'] = (data['Close'] > data['Close'].shift(1)).astype(int)
-                data['Down'] = (data['Close'] < data['Close'].shift(1)).astype(int)
-                data['Continuous_Up'] = data['Up'] * (data['Up'].groupby((data['Up'] == 0).cumsum()).cumcount() + 1)
-                data['Continuous_Down'] = data['Down'] * (data['Down'].groupby((data['Down'] == 0).cumsum()).cumcount() + 1)
-                
-                # 计算 SMA50 和 SMA200
-                data["SMA50"] = data["Close"].rolling(window=50).mean()
-                data["SMA200"] = data["Close"].rolling(window=200).mean()
-                
-                # 获取期权数据
-                pcr, max_oi_strike, max_oi_type, avg_iv, straddle_cost = calculate_options_metrics(ticker, stock)
-                
-                # 标记量价异动、Low > High、High < Low、MACD、EMA、价格趋势及期权信号
-                def mark_signal(row, index):
-                    signals = []
-                    if abs(row["📈 股價漲跌幅 (%)"]) >= PRICE_THRESHOLD and abs(row["📊 成交量變動幅 (%)"]) >= VOLUME_THRESHOLD:
-                        signals.append("✅ 量價")
-                    if index > 0 and row["Low"] > data["High"].iloc[index-1]:
-                        signals.append("📈 Low>High")
-                    if index > 0 and row["High"] < data["Low"].iloc[index-1]:
-                        signals.append("📉 High<Low")
-                    if index > 0 and row["MACD"] > 0 and data["MACD"].iloc[index-1] <= 0:
-                        signals.append("📈 MACD買入")
-                    if index > 0 and row["MACD"] <= 0 and data["MACD"].iloc[index-1] > 0:
-                        signals.append("📉 MACD賣出")
-                    if (index > 0 and row["EMA5"] > row["EMA10"] and 
-                        data["EMA5"].iloc[index-1] <= data["EMA10"].iloc[index-1] and 
-                        row["Volume"] > data["Volume"].iloc[index-1]):
-                        signals.append("📈 EMA買入")
-                    if (index > 0 and row["EMA5"] < row["EMA10"] and 
-                        data["EMA5"].iloc[index-1] >= data["EMA10"].iloc[index-1] and 
-                        row["Volume"] > data["Volume"].iloc[index-1]):
-                        signals.append("📉 EMA賣出")
-                    if (index > 0 and row["High"] > data["High"].iloc[index-1] and 
-                        row["Low"] > data["Low"].iloc[index-1] and 
-                        row["Close"] > data["Close"].iloc[index-1]):
-                        signals.append("📈 價格趨勢買入")
-                    if (index > 0 and row["High"] < data["High"].iloc[index-1] and 
-                        row["Low"] < data["Low"].iloc[index-1] and 
-                        row["Close"] < data["Close"].iloc[index-1]):
-                        signals.append("📉 價格趨勢賣出")
-                    if (index > 0 and row["High"] > data["High"].iloc[index-1] and 
-                        row["Low"] > data["Low"].iloc[index-1] and 
-                        row["Close"] > data["Close"].iloc[index-1] and 
-                        row["Volume"] > data["前5均量"].iloc[index]):
-                        signals.append("📈 價格趨勢買入(量)")
-                    if (index > 0 and row["High"] < data["High"].iloc[index-1] and 
-                        row["Low"] < data["Low"].iloc[index-1] and 
-                        row["Close"] < data["Close"].iloc[index-1] and 
-                        row["Volume"] > data["前5均量"].iloc[index]):
-                        signals.append("📉 價格趨勢賣出(量)")
-                    if (index > 0 and row["High"] > data["High"].iloc[index-1] and 
-                        row["Low"] > data["Low"].iloc[index-1] and 
-                        row["Close"] > data["Close"].iloc[index-1] and 
-                        row["Volume Change %"] > 15):
-                        signals.append("📈 價格趨勢買入(量%)")
-                    if (index > 0 and row["High"] < data["High"].iloc[index-1] and 
-                        row["Low"] < data["Low"].iloc[index-1] and 
-                        row["Close"] < data["Close"].iloc[index-1] and 
-                        row["Volume Change %"] > 15):
-                        signals.append("📉 價格趨勢賣出(量%)")
-                    if index > 0:
-                        gap_pct = ((row["Open"] - data["Close"].iloc[index-1]) / data["Close"].iloc[index-1]) * 100
-                        is_up_gap = gap_pct > GAP_THRESHOLD
-                        is_down_gap = gap_pct < -GAP_THRESHOLD
-                        if is_up_gap or is_down_gap:
-                            trend = data["Close"].iloc[index-5:index].mean() if index >= 5 else 0
-                            prev_trend = data["Close"].iloc[index-6:index-1].mean() if index >= 6 else trend
-                            is_up_trend = row["Close"] > trend and trend > prev_trend
-                            is_down_trend = row["Close"] < trend and trend < prev_trend
-                            is_high_volume = row["Volume"] > data["前5均量"].iloc[index]
-                            is_price_reversal = (index < len(data) - 1 and
-                                                ((is_up_gap and data["Close"].iloc[index+1] < row["Close"]) or
-                                                 (is_down_gap and data["Close"].iloc[index+1] > row["Close"])))
-                            if is_up_gap:
-                                if is_price_reversal and is_high_volume:
-                                    signals.append("📈 衰竭跳空(上)")
-                                elif is_up_trend and is_high_volume:
-                                    signals.append("📈 持續跳空(上)")
-                                elif row["High"] > data["High"].iloc[index-1:index].max() and is_high_volume:
-                                    signals.append("📈 突破跳空(上)")
-                                else:
-                                    signals.append("📈 普通跳空(上)")
-                            elif is_down_gap:
-                                if is_price_reversal and is_high_volume:
-                                    signals.append("📉 衰竭跳空(下)")
-                                elif is_down_trend and is_high_volume:
-                                    signals.append("📉 持續跳空(下)")
-                                elif row["Low"] < data["Low"].iloc[index-1:index].min() and is_high_volume:
-                                    signals.append("📉 突破跳空(下)")
-                                else:
-                                    signals.append("📉 普通跳空(下)")
-                    if row['Continuous_Up'] >= CONTINUOUS_UP_THRESHOLD:
-                        signals.append("📈 連續向上買入")
-                    if row['Continuous_Down'] >= CONTINUOUS_DOWN_THRESHOLD:
-                        signals.append("📉 連續向下賣出")
-                    if pd.notna(row["SMA50"]):
-                        if row["Close"] > row["SMA50"]:
-                            signals.append("📈 SMA50上升趨勢")
-                        elif row["Close"] < row["SMA50"]:
-                            signals.append("📉 SMA50下降趨勢")
-                    if pd.notna(row["SMA50"]) and pd.notna(row["SMA200"]):
-                        if row["Close"] > row["SMA50"] and row["SMA50"] > row["SMA200"]:
-                            signals.append("📈 SMA50_200上升趨勢")
-                        elif row["Close"] < row["SMA50"] and row["SMA50"] < row["SMA200"]:
-                            signals.append("📉 SMA50_200下降趨勢")
-                    if index > 0 and row["Close"] > row["Open"] and row["Open"] > data["Close"].iloc[index-1]:
-                        signals.append("📈 新买入信号")
-                    if index > 0 and row["Close"] < row["Open"] and row["Open"] < data["Close"].iloc[index-1]:
-                        signals.append("📉 新卖出信号")
-                    if index > 0 and abs(row["Price Change %"]) > PRICE_CHANGE_THRESHOLD and abs(row["Volume Change %"]) > VOLUME_CHANGE_THRESHOLD:
-                        signals.append("🔄 新转折点")
-                    if pcr is not None and pcr > PCR_THRESHOLD:
-                        signals.append("📉 高PCR看跌信号")
-                    if pcr is not None and pcr < (1 / PCR_THRESHOLD):
-                        signals.append("📈 低PCR看涨信号")
-                    if avg_iv is not None and avg_iv > IV_THRESHOLD / 100:
-                        signals.append("⚠️ 高IV波动预警")
-                    if len(signals) > 8:
-                        signals.append(f"🔥 关键转折点 (信号数: {len(signals)})")
-                    return ", ".join(signals) if signals else ""
-                
-                data["異動標記"] = [mark_signal(row, i) for i, row in data.iterrows()]
-
-                # 当前资料
-                current_price = data["Close"].iloc[-1]
-                previous_close = stock.info.get("previousClose", current_price)
-                price_change = current_price - previous_close
-                price_pct_change = (price_change / previous_close) * 100 if previous_close else 0
-
-                last_volume = data["Volume"].iloc[-1]
-                prev_volume = data["Volume"].iloc[-2] if len(data) > 1 else last_volume
-                volume_change = last_volume - prev_volume
-                volume_pct_change = (volume_change / prev_volume) * 100 if prev_volume else 0
-
-                # 显示期权数据
-                st.subheader(f"📊 {ticker} 期权数据")
-                if pcr is not None:
-                    st.metric(f"{ticker} 看跌/看涨比率 (PCR)", f"{pcr:.2f}")
-                if max_oi_strike is not None:
-                    st.metric(f"{ticker} 最高未平仓量行权价", f"${max_oi_strike:.2f} ({max_oi_type})")
-                if avg_iv is not None:
-                    st.metric(f"{ticker} 平均隐含波动率 (IV)", f"{avg_iv:.2f}")
-                if straddle_cost is not None:
-                    st.metric(f"{ticker} 跨式期权成本", f"${straddle_cost:.2f}")
-
-                # 检查 Low > High、High < Low、MACD、EMA、价格趋势及期权信号
-                low_high_signal = len(data) > 1 and data["Low"].iloc[-1] > data["High"].iloc[-2]
-                high_low_signal = len(data) > 1 and data["High"].iloc[-1] < data["Low"].iloc[-2]
-                macd_buy_signal = len(data) > 1 and data["MACD"].iloc[-1] > 0 and data["MACD"].iloc[-2] <= 0
-                macd_sell_signal = len(data) > 1 and data["MACD"].iloc[-1] <= 0 and data["MACD"].iloc[-2] > 0
-                ema_buy_signal = (len(data) > 1 and 
-                                 data["EMA5"].iloc[-1] > data["EMA10"].iloc[-1] and 
-                                 data["EMA5"].iloc[-2] <= data["EMA10"].iloc[-2] and 
-                                 data["Volume"].iloc[-1] > data["Volume"].iloc[-2])
-                ema_sell_signal = (len(data) > 1 and 
-                                  data["EMA5"].iloc[-1] < data["EMA10"].iloc[-1] and 
-                                  data["EMA5"].iloc[-2] >= data["EMA10"].iloc[-2] and 
-                                  data["Volume"].iloc[-1] > data["Volume"].iloc[-2])
-                price_trend_buy_signal = (len(data) > 1 and 
-                                         data["High"].iloc[-1] > data["High"].iloc[-2] and 
-                                         data["Low"].iloc[-1] > data["Low"].iloc[-2] and 
-                                         data["Close"].iloc[-1] > data["Close"].iloc[-2])
-                price_trend_sell_signal = (len(data) > 1 and 
-                                          data["High"].iloc[-1] < data["High"].iloc[-2] and 
-                                          data["Low"].iloc[-1] < data["Low"].iloc[-2] and 
-                                          data["Close"].iloc[-1] < data["Close"].iloc[-2])
-                price_trend_vol_buy_signal = (len(data) > 1 and 
-                                             data["High"].iloc[-1] > data["High"].iloc[-2] and 
-                                             data["Low"].iloc[-1] > data["Low"].iloc[-2] and 
-                                             data["Close"].iloc[-1] > data["Close"].iloc[-2] and 
-                                             data["Volume"].iloc[-1] > data["前5均量"].iloc[-1])
-                price_trend_vol_sell_signal = (len(data) > 1 and 
-                                              data["High"].iloc[-1] < data["High"].iloc[-2] and 
-                                              data["Low"].iloc[-1] < data["Low"].iloc[-2] and 
-                                              data["Close"].iloc[-1] < data["Close"].iloc[-2] and 
-                                              data["Volume"].iloc[-1] > data["前5均量"].iloc[-1])
-                price_trend_vol_pct_buy_signal = (len(data) > 1 and 
-                                                 data["High"].iloc[-1] > data["High"].iloc[-2] and 
-                                                 data["Low"].iloc[-1] > data["Low"].iloc[-2] and 
-                                                 data["Close"].iloc[-1] > data["Close"].iloc[-2] and 
-                                                 data["Volume Change %"].iloc[-1] > 15)
-                price_trend_vol_pct_sell_signal = (len(data) > 1 and 
-                                                  data["High"].iloc[-1] < data["High"].iloc[-2] and 
-                                                  data["Low"].iloc[-1] < data["Low"].iloc[-2] and 
-                                                  data["Close"].iloc[-1] < data["Close"].iloc[-2] and 
-                                                  data["Volume Change %"].iloc[-1] > 15)
-                new_buy_signal = (len(data) > 1 and 
-                                 data["Close"].iloc[-1] > data["Open"].iloc[-1] and 
-                                 data["Open"].iloc[-1] > data["Close"].iloc[-2])
-                new_sell_signal = (len(data) > 1 and 
-                                  data["Close"].iloc[-1] < data["Open"].iloc[-1] and 
-                                  data["Open"].iloc[-1] < data["Close"].iloc[-2])
-                new_pivot_signal = (len(data) > 1 and 
-                                   abs(data["Price Change %"].iloc[-1]) > PRICE_CHANGE_THRESHOLD and 
-                                   abs(data["Volume Change %"].iloc[-1]) > VOLUME_CHANGE_THRESHOLD)
-                
-                # 跳空信号检测
-                gap_common_up = False
-                gap_common_down = False
-                gap_breakaway_up = False
-                gap_breakaway_down = False
-                gap_runaway_up = False
-                gap_runaway_down = False
-                gap_exhaustion_up = False
-                gap_exhaustion_down = False
-                if len(data) > 1:
-                    gap_pct = ((data["Open"].iloc[-1] - data["Close"].iloc[-2]) / data["Close"].iloc[-2]) * 100
-                    is_up_gap = gap_pct > GAP_THRESHOLD
-                    is_down_gap = gap_pct < -GAP_THRESHOLD
-                    if is_up_gap or is_down_gap:
-                        trend = data["Close"].iloc[-5:].mean() if len(data) >= 5 else 0
-                        prev_trend = data["Close"].iloc[-6:-1].mean() if len(data) >= 6 else trend
-                        is_up_trend = data["Close"].MOSs[-1] > trend and trend > prev_trend
-                        is_down_trend = data["Close"].iloc[-1] < trend and trend < prev_trend
-                        is_high_volume = data["Volume"].iloc[-1] > data["前5均量"].iloc[-1]
-                        is_price_reversal = (len(data) > 2 and
-                                            ((is_up_gap and data["Close"].iloc[-1] < data["Close"].iloc[-2]) or
-                                             (is_down_gap and data["Close"].iloc[-1] > data["Close"].iloc[-2])))
-                        if is_up_gap:
-                            if is_price_reversal and is_high_volume:
-                                gap_exhaustion_up = True
-                            elif is_up_trend and is_high_volume:
-                                gap_runaway_up = True
-                            elif data["High"].iloc[-1] > data["High"].iloc[-2:-1].max() and is_high_volume:
-                                gap_breakaway_up = True
-                            else:
-                                gap_common_up = True
-                        elif is_down_gap:
-                            if is_price_reversal and is_high_volume:
-                                gap_exhaustion_down = True
-                            elif is_down_trend and is_high_volume:
-                                gap_runaway_down = True
-                            elif data["Low"].iloc[-1] < data["Low"].iloc[-2:-1].min() and is_high_volume:
-                                gap_breakaway_down = True
-                            else:
-                                gap_common_down = True
-
-                # 连续向上/向下信号检测
-                continuous_up_buy_signal = data['Continuous_Up'].iloc[-1] >= CONTINUOUS_UP_THRESHOLD
-                continuous_down_sell_signal = data['Continuous_Down'].iloc[-1] >= CONTINUOUS_DOWN_THRESHOLD
-
-                # SMA趋势信号检测
-                sma50_up_trend = False
-                sma50_down_trend = False
-                sma50_200_up_trend = False
-                sma50_200_down_trend = False
-                if pd.notna(data["SMA50"].iloc[-1]):
-                    if data["Close"].iloc[-1] > data["SMA50"].iloc[-1]:
-                        sma50_up_trend = True
-                    elif data["Close"].iloc[-1] < data["SMA50"].iloc[-1]:
-                        sma50_down_trend = True
-                if pd.notna(data["SMA50"].iloc[-1]) and pd.notna(data["SMA200"].iloc[-1]):
-                    if data["Close"].iloc[-1] > data["SMA50"].iloc[-1] and data["SMA50"].iloc[-1] > data["SMA200"].iloc[-1]:
-                        sma50_200_up_trend = True
-                    elif data["Close"].iloc[-1] < data["SMA50"].iloc[-1] and data["SMA50"].iloc[-1] < data["SMA200"].iloc[-1]:
-                        sma50_200_down_trend = True
-
-                # 显示当前资料
-                st.metric(f"{ticker} 🟢 股價變動", f"${current_price:.2f}",
-                          f"{price_change:.2f} ({price_pct_change:.2f}%)")
-                st.metric(f"{ticker} 🔵 成交量變動", f"{last_volume:,}",
-                          f"{volume_change:,} ({volume_pct_change:.2f}%)")
-
-                # 计算并显示所有信号的成功率
-                success_rates = calculate_signal_success_rate(data)
-                st.subheader(f"📊 {ticker} 各信号成功率")
-                success_data = []
-                for signal, metrics in success_rates.items():
-                    success_rate = metrics["success_rate"]
-                    total_signals = metrics["total_signals"]
-                    direction = metrics["direction"]
-                    success_definition = "下一交易日的最低价低于当前最低价且收盘价低于当前收盘价" if direction == "down" else "下一交易日的最高价高于当前最高价且收盘价高于当前收盘价"
-                    success_data.append({
-                        "信号": signal,
-                        "成功率 (%)": f"{success_rate:.2f}%",
-                        "触发次数": total_signals,
-                        "成功定义": success_definition
-                    })
-                    st.metric(f"{ticker} {signal} 成功率", 
-                              f"{success_rate:.2f}%",
-                              f"基于 {total_signals} 次信号 ({'下跌' if direction == 'down' else '上涨'})")
-                    if total_signals > 0 and total_signals < 5:
-                        st.warning(f"⚠️ {ticker} {signal} 样本量过少（{total_signals} 次），成功率可能不稳定")
-                
-                if success_data:
-                    st.dataframe(
-                        pd.DataFrame(success_data),
-                        use_container_width=True,
-                        column_config={
-                            "信号": st.column_config.TextColumn("信号", width="medium"),
-                            "成功率 (%)": st.column_config.TextColumn("成功率 (%)", width="small"),
-                            "触发次数": st.column_config.NumberColumn("触发次数", width="small"),
-                            "成功定义": st.column_config.TextColumn("成功定义", width="large")
-                        }
-                    )
-
-                # 异动提醒 + Email 推播
-                if (abs(price_pct_change) >= PRICE_THRESHOLD and abs(volume_pct_change) >= VOLUME_THRESHOLD) or low_high_signal or high_low_signal or macd_buy_signal or macd_sell_signal or ema_buy_signal or ema_sell_signal or price_trend_buy_signal or price_trend_sell_signal or price_trend_vol_buy_signal or price_trend_vol_sell_signal or price_trend_vol_pct_buy_signal or price_trend_vol_pct_sell_signal or gap_common_up or gap_common_down or gap_breakaway_up or gap_breakaway_down or gap_runaway_up or gap_runaway_down or gap_exhaustion_up or gap_exhaustion_down or continuous_up_buy_signal or continuous_down_sell_signal or sma50_up_trend or sma50_down_trend or sma50_200_up_trend or sma50_200_down_trend or new_buy_signal or new_sell_signal or new_pivot_signal or (pcr is not None and (pcr > PCR_THRESHOLD or pcr < (1 / PCR_THRESHOLD))) or (avg_iv is not None and avg_iv > IV_THRESHOLD / 100):
-                    alert_msg = f"{ticker} 異動：價格 {price_pct_change:.2f}%、成交量 {volume_pct_change:.2f}%"
-                    if pcr is not None and pcr > PCR_THRESHOLD:
-                        alert_msg += f"，高PCR看跌信号（PCR={pcr:.2f}）"
-                    if pcr is not None and pcr < (1 / PCR_THRESHOLD):
-                        alert_msg += f"，低PCR看涨信号（PCR={pcr:.2f}）"
-                    if avg_iv is not None and avg_iv > IV_THRESHOLD / 100:
-                        alert_msg += f"，高IV波动预警（IV={avg_iv:.2f}）"
-                    if low_high_signal:
-                        alert_msg += "，當前最低價高於前一時段最高價"
-                    if high_low_signal:
-                        alert_msg += "，當前最高價低於前一時段最低價"
-                    if macd_buy_signal:
-                        alert_msg += "，MACD 買入訊號（MACD 線由負轉正）"
-                    if macd_sell_signal:
-                        alert_msg += "，MACD 賣出訊號（MACD 線由正轉負）"
-                    if ema_buy_signal:
-                        alert_msg += "，EMA 買入訊號（EMA5 上穿 EMA10，成交量放大）"
-                    if ema_sell_signal:
-                        alert_msg += "，EMA 賣出訊號（EMA5 下破 EMA10，成交量放大）"
-                    if price_trend_buy_signal:
-                        alert_msg += "，價格趨勢買入訊號（最高價、最低價、收盤價均上漲）"
-                    if price_trend_sell_signal:
-                        alert_msg += "，價格趨勢賣出訊號（最高價、最低價、收盤價均下跌）"
-                    if price_trend_vol_buy_signal:
-                        alert_msg += "，價格趨勢買入訊號（量）（最高價、最低價、收盤價均上漲且成交量放大）"
-                    if price_trend_vol_sell_signal:
-                        alert_msg += "，價格趨勢賣出訊號（量）（最高價、最低價、收盤價均下跌且成交量放大）"
-                    if price_trend_vol_pct_buy_signal:
-                        alert_msg += "，價格趨勢買入訊號（量%）（最高價、最低價、收盤價均上漲且成交量變化 > 15%）"
-                    if price_trend_vol_pct_sell_signal:
-                        alert_msg += "，價格趨勢賣出訊號（量%）（最高價、最低價、收盤價均下跌且成交量變化 > 15%）"
-                    if gap_common_up:
-                        alert_msg += "，普通跳空(上)（價格向上跳空，未伴隨明顯趨勢或成交量放大）"
-                    if gap_common_down:
-                        alert_msg += "，普通跳空(下)（價格向下跳空，未伴隨明顯趨勢或成交量放大）"
-                    if gap_breakaway_up:
-                        alert_msg += "，突破跳空(上)（價格向上跳空，突破前高且成交量放大）"
-                    if gap_breakaway_down:
-                        alert_msg += "，突破跳空(下)（價格向下跳空，跌破前低且成交量放大）"
-                    if gap_runaway_up:
-                        alert_msg += "，持續跳空(上)（價格向上跳空，處於上漲趨勢且成交量放大）"
-                    if gap_runaway_down:
-                        alert_msg += "，持續跳空(下)（價格向下跳空，處於下跌趨勢且成交量放大）"
-                    if gap_exhaustion_up:
-                        alert_msg += "，衰竭跳空(上)（價格向上跳空，趨勢末端且隨後價格下跌，成交量放大）"
-                    if gap_exhaustion_down:
-                        alert_msg += "，衰竭跳空(下)（價格向下跳空，趨勢末端且隨後價格上漲，成交量放大）"
-                    if continuous_up_buy_signal:
-                        alert_msg += f"，連續向上策略買入訊號（至少連續 {CONTINUOUS_UP_THRESHOLD} 根K線上漲）"
-                    if continuous_down_sell_signal:
-                        alert_msg += f"，連續向下策略賣出訊號（至少連續 {CONTINUOUS_DOWN_THRESHOLD} 根K線下跌）"
-                    if sma50_up_trend:
-                        alert_msg += "，SMA50 上升趨勢（當前價格高於 SMA50）"
-                    if sma50_down_trend:
-                        alert_msg += "，SMA50 下降趨勢（當前價格低於 SMA50）"
-                    if sma50_200_up_trend:
-                        alert_msg += "，SMA50_200 上升趨勢（當前價格高於 SMA50 且 SMA50 高於 SMA200）"
-                    if sma50_200_down_trend:
-                        alert_msg += "，SMA50_200 下降趨勢（當前價格低於 SMA50 且 SMA50 低於 SMA200）"
-                    if new_buy_signal:
-                        alert_msg += "，新买入信号（今日收盘价大于开盘价且今日开盘价大于前日收盘价）"
-                    if new_sell_signal:
-                        alert_msg += "，新卖出信号（今日收盘价小于开盘价且今日开盘价小于前日收盘价）"
-                    if new_pivot_signal:
-                        alert_msg += f"，新转折点（|Price Change %| > {PRICE_CHANGE_THRESHOLD}% 且 |Volume Change %| > {VOLUME_CHANGE_THRESHOLD}%）"
-                    st.warning(f"📣 {alert_msg}")
-                    st.toast(f"📣 {alert_msg}")
-                    send_email_alert(ticker, price_pct_change, volume_pct_change, pcr, avg_iv, low_high_signal, high_low_signal, 
-                                    macd_buy_signal, macd_sell_signal, ema_buy_signal, ema_sell_signal, 
-                                    price_trend_buy_signal, price_trend_sell_signal,
-                                    price_trend_vol_buy_signal, price_trend_vol_sell_signal,
-                                    price_trend_vol_pct_buy_signal, price_trend_vol_pct_sell_signal,
-                                    gap_common_up, gap_common_down, gap_breakaway_up, gap_breakaway_down,
-                                    gap_runaway_up, gap_runaway_down, gap_exhaustion_up, gap_exhaustion_down,
-                                    continuous_up_buy_signal, continuous_down_sell_signal,
-                                    sma50_up_trend, sma50_down_trend,
-                                    sma50_200_up_trend, sma50_200_down_trend,
-                                    new_buy_signal, new_sell_signal, new_pivot_signal)
-
-                # 添加 K 线图（含 EMA）、成交量柱状图、RSI 和期权数据子图
-                st.subheader(f"📈 {ticker} K線圖與技術指標")
-                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-                fig = make_subplots(rows=4, cols=1, shared_xaxes=True, 
-                                    subplot_titles=(f"{ticker} K線與EMA", "成交量", "RSI", "看跌/看涨比率 (PCR)"),
-                                    vertical_spacing=0.1, row_heights=[0.4, 0.2, 0.2, 0.2])
-                
-                # 添加 K 线图
-                fig.add_trace(go.Candlestick(x=data.tail(50)["Datetime"],
-                                            open=data.tail(50)["Open"],
-                                            high=data.tail(50)["High"],
-                                            low=data.tail(50)["Low"],
-                                            close=data.tail(50)["Close"],
-                                            name="K線"), row=1, col=1)
-                
-                # 添加 EMA5、EMA10 和 SMA50
-                fig.add_trace(go.Scatter(x=data.tail(50)["Datetime"], y=data.tail(50)["EMA5"], mode='lines', name='EMA5', line=dict(color='blue')), row=1, col=1)
-                fig.add_trace(go.Scatter(x=data.tail(50)["Datetime"], y=data.tail(50)["EMA10"], mode='lines', name='EMA10', line=dict(color='green')), row=1, col=1)
-                fig.add_trace(go.Scatter(x=data.tail(50)["Datetime"], y=data.tail(50)["SMA50"], mode='lines', name='SMA50', line=dict(color='orange')), row=1, col=1)
-                
-                # 添加成交量柱状图和移动平均线
-                data["Volume_MA5"] = data["Volume"].rolling(window=5).mean()
-                fig.add_bar(x=data.tail(50)["Datetime"], y=data.tail(50)["Volume"], 
-                           name="成交量", opacity=0.5, marker=dict(color='gray'), row=2, col=1)
-                fig.add_trace(go.Scatter(x=data.tail(50)["Datetime"], y=data.tail(50)["Volume_MA5"], mode='lines', name='Volume MA5', line=dict(color='purple')), row=2, col=1)
-                
-                # 添加 RSI 子图
-                fig.add_trace(go.Scatter(x=data.tail(50)["Datetime"], y=data.tail(50)["RSI"], mode='lines', name='RSI', line=dict(color='cyan')), row=3, col=1)
-                fig.add_trace(go.Scatter(x=data.tail(50)["Datetime"], y=data.tail(50)["RSI_MA9"], mode='lines', name='RSI MA9', line=dict(color='blue')), row=3, col=1)
-                fig.add_hline(y=70, line_dash="dash", line_color="red", row=3, col=1)
-                fig.add_hline(y=30, line_dash="dash", line_color="green", row=3, col=1)
-                
-                # 添加 PCR 子图（假设有历史 PCR 数据，需从外部 API 获取，这里用单一值模拟）
-                pcr_data = [pcr] * len(data.tail(50)) if pcr is not None else [np.nan] * len(data.tail(50))
-                fig.add_trace(go.Scatter(x=data.tail(50)["Datetime"], y=pcr_data, mode='lines', name='PCR', line=dict(color='purple')), row=4, col=1)
-                fig.add_hline(y=PCR_THRESHOLD, line_dash="dash", line_color="red", row=4, col=1)
-                fig.add_hline(y=1/PCR_THRESHOLD, line_dash="dash", line_color="green", row=4, col=1)
-                
-                # 标记信号
-                for i in range(1, len(data.tail(50))):
-                    idx = -50 + i
-                    if (data["EMA5"].iloc[idx] > data["EMA10"].iloc[idx] and 
-                        data["EMA5"].iloc[idx-1] <= data["EMA10"].iloc[idx-1]):
-                        fig.add_annotation(x=data["Datetime"].iloc[idx], y=data["Close"].iloc[idx],
-                                         text="📈 EMA買入", showarrow=True, arrowhead=2, ax=20, ay=-30, row=1, col=1)
-                    elif (data["EMA5"].iloc[idx] < data["EMA10"].iloc[idx] and 
-                          data["EMA5"].iloc[idx-1] >= data["EMA10"].iloc[idx-1]):
-                        fig.add_annotation(x=data["Datetime"].iloc[idx], y=data["Close"].iloc[idx],
-                                         text="📉 EMA賣出", showarrow=True, arrowhead=2, ax=20, ay=30, row=1, col=1)
-                    if "关键转折点" in data["異動標記"].iloc[idx]:
-                        fig.add_scatter(x=[data["Datetime"].iloc[idx]], y=[data["Close"].iloc[idx]],
-                                       mode="markers+text", marker=dict(symbol="star", size=12, color="yellow"),
-                                       text=[f"🔥 转折点 ${data['Close'].iloc[idx]:.2f}"],
-                                       textposition="top center", name="关键转折点", row=1, col=1)
-                    if "新买入信号" in data["異動標記"].iloc[idx]:
-                        fig.add_scatter(x=[data["Datetime"].iloc[idx]], y=[data["Close"].iloc[idx]],
-                                       mode="markers+text", marker=dict(symbol="triangle-up", size=10, color="green"),
-                                       text=[f"📈 新买入 ${data['Close'].iloc[idx]:.2f}"],
-                                       textposition="bottom center", name="新买入信号", row=1, col=1)
-                    if "新卖出信号" in data["異動標記"].iloc[idx]:
-                        fig.add_scatter(x=[data["Datetime"].iloc[idx]], y=[data["Close"].iloc[idx]],
-                                       mode="markers+text", marker=dict(symbol="triangle-down", size=10, color="red"),
-                                       text=[f"📉 新卖出 ${data['Close'].iloc[idx]:.2f}"],
-                                       textposition="top center", name="新卖出信号", row=1, col=1)
-                    if "新转折点" in data["異動標記"].iloc[idx]:
-                        fig.add_scatter(x=[data["Datetime"].iloc[idx]], y=[data["Close"].iloc[idx]],
-                                       mode="markers+text", marker=dict(symbol="star", size=10, color="purple"),
-                                       text=[f"🔄 新转折点 ${data['Close'].iloc[idx]:.2f}"],
-                                       textposition="top center", name="新转折点", row=1, col=1)
-                    if "高PCR看跌信号" in data["異動標記"].iloc[idx]:
-                        fig.add_scatter(x=[data["Datetime"].iloc[idx]], y=[data["Close"].iloc[idx]],
-                                       mode="markers+text", marker=dict(symbol="diamond", size=10, color="red"),
-                                       text=[f"📉 高PCR ${data['Close'].iloc[idx]:.2f}"],
-                                       textposition="top center", name="高PCR看跌", row=1, col=1)
-                    if "低PCR看涨信号" in data["異動標記"].iloc[idx]:
-                        fig.add_scatter(x=[data["Datetime"].iloc[idx]], y=[data["Close"].iloc[idx]],
-                                       mode="markers+text", marker=dict(symbol="diamond", size=10, color="green"),
-                                       text=[f"📈 低PCR ${data['Close'].iloc[idx]:.2f}"],
-                                       textposition="bottom center", name="低PCR看涨", row=1, col=1)
-                    if "高IV波动预警" in data["異動標記"].iloc[idx]:
-                        fig.add_scatter(x=[data["Datetime"].iloc[idx]], y=[data["Close"].iloc[idx]],
-                                       mode="markers+text", marker=dict(symbol="circle", size=10, color="orange"),
-                                       text=[f"⚠️ 高IV ${data['Close'].iloc[idx]:.2f}"],
-                                       textposition="top center", name="高IV波动", row=1, col=1)
-                
-                fig.update_layout(yaxis_title="價格", yaxis2_title="成交量", yaxis3_title="RSI", yaxis4_title="PCR", showlegend=True)
-                st.plotly_chart(fig, use_container_width=True, key=f"chart_{ticker}_{timestamp}")
-
-                # 合并显示五项指标前 X% 的范围到表格
-                st.subheader(f"📊 {ticker} 前 {PERCENTILE_THRESHOLD}% 數據範圍")
-                range_data = []
-                
-                sorted_price_changes = data["Price Change %"].dropna().sort_values(ascending=False)
-                if len(sorted_price_changes) > 0:
-                    top_percent_count = max(1, int(len(sorted_price_changes) * PERCENTILE_THRESHOLD / 100))
-                    top_percent = sorted_price_changes.head(top_percent_count)
-                    range_data.append({
-                        "指標": "Price Change %",
-                        "範圍類型": "最高到最低",
-                        "最大值": f"{top_percent.max():.2f}%",
-                        "最小值": f"{top_percent.min():.2f}%"
-                    })
-                sorted_price_changes_asc = data["Price Change %"].dropna().sort_values(ascending=True)
-                if len(sorted_price_changes_asc) > 0:
-                    bottom_percent_count = max(1, int(len(sorted_price_changes_asc) * PERCENTILE_THRESHOLD / 100))
-                    bottom_percent = sorted_price_changes_asc.head(bottom_percent_count)
-                    range_data.append({
-                        "指標": "Price Change %",
-                        "範圍類型": "最低到最高",
-                        "最大值": f"{bottom_percent.max():.2f}%",
-                        "最小值": f"{bottom_percent.min():.2f}%"
-                    })
-
-                sorted_volume_changes = data["Volume Change %"].dropna().sort_values(ascending=False)
-                if len(sorted_volume_changes) > 0:
-                    top_volume_percent_count = max(1, int(len(sorted_volume_changes) * PERCENTILE_THRESHOLD / 100))
-                    top_volume_percent = sorted_volume_changes.head(top_volume_percent_count)
-                    range_data.append({
-                        "指標": "Volume Change %",
-                        "範圍類型": "最高到最低",
-                        "最大值": f"{top_volume_percent.max():.2f}%",
-                        "最小值": f"{top_volume_percent.min():.2f}%"
-                    })
-                sorted_volume_changes_asc = data["Volume Change %"].dropna().sort_values(ascending=True)
-                if len(sorted_volume_changes_asc) > 0:
-                    bottom_volume_percent_count = max(1, int(len(sorted_volume_changes_asc) * PERCENTILE_THRESHOLD / 100))
-                    bottom_volume_percent = sorted_volume_changes_asc.head(bottom_volume_percent_count)
-                    range_data.append({
-                        "指標": "Volume Change %",
-                        "範圍類型": "最低到最高",
-                        "最大值": f"{bottom_volume_percent.max():.2f}%",
-                        "最小值": f"{bottom_volume_percent.min():.2f}%"
-                    })
-
-                sorted_volumes = data["Volume"].dropna().sort_values(ascending=False)
-                if len(sorted_volumes) > 0:
-                    top_volume_abs_count = max(1, int(len(sorted_volumes) * PERCENTILE_THRESHOLD / 100))
-                    top_volume_abs = sorted_volumes.head(top_volume_abs_count)
-                    range_data.append({
-                        "指標": "Volume",
-                        "範圍類型": "最高到最低",
-                        "最大值": f"{int(top_volume_abs.max()):,}",
-                        "最小值": f"{int(top_volume_abs.min()):,}"
-                    })
-                sorted_volumes_asc = data["Volume"].dropna().sort_values(ascending=True)
-                if len(sorted_volumes_asc) > 0:
-                    bottom_volume_abs_count = max(1, int(len(sorted_volumes_asc) * PERCENTILE_THRESHOLD / 100))
-                    bottom_volume_abs = sorted_volumes_asc.head(bottom_volume_abs_count)
-                    range_data.append({
-                        "指標": "Volume",
-                        "範圍類型": "最低到最高",
-                        "最大值": f"{int(bottom_volume_abs.max()):,}",
-                        "最小值": f"{int(bottom_volume_abs.min()):,}"
-                    })
-
-                sorted_price_change_abs = data["📈 股價漲跌幅 (%)"].dropna().sort_values(ascending=False)
-                if len(sorted_price_change_abs) > 0:
-                    top_price_change_abs_count = max(1, int(len(sorted_price_change_abs) * PERCENTILE_THRESHOLD / 100))
-                    top_price_change_abs = sorted_price_change_abs.head(top_price_change_abs_count)
-                    range_data.append({
-                        "指標": "📈 股價漲跌幅 (%)",
-                        "範圍類型": "最高到最低",
-                        "最大值": f"{top_price_change_abs.max():.2f}%",
-                        "最小值": f"{top_price_change_abs.min():.2f}%"
-                    })
-                sorted_price_change_abs_asc = data["📈 股價漲跌幅 (%)"].dropna().sort_values(ascending=True)
-                if len(sorted_price_change_abs_asc) > 0:
-                    bottom_price_change_abs_count = max(1, int(len(sorted_price_change_abs_asc) * PERCENTILE_THRESHOLD / 100))
-                    bottom_price_change_abs = sorted_price_change_abs_asc.head(bottom_price_change_abs_count)
-                    range_data.append({
-                        "指標": "📈 股價漲跌幅 (%)",
-                        "範圍類型": "最低到最高",
-                        "最大值": f"{bottom_price_change_abs.max():.2f}%",
-                        "最小值": f"{bottom_price_change_abs.min():.2f}%"
-                    })
-
-                sorted_volume_change_abs = data["📊 成交量變動幅 (%)"].dropna().sort_values(ascending=False)
-                if len(sorted_volume_change_abs) > 0:
-                    top_volume_change_abs_count = max(1, int(len(sorted_volume_change_abs) * PERCENTILE_THRESHOLD / 100))
-                    top_volume_change_abs = sorted_volume_change_abs.head(top_volume_change_abs_count)
-                    range_data.append({
-                        "指標": "📊 成交量變動幅 (%)",
-                        "範圍類型": "最高到最低",
-                        "最大值": f"{top_volume_change_abs.max():.2f}%",
-                        "最小值": f"{top_volume_change_abs.min():.2f}%"
-                    })
-                sorted_volume_change_abs_asc = data["📊 成交量變動幅 (%)"].dropna().sort_values(ascending=True)
-                if len(sorted_volume_change_abs_asc) > 0:
-                    bottom_volume_change_abs_count = max(1, int(len(sorted_volume_change_abs_asc) * PERCENTILE_THRESHOLD / 100))
-                    bottom_volume_change_abs = sorted_volume_change_abs_asc.head(bottom_volume_change_abs_count)
-                    range_data.append({
-                        "指標": "📊 成交量變動幅 (%)",
-                        "範圍類型": "最低到最高",
-                        "最大值": f"{bottom_volume_change_abs.max():.2f}%",
-                        "最小值": f"{bottom_volume_change_abs.min():.2f}%"
-                    })
-
-                if range_data:
-                    range_df = pd.DataFrame(range_data)
-                    st.dataframe(
-                        range_df,
-                        use_container_width=True,
-                        column_config={
-                            "指標": st.column_config.TextColumn("指標", width="medium"),
-                            "範圍類型": st.column_config.TextColumn("範圍類型", width="medium"),
-                            "最大值": st.column_config.TextColumn("最大值", width="small"),
-                            "最小值": st.column_config.TextColumn("最小值", width="small")
-                        }
-                    )
-                else:
-                    st.write("無有效數據範圍可顯示")
-
-                # 显示含异动标记的历史资料
-                st.subheader(f"📋 歷史資料：{ticker}")
-                display_data = data[["Datetime","Low","High", "Close", "Volume", "Price Change %", 
-                                     "Volume Change %", "📈 股價漲跌幅 (%)", 
-                                     "📊 成交量變動幅 (%)","Close_Difference", "異動標記"]].tail(15)
-                if not display_data.empty:
-                    st.dataframe(
-                        display_data,
-                        height=600,
-                        use_container_width=True,
-                        column_config={
-                            "異動標記": st.column_config.TextColumn(width="large")
-                        }
-                    )
-                else:
-                    st.warning(f"⚠️ {ticker} 歷史數據表無內容可顯示")
-
-                # 添加下载按钮
-                csv = data.to_csv(index=False)
-                st.download_button(
-                    label=f"📥 下載 {ticker} 數據 (CSV)",
-                    data=csv,
-                    file_name=f"{ticker}_數據_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                    mime="text/csv",
-                )
-
-            except Exception as e:
-                st.warning(f"⚠️ 無法取得 {ticker} 的資料：{e}，將跳過此股票")
-                continue
-
+    states = collect_refresh(pending)
+    refresh_count += 1
+    pushed_before = push_meter["bytes"], push_meter["messages"]
+    render_dashboard(states, selected_tickers, f"⏱ 更新時間：{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    try:
+        divergences = comovement.update(returns_frame({ticker: states[ticker] for ticker in selected_tickers},
+                                                       bars=comovement_window + 1))
+        render_comovement(divergences)
+    except Exception as e:
+        divergences = []
+        rendered.pop("comovement", None)
+        comovement_slot.warning(f"⚠️ 聯動監控計算失敗：{e}")
+
+    alert_states = [states[ticker] for ticker in selected_tickers
+                    if not states[ticker]["error"] and states[ticker]["alert_msg"]]
+    if alert_states or divergences:
+        with alert_slot.container():
+            for state in alert_states:
+                dispatch_alert(state)
+            if divergences:
+                dispatch_divergence_alert(divergences)
+    else:
+        alert_slot.empty()
+
+    update_provider_status(get_provider().status())
+    pushed_bytes = push_meter["bytes"] - pushed_before[0]
+    pushed_messages = push_meter["messages"] - pushed_before[1]
+    with footer_slot.container():
         st.markdown("---")
+        st.caption(f"📦 本次刷新推送 {pushed_bytes / 1024:.1f} KB（{pushed_messages} 則訊息，"
+                   f"{'差異更新' if diff_updates else '整頁重繪'}）")
         st.info(f"📡 頁面將在 {REFRESH_INTERVAL} 秒後自動刷新...")
+    logger.debug("refresh %d: %d bytes in %d messages (%s)", refresh_count, pushed_bytes, pushed_messages,
+                 "diff" if diff_updates else "full")
+
+    if not first_paint_reported:
+        report_first_paint("實時數據")
+        first_paint_reported = True
+    # 快照只用于加快下次启动，写入失败（磁盘满、权限等）不影响监控循环
+    try:
+        save_snapshot(states, monitor_settings)
+    except Exception as e:
+        logger.warning("snapshot not saved: %s", e)
 
     time.sleep(REFRESH_INTERVAL)
-    placeholder.empty()
+    pending = submit_refresh(selected_tickers)